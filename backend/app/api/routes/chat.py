@@ -1,13 +1,15 @@
 """Chat API routes."""
 
 import json
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.services.chat_service import chat_service
+from app.core.executor import run_blocking
+from app.core.services import get_chat_service
+from app.services.chat_service import ChatService
 
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
@@ -28,13 +30,20 @@ class ChatResponse(BaseModel):
     sources: List[dict]
     chunks_used: int
     chatbot_id: str
+    # Per-stage retrieval timings in milliseconds (profile_ms, embedding_ms, search_ms, total_ms);
+    # only returned when CHAT_RETURN_TIMINGS is set
+    timings: Optional[Dict[str, float]] = None
 
 
-@router.post("/{chatbot_id}", response_model=ChatResponse)
-async def chat(chatbot_id: str, payload: ChatRequest):
+@router.post("/{chatbot_id}", response_model=ChatResponse, response_model_exclude_none=True)
+async def chat(
+    chatbot_id: str,
+    payload: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service),
+):
     """Handle chat requests for a chatbot."""
     try:
-        result = chat_service.chat(
+        result = await chat_service.achat(
             chatbot_id=chatbot_id,
             message=payload.message,
             history=[item.dict() for item in (payload.history or [])],
@@ -47,9 +56,9 @@ async def chat(chatbot_id: str, payload: ChatRequest):
 
 
 @router.get("/{chatbot_id}/health")
-async def chat_health(chatbot_id: str):
+async def chat_health(chatbot_id: str, chat_service: ChatService = Depends(get_chat_service)):
     """Basic health endpoint to determine if chatbot has indexed data."""
-    stats = chat_service.zilliz_service.get_collection_stats(chatbot_id)
+    stats = await run_blocking(chat_service.vector_store.get_collection_stats, chatbot_id)
     return {
         "chatbot_id": chatbot_id,
         "ready": stats.get("num_entities", 0) > 0,
@@ -58,10 +67,14 @@ async def chat_health(chatbot_id: str):
 
 
 @router.post("/{chatbot_id}/stream")
-async def chat_stream(chatbot_id: str, payload: ChatRequest):
+async def chat_stream(
+    chatbot_id: str,
+    payload: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service),
+):
     """Stream chat responses token by token."""
     try:
-        stream_generator = chat_service.chat_stream(
+        stream_generator = await chat_service.achat_stream(
             chatbot_id=chatbot_id,
             message=payload.message,
             history=[item.dict() for item in (payload.history or [])],
@@ -71,9 +84,9 @@ async def chat_stream(chatbot_id: str, payload: ChatRequest):
     except Exception as exc:  # pylint: disable=broad-except
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
-    def event_stream():
+    async def event_stream():
         try:
-            for chunk in stream_generator:
+            async for chunk in stream_generator:
                 yield json.dumps(chunk) + "\n"
         except Exception as exc:  # pylint: disable=broad-except
             yield json.dumps({"type": "error", "message": str(exc)}) + "\n"
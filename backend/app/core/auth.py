@@ -3,13 +3,22 @@ Authentication helpers for FastAPI endpoints.
 
 We validate Supabase access tokens sent via:
   Authorization: Bearer <access_token>
+
+Tokens are verified locally (JWT signature, expiry and audience) with the
+project's JWT secret or its published signing keys; Supabase Auth is only
+called for tokens that cannot be verified that way.
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, TYPE_CHECKING
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
 
 from fastapi import Depends, Header, HTTPException, status
+from jose import jwt
+from jose.exceptions import JWTError
 try:
     # Some editor environments may not have backend deps installed.
     # Keep runtime behavior the same while avoiding hard import failures in tooling.
@@ -25,17 +34,42 @@ except Exception:  # pylint: disable=broad-except
                 "supabase package is not available. Install backend dependencies before running the API."
             )
 
-from app.core.config import SUPABASE_ANON_KEY, SUPABASE_SERVICE_KEY, SUPABASE_URL
-from app.services.supabase_service import SupabaseService
+from app.core.config import (
+    AUTH_JWKS_CACHE_TTL_SECONDS,
+    AUTH_REMOTE_FALLBACK,
+    AUTH_TOKEN_CACHE_MAX_ITEMS,
+    SUPABASE_ANON_KEY,
+    SUPABASE_JWKS_URL,
+    SUPABASE_JWT_AUDIENCE,
+    SUPABASE_JWT_SECRET,
+    SUPABASE_SERVICE_KEY,
+    SUPABASE_URL,
+)
+from app.core.services import registry
+from app.utils.ttl_cache import TTLCache
+
+
+# Verified tokens (sha256 of the token -> user dict), each kept until the token expires
+_verified_tokens = TTLCache(ttl_seconds=3600, max_items=AUTH_TOKEN_CACHE_MAX_ITEMS)
+
+# Minimum seconds between JWKS refetches triggered by an unknown key ID
+_JWKS_REFRESH_INTERVAL_SECONDS = 30.0
+
+_auth_client: Optional[Client] = None
+_client_lock = threading.Lock()
 
 
 def _get_auth_client() -> Client:
     """
-    Create a Supabase client capable of calling GoTrue endpoints.
+    Supabase client capable of calling GoTrue endpoints (created once).
 
     For /auth/v1/user we need a Supabase API key in the apikey header.
     The anon key is preferred; we fall back to service key if needed.
     """
+    global _auth_client
+
+    if _auth_client is not None:
+        return _auth_client
 
     if not SUPABASE_URL:
         raise ValueError("SUPABASE_URL must be set in environment variables")
@@ -44,7 +78,142 @@ def _get_auth_client() -> Client:
     if not api_key:
         raise ValueError("SUPABASE_ANON_KEY or SUPABASE_SERVICE_KEY must be set in environment variables")
 
-    return create_client(SUPABASE_URL, api_key)
+    with _client_lock:
+        if _auth_client is None:
+            _auth_client = create_client(SUPABASE_URL, api_key)
+    return _auth_client
+
+
+class _SigningKeys:
+    """
+    Keys that Supabase Auth signs access tokens with: the project's JWT secret
+    (HS256) and the public keys published at the JWKS URL, keyed by key ID.
+    The JWKS is refetched after AUTH_JWKS_CACHE_TTL_SECONDS, or earlier when a
+    token names a key ID we have not seen (key rotation).
+
+    Only one thread fetches at a time and it does so outside the lock; the
+    others keep verifying with the keys already cached.
+    """
+
+    def __init__(self, secret: str, jwks_url: str, ttl_seconds: float):
+        self.secret = secret
+        self.jwks_url = jwks_url
+        self.ttl_seconds = ttl_seconds
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at: Optional[float] = None
+        self._refreshing = False
+        self._first_fetch = threading.Event()
+        self._lock = threading.Lock()
+
+    def get(self, kid: Optional[str], alg: str) -> Optional[Tuple[Any, str]]:
+        """
+        (key, algorithm) to verify a token whose header names alg and kid, or
+        None if no key is available. The algorithm comes from our side (HS256
+        for the secret, the JWK's own alg for published keys), never the token.
+        """
+        if alg.startswith("HS"):
+            return (self.secret, "HS256") if self.secret else None
+        if not self.jwks_url or not kid:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            expired = self._fetched_at is None or now - self._fetched_at >= self.ttl_seconds
+            rotated = kid not in self._keys and (
+                self._fetched_at is None or now - self._fetched_at >= _JWKS_REFRESH_INTERVAL_SECONDS
+            )
+            fetch = (expired or rotated) and not self._refreshing
+            if fetch:
+                self._refreshing = True
+
+        if fetch:
+            self._refresh(now)
+        elif self._fetched_at is None:
+            # Nothing cached yet: wait for the first fetch instead of rejecting the token
+            self._first_fetch.wait(timeout=5.0)
+
+        key = self._keys.get(kid)
+        if key is None or not key.get("alg"):
+            return None
+        return key, key["alg"]
+
+    def _refresh(self, now: float):
+        try:
+            response = registry.http.get(self.jwks_url, headers={"apikey": SUPABASE_ANON_KEY or SUPABASE_SERVICE_KEY}, timeout=5.0)
+            response.raise_for_status()
+            keys = {key["kid"]: key for key in response.json().get("keys", []) if key.get("kid")}
+        except Exception as exc:  # pylint: disable=broad-except
+            # Keep serving the keys we have; retry after the refresh interval
+            print(f"[AUTH] Could not fetch signing keys from {self.jwks_url}: {exc}")
+            with self._lock:
+                self._fetched_at = now - self.ttl_seconds + _JWKS_REFRESH_INTERVAL_SECONDS
+                self._refreshing = False
+            self._first_fetch.set()
+            return
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = now
+            self._refreshing = False
+        self._first_fetch.set()
+
+
+_signing_keys = _SigningKeys(SUPABASE_JWT_SECRET, SUPABASE_JWKS_URL, AUTH_JWKS_CACHE_TTL_SECONDS)
+
+
+def _user_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """User dict (same keys as the /auth/v1/user response where the token carries them)"""
+    return {
+        "id": claims.get("sub"),
+        "aud": claims.get("aud"),
+        "role": claims.get("role"),
+        "email": claims.get("email"),
+        "phone": claims.get("phone"),
+        "app_metadata": claims.get("app_metadata") or {},
+        "user_metadata": claims.get("user_metadata") or {},
+        "is_anonymous": claims.get("is_anonymous", False),
+    }
+
+
+def _verify_locally(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verify the token's signature, expiry and audience and return its claims.
+    Returns None when no key is available to verify it; raises JWTError if it is invalid.
+    """
+    header = jwt.get_unverified_header(token)
+    alg = header.get("alg") or ""
+    signing_key = _signing_keys.get(header.get("kid"), alg)
+    if signing_key is None:
+        return None
+    key, algorithm = signing_key
+    return jwt.decode(token, key, algorithms=[algorithm], audience=SUPABASE_JWT_AUDIENCE)
+
+
+def _verify_remotely(token: str) -> Dict[str, Any]:
+    """Validate the token with Supabase Auth (/auth/v1/user)"""
+    try:
+        # supabase-py returns an AuthResponse-like object with .user
+        auth_resp = _get_auth_client().auth.get_user(token)
+        user = getattr(auth_resp, "user", None)
+    except Exception as exc:  # pylint: disable=broad-except
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+        ) from exc
+
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+
+    # Normalize to plain dict for easier downstream use
+    if hasattr(user, "model_dump"):
+        return user.model_dump()
+    if hasattr(user, "dict"):
+        return user.dict()
+    return user  # type: ignore[return-value]
+
+
+def token_cache_stats() -> Dict[str, Any]:
+    """Hit rate, size and staleness of the verified-token cache"""
+    return _verified_tokens.stats()
 
 
 def _extract_bearer_token(authorization: Optional[str]) -> str:
@@ -66,30 +235,44 @@ def _extract_bearer_token(authorization: Optional[str]) -> str:
 def require_supabase_user(authorization: Optional[str] = Header(default=None)) -> Dict[str, Any]:
     """
     Validate the Supabase access token and return the user object (dict-like).
+
+    Tokens are verified locally with the project's signing keys and remembered
+    until they expire. Supabase Auth is asked only for tokens no local key can
+    verify (when AUTH_REMOTE_FALLBACK is on).
     """
 
     token = _extract_bearer_token(authorization)
-    client = _get_auth_client()
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    user = _verified_tokens.get(token_hash)
+    if user is not None:
+        return user
 
     try:
-        # supabase-py returns an AuthResponse-like object with .user
-        auth_resp = client.auth.get_user(token)
-        user = getattr(auth_resp, "user", None)
-    except Exception as exc:  # pylint: disable=broad-except
+        claims = _verify_locally(token)
+    except JWTError as exc:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
         ) from exc
 
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+    if claims is not None:
+        user = _user_from_claims(claims)
+        expires_at = claims.get("exp")
+    elif AUTH_REMOTE_FALLBACK:
+        user = _verify_remotely(token)
+        try:
+            expires_at = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            expires_at = None
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token cannot be verified (no signing key configured)",
+        )
 
-    # Normalize to plain dict for easier downstream use
-    if hasattr(user, "model_dump"):
-        return user.model_dump()
-    if hasattr(user, "dict"):
-        return user.dict()
-    return user  # type: ignore[return-value]
+    if isinstance(expires_at, (int, float)):
+        _verified_tokens.set(token_hash, user, ttl_seconds=expires_at - time.time())
+    return user
 
 
 def require_chatbot_owner(
@@ -99,15 +282,16 @@ def require_chatbot_owner(
     """
     Ensure the authenticated user owns the chatbot_id.
     Returns the user dict if authorized.
+
+    Decisions are cached per (user, chatbot) for CHATBOT_OWNER_CACHE_TTL_SECONDS
+    (denials for CHATBOT_OWNER_DENIED_TTL_SECONDS).
     """
 
     user_id = user.get("id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    supabase_service = SupabaseService()
-    chatbot = supabase_service.get_chatbot_for_user(chatbot_id=chatbot_id, user_id=user_id)
-    if not chatbot:
+    if not registry.supabase.is_chatbot_owner(chatbot_id=chatbot_id, user_id=user_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized for this chatbot")
 
     return user
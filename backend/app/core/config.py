@@ -14,19 +14,182 @@ API_PORT = int(os.getenv("API_PORT", "8000"))
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
+# Chatbot profiles (name, purpose) are cached for this long; unknown IDs
+# for CHATBOT_CACHE_NEGATIVE_TTL_SECONDS. Edits made elsewhere show up within the TTL
+# unless POST /api/chatbot/{id}/invalidate-cache is called.
+CHATBOT_CACHE_TTL_SECONDS = float(os.getenv("CHATBOT_CACHE_TTL_SECONDS", "300"))
+CHATBOT_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("CHATBOT_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+CHATBOT_CACHE_MAX_ITEMS = int(os.getenv("CHATBOT_CACHE_MAX_ITEMS", "4096"))
+# Ownership checks of owner-only endpoints, cached per (user, chatbot); denials for less time
+CHATBOT_OWNER_CACHE_TTL_SECONDS = float(os.getenv("CHATBOT_OWNER_CACHE_TTL_SECONDS", "60"))
+CHATBOT_OWNER_DENIED_TTL_SECONDS = float(os.getenv("CHATBOT_OWNER_DENIED_TTL_SECONDS", "10"))
+
+# Access tokens are verified locally: HS256 tokens with the project's JWT secret, asymmetric
+# (RS256/ES256) tokens with the keys published at SUPABASE_JWKS_URL
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+SUPABASE_JWKS_URL = os.getenv(
+    "SUPABASE_JWKS_URL",
+    f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else "",
+)
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+# Fetched signing keys are reused for this long; an unknown key ID (rotation) refetches sooner
+AUTH_JWKS_CACHE_TTL_SECONDS = float(os.getenv("AUTH_JWKS_CACHE_TTL_SECONDS", "600"))
+# Verified tokens are remembered (by hash) until they expire; a sign-out is therefore
+# only seen once the token expires
+AUTH_TOKEN_CACHE_MAX_ITEMS = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ITEMS", "10000"))
+# Ask Supabase Auth (/auth/v1/user) when a token cannot be verified locally (no secret or key)
+AUTH_REMOTE_FALLBACK = os.getenv("AUTH_REMOTE_FALLBACK", "True").lower() == "true"
 
 # Zilliz Cloud (Serverless)
 ZILLIZ_URI = os.getenv("ZILLIZ_URI", "")
 ZILLIZ_TOKEN = os.getenv("ZILLIZ_TOKEN", "")
+# Loaded collection handles are reused for this long before re-checking the cluster
+ZILLIZ_COLLECTION_CACHE_TTL_SECONDS = float(os.getenv("ZILLIZ_COLLECTION_CACHE_TTL_SECONDS", "600"))
+ZILLIZ_COLLECTION_CACHE_MAX_ITEMS = int(os.getenv("ZILLIZ_COLLECTION_CACHE_MAX_ITEMS", "1024"))
+# Ingestion buffers rows across documents and inserts them in batches bounded by rows and bytes
+ZILLIZ_INSERT_BATCH_ROWS = int(os.getenv("ZILLIZ_INSERT_BATCH_ROWS", "2000"))
+ZILLIZ_INSERT_BATCH_BYTES = int(os.getenv("ZILLIZ_INSERT_BATCH_BYTES", str(16 * 1024 * 1024)))
+# "per_chatbot": one collection per chatbot (chatbot_<id>); "shared": all chatbots in
+# ZILLIZ_SHARED_COLLECTION_COUNT collections partitioned by chatbot_id
+# (move existing data with scripts/migrate_to_shared_collection.py before switching)
+ZILLIZ_COLLECTION_MODE = os.getenv("ZILLIZ_COLLECTION_MODE", "per_chatbot").lower()
+ZILLIZ_SHARED_COLLECTION = os.getenv("ZILLIZ_SHARED_COLLECTION", "shared_chunks")
+# Chatbots are spread over this many shared collections by a hash of their ID
+ZILLIZ_SHARED_COLLECTION_COUNT = int(os.getenv("ZILLIZ_SHARED_COLLECTION_COUNT", "1"))
+# Partitions per shared collection; the chatbot_id partition key hashes into them
+ZILLIZ_SHARED_NUM_PARTITIONS = int(os.getenv("ZILLIZ_SHARED_NUM_PARTITIONS", "64"))
+# Index type follows collection size: FLAT below ZILLIZ_FLAT_MAX_VECTORS, IVF_FLAT (nlist ~ 4 * sqrt(n))
+# up to ZILLIZ_HNSW_MIN_VECTORS, HNSW above; all with the inner-product metric (vectors are unit-normalized)
+ZILLIZ_FLAT_MAX_VECTORS = int(os.getenv("ZILLIZ_FLAT_MAX_VECTORS", "10000"))
+ZILLIZ_HNSW_MIN_VECTORS = int(os.getenv("ZILLIZ_HNSW_MIN_VECTORS", "500000"))
+# IVF searches probe this fraction of the clusters, at least ZILLIZ_IVF_MIN_NPROBE
+ZILLIZ_IVF_NPROBE_FRACTION = float(os.getenv("ZILLIZ_IVF_NPROBE_FRACTION", "0.05"))
+ZILLIZ_IVF_MIN_NPROBE = int(os.getenv("ZILLIZ_IVF_MIN_NPROBE", "10"))
+ZILLIZ_HNSW_M = int(os.getenv("ZILLIZ_HNSW_M", "16"))
+ZILLIZ_HNSW_EF_CONSTRUCTION = int(os.getenv("ZILLIZ_HNSW_EF_CONSTRUCTION", "200"))
+ZILLIZ_HNSW_EF_SEARCH = int(os.getenv("ZILLIZ_HNSW_EF_SEARCH", "64"))
+# Rebuild a per-chatbot collection's index in the background after ingestion when its size calls
+# for another one. A rebuild copies the collection, holding back this host's writes to it meanwhile;
+# writers on other hosts are not, so leave this off when several hosts ingest and run
+# scripts/reindex_collections.py instead. Shared collections are never rebuilt automatically.
+ZILLIZ_AUTO_REINDEX = os.getenv("ZILLIZ_AUTO_REINDEX", "False").lower() == "true"
 
 # Embeddings (OpenAI)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1536"))  # text-embedding-3-small outputs 1536-d vectors
 
+# Embedding request packing: batches are filled by token count up to the per-request limit
+EMBEDDING_MAX_TOKENS_PER_REQUEST = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_REQUEST", "250000"))
+EMBEDDING_MAX_INPUTS_PER_REQUEST = int(os.getenv("EMBEDDING_MAX_INPUTS_PER_REQUEST", "2048"))
+# Longer inputs are truncated to the model's context window
+EMBEDDING_MAX_TOKENS_PER_INPUT = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_INPUT", "8191"))
+# Number of embedding requests allowed in flight at once
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+# Local data directory (embedding cache and other on-disk state)
+DATA_DIR = os.getenv("DATA_DIR", ".data")
+
+# Embedding cache: in-memory LRU in front of an on-disk SQLite store
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(DATA_DIR, "embedding_cache.sqlite3"))
+# Number of vectors kept in process memory (1536-d float32 = 6 KB each)
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "4096"))
+# On-disk budget; least recently used vectors are evicted beyond this size
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Vector store backend: "zilliz", "local" (in-process, files under LOCAL_VECTOR_STORE_DIR)
+# or "auto" (new chatbots start local and move to Zilliz once they outgrow the local limit).
+# "local" and "auto" are opt-in: they need LOCAL_VECTOR_STORE_DIR on persistent storage
+# shared by every replica, or vectors and routes are lost on restart and invisible to other instances.
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "zilliz" if ZILLIZ_URI else "local").lower()
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", os.path.join(DATA_DIR, "vector_store"))
+# In auto mode, chatbots with more vectors than this are moved to Zilliz after ingestion
+LOCAL_VECTOR_STORE_MAX_VECTORS = int(os.getenv("LOCAL_VECTOR_STORE_MAX_VECTORS", "50000"))
+# Local collections are searched exactly below this size and with an HNSW index (hnswlib) above it
+LOCAL_HNSW_MIN_VECTORS = int(os.getenv("LOCAL_HNSW_MIN_VECTORS", "20000"))
+LOCAL_HNSW_M = int(os.getenv("LOCAL_HNSW_M", "16"))
+LOCAL_HNSW_EF_CONSTRUCTION = int(os.getenv("LOCAL_HNSW_EF_CONSTRUCTION", "200"))
+LOCAL_HNSW_EF_SEARCH = int(os.getenv("LOCAL_HNSW_EF_SEARCH", "64"))
+# Number of local collections kept loaded in memory
+LOCAL_VECTOR_STORE_CACHE_ITEMS = int(os.getenv("LOCAL_VECTOR_STORE_CACHE_ITEMS", "64"))
+
+# Hybrid retrieval: a per-chatbot BM25 keyword index is built next to the vectors and
+# searched alongside them; the two rankings are merged with reciprocal rank fusion
+KEYWORD_INDEX_ENABLED = os.getenv("KEYWORD_INDEX_ENABLED", "True").lower() == "true"
+# Local disk only: put it on persistent storage shared by the API replicas. A missing index
+# falls back to dense-only retrieval until the next ingestion re-indexes the chatbot.
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", os.path.join(DATA_DIR, "keyword_index"))
+# Each retriever returns top_k * this many candidates for fusion
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "2"))
+# RRF constant k in 1 / (k + rank); larger values flatten the weight of top ranks
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# Per-chatbot retrieval settings (top_k, relevance threshold, search params) written by
+# scripts/tune_retrieval.py; chatbots without one use the global settings
+RETRIEVAL_CONFIG_DIR = os.getenv("RETRIEVAL_CONFIG_DIR", os.path.join(DATA_DIR, "retrieval_config"))
+# Seconds a loaded (or missing) config is reused before the file is read again
+RETRIEVAL_CONFIG_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CONFIG_CACHE_TTL_SECONDS", "60"))
+
+# Background ingestion jobs
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "2"))
+# Minimum seconds between progress writes to the ingestion_jobs table
+INGESTION_PROGRESS_INTERVAL_SECONDS = float(os.getenv("INGESTION_PROGRESS_INTERVAL_SECONDS", "2"))
+# Document status transitions are coalesced and written in one call at most this often
+# (and whenever DOCUMENT_STATUS_BATCH_SIZE documents are waiting, and at the end of a run)
+DOCUMENT_STATUS_FLUSH_INTERVAL_SECONDS = float(os.getenv("DOCUMENT_STATUS_FLUSH_INTERVAL_SECONDS", "2"))
+DOCUMENT_STATUS_BATCH_SIZE = int(os.getenv("DOCUMENT_STATUS_BATCH_SIZE", "500"))
+# An active job with no progress for this long is considered dead (e.g. worker restarted)
+INGESTION_JOB_STALE_SECONDS = float(os.getenv("INGESTION_JOB_STALE_SECONDS", "1800"))
+
+# Ingestion pipeline: workers per stage and queue depth between stages (bounds memory)
+INGESTION_DOWNLOAD_WORKERS = int(os.getenv("INGESTION_DOWNLOAD_WORKERS", "3"))
+INGESTION_PARSE_WORKERS = int(os.getenv("INGESTION_PARSE_WORKERS", "2"))
+INGESTION_EMBED_WORKERS = int(os.getenv("INGESTION_EMBED_WORKERS", "2"))
+INGESTION_STAGE_QUEUE_SIZE = int(os.getenv("INGESTION_STAGE_QUEUE_SIZE", "2"))
+# Documents are embedded and stored in parts of at most this many chunks
+INGESTION_PART_MAX_CHUNKS = int(os.getenv("INGESTION_PART_MAX_CHUNKS", "1000"))
+# Downloads are streamed into a spooled temp file: kept in memory up to this size, on disk above it
+INGESTION_SPOOL_MAX_MEMORY_BYTES = int(os.getenv("INGESTION_SPOOL_MAX_MEMORY_BYTES", str(8 * 1024 * 1024)))
+# Directory for spooled downloads that go to disk (default: the system temp directory)
+INGESTION_SPOOL_DIR = os.getenv("INGESTION_SPOOL_DIR") or None
+# Size of each read from the storage response while streaming a download
+INGESTION_DOWNLOAD_CHUNK_BYTES = int(os.getenv("INGESTION_DOWNLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Document parsing: PDF/DOCX text extraction runs in child processes
+PARSE_POOL_ENABLED = os.getenv("PARSE_POOL_ENABLED", "True").lower() == "true"
+PARSE_POOL_WORKERS = int(os.getenv("PARSE_POOL_WORKERS", str(os.cpu_count() or 2)))
+# A parse task (one document, or one PDF page range) is killed after this long
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "120"))
+PARSE_PDF_PAGES_PER_TASK = int(os.getenv("PARSE_PDF_PAGES_PER_TASK", "50"))
+# Address-space limit per parse process (0 = unlimited)
+PARSE_MAX_MEMORY_MB = int(os.getenv("PARSE_MAX_MEMORY_MB", "2048"))
+
 # Chunking
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
 CHUNK_OVERLAP_PERCENT = float(os.getenv("CHUNK_OVERLAP_PERCENT", "0.2"))
+# "characters" (CHUNK_SIZE) or "tokens" (CHUNK_TOKEN_SIZE, measured with the embedding model's tokenizer);
+# chatbots can override these with their chunking_mode / chunk_token_size / chunk_token_overlap columns
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "characters")
+CHUNK_TOKEN_SIZE = int(os.getenv("CHUNK_TOKEN_SIZE", "400"))
+CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", "60"))
+
+# Threads available to async handlers for blocking Milvus/Supabase calls
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "32"))
+
+# Connection pool for the async OpenAI client (each streaming chat holds one connection)
+OPENAI_ASYNC_MAX_CONNECTIONS = int(os.getenv("OPENAI_ASYNC_MAX_CONNECTIONS", "500"))
+
+# Connection pool of the shared Supabase (PostgREST) client; at most one request per
+# blocking-executor thread is in flight, so more connections than that are never used
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", str(BLOCKING_EXECUTOR_WORKERS)))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "16"))
+# Shared HTTP client for outbound calls outside the Supabase client; today only
+# the auth signing-key (JWKS) fetch, one request at a time, so the pool is small
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "4"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "2"))
+# Idle pooled connections (this client and the Supabase pool) are closed after this many seconds
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
 
 # CORS
 CORS_ORIGINS = [
@@ -48,6 +211,11 @@ CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", "1200"))
 CHAT_TEMPERATURE = float(os.getenv("CHAT_TEMPERATURE", "0.3"))
 # L2 distance threshold for retrieval: only use chunks with score below this (lower = more similar).
 RELEVANCE_THRESHOLD_L2 = float(os.getenv("RELEVANCE_THRESHOLD_L2", "1.5"))
+# Token budget for document excerpts in the prompt; lower-ranked excerpts beyond it are dropped
+CHAT_CONTEXT_MAX_TOKENS = int(os.getenv("CHAT_CONTEXT_MAX_TOKENS", "6000"))
+# Per-stage retrieval timings are always logged; set to also return them in chat responses
+# (the chat endpoints are public, so keep this off outside debugging)
+CHAT_RETURN_TIMINGS = os.getenv("CHAT_RETURN_TIMINGS", "False").lower() == "true"
 CHAT_SYSTEM_PROMPT = os.getenv(
     "CHAT_SYSTEM_PROMPT",
     (
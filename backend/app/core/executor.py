@@ -0,0 +1,33 @@
+"""
+Bounded thread pool for blocking calls made from async code.
+
+Milvus (pymilvus) and Supabase (supabase-py) clients are synchronous; async
+handlers hand those calls to this pool instead of blocking the event loop.
+The pool size caps how many such calls run at once per worker process.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.core.config import BLOCKING_EXECUTOR_WORKERS
+
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_EXECUTOR_WORKERS,
+    thread_name_prefix="blocking-io",
+)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared blocking-call executor"""
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable on the shared executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,145 @@
+"""
+Process-wide service registry.
+
+Clients that hold connections (Supabase/PostgREST, Zilliz, HTTP) are created
+once per worker process, opened at application startup and closed at
+shutdown (see the lifespan in app.main). Request handlers receive them
+through FastAPI dependencies instead of constructing their own:
+
+    async def handler(supabase_service: SupabaseService = Depends(get_supabase_service)): ...
+"""
+
+import threading
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+from app.core.config import (
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+)
+from app.services.supabase_service import SupabaseService
+
+if TYPE_CHECKING:
+    from app.services.chat_service import ChatService
+    from app.services.ingestion_jobs import IngestionJobManager
+    from app.services.ingestion_service import IngestionService
+    from app.services.vector_store_router import VectorStoreRouter
+
+
+class ServiceRegistry:
+    """Lazily created, shared service instances and their startup/shutdown"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._supabase: Optional[SupabaseService] = None
+        self._http: Optional[httpx.Client] = None
+        self._ingestion_service: Optional["IngestionService"] = None
+
+    @property
+    def supabase(self) -> SupabaseService:
+        """Supabase service with the pooled PostgREST client"""
+        if self._supabase is None:
+            with self._lock:
+                if self._supabase is None:
+                    self._supabase = SupabaseService()
+        return self._supabase
+
+    @property
+    def http(self) -> httpx.Client:
+        """Pooled, keep-alive HTTP client for outbound calls the Supabase client does not make (signing keys)"""
+        if self._http is None:
+            with self._lock:
+                if self._http is None:
+                    self._http = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                        ),
+                        timeout=httpx.Timeout(30.0, connect=5.0),
+                        follow_redirects=True,
+                    )
+        return self._http
+
+    @property
+    def vector_store(self) -> "VectorStoreRouter":
+        from app.services.vector_store_router import vector_store
+
+        return vector_store
+
+    @property
+    def chat_service(self) -> "ChatService":
+        from app.services.chat_service import chat_service
+
+        return chat_service
+
+    @property
+    def ingestion_service(self) -> "IngestionService":
+        if self._ingestion_service is None:
+            from app.services.ingestion_service import IngestionService
+
+            with self._lock:
+                if self._ingestion_service is None:
+                    self._ingestion_service = IngestionService(self.supabase)
+        return self._ingestion_service
+
+    @property
+    def ingestion_jobs(self) -> "IngestionJobManager":
+        from app.services.ingestion_jobs import get_ingestion_job_manager
+
+        return get_ingestion_job_manager()
+
+    def startup(self):
+        """Create the clients and open their connections so the first requests do not pay for it"""
+        # Touching the lazy properties creates the clients
+        self.supabase
+        self.http
+        try:
+            self.vector_store.connect()
+        except Exception as e:
+            # Searches retry the connection on first use
+            print(f"[SERVICES] Could not connect to the vector database at startup: {e}")
+        print("[SERVICES] Clients ready")
+
+    def shutdown(self):
+        """Log cache statistics and close pooled connections"""
+        # Imported here: app.core.auth depends on this module
+        from app.core.auth import token_cache_stats
+
+        print(f"[SERVICES] Chatbot profile cache: {SupabaseService.chatbot_cache_stats()}")
+        print(f"[SERVICES] Ownership cache: {SupabaseService.owner_cache_stats()}")
+        print(f"[SERVICES] Token cache: {token_cache_stats()}")
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            if self._supabase is not None:
+                self._supabase.close()
+        self.vector_store.close()
+        print("[SERVICES] Clients closed")
+
+
+registry = ServiceRegistry()
+
+
+# FastAPI dependencies
+
+def get_supabase_service() -> SupabaseService:
+    return registry.supabase
+
+
+def get_http_client() -> httpx.Client:
+    return registry.http
+
+
+def get_vector_store() -> "VectorStoreRouter":
+    return registry.vector_store
+
+
+def get_chat_service() -> "ChatService":
+    return registry.chat_service
+
+
+def get_ingestion_job_manager() -> "IngestionJobManager":
+    return registry.ingestion_jobs
@@ -2,6 +2,8 @@
 FastAPI application
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -9,16 +11,36 @@ from pydantic import BaseModel
 from app.api.routes import chat
 from app.core.auth import require_chatbot_owner
 from app.core.config import APP_NAME, APP_ENV, DEBUG, CORS_ORIGINS
+from app.core.executor import run_blocking
+from app.core.services import (
+    registry,
+    get_ingestion_job_manager,
+    get_supabase_service,
+    get_vector_store,
+)
+from app.services.ingestion_jobs import IngestionJobManager
+from app.services.supabase_service import SupabaseService
+from app.services.vector_store_router import VectorStoreRouter
 
 
 class DeleteDocumentBody(BaseModel):
     document_id: str
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Open shared clients (Supabase, Zilliz, HTTP) at startup and close them at shutdown"""
+    await run_blocking(registry.startup)
+    yield
+    await run_blocking(registry.shutdown)
+
+
 app = FastAPI(
     title=APP_NAME,
     description="RAG Chatbot Framework API",
     version="1.0.0",
     debug=DEBUG,
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -44,34 +66,66 @@ async def root():
     }
 
 
-@app.post("/api/ingest/{chatbot_id}")
-async def ingest_documents(chatbot_id: str, _user=Depends(require_chatbot_owner)):  
+@app.post("/api/ingest/{chatbot_id}", status_code=202)
+async def ingest_documents(
+    chatbot_id: str,
+    full: bool = False,
+    user=Depends(require_chatbot_owner),
+    manager: IngestionJobManager = Depends(get_ingestion_job_manager),
+):
     """
-    Ingest all pending documents for a chatbot
+    Queue ingestion of a chatbot's documents as a background job
     
-    Workflow:
+    Workflow (run by the job):
     1. Extract text from documents
     2. Chunk documents (500 chars, 20% overlap)
     3. Generate embeddings
     4. Store in Zilliz with text
     
-    Returns ingestion results
+    By default ingestion is incremental: unchanged documents are skipped,
+    changed ones replaced and removed ones deleted. Pass ?full=true to
+    rebuild the chatbot's whole index.
+    
+    Returns the job; if one is already queued/running for this chatbot it is
+    returned instead of starting another. Poll GET /api/ingest/{chatbot_id}/jobs/{job_id}.
     """
-    from app.services.ingestion_service import IngestionService
+    try:
+        job = await run_blocking(manager.submit, chatbot_id, user["id"], incremental=not full)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not start ingestion: {str(e)}")
     
-    ingestion_service = IngestionService()
-    result = ingestion_service.ingest_chatbot_documents(chatbot_id)
+    return {
+        "job_id": job["id"],
+        "chatbot_id": chatbot_id,
+        "status": job["status"],
+        "mode": job.get("mode"),
+        "deduplicated": job.get("deduplicated", False),
+    }
+
+
+@app.get("/api/ingest/{chatbot_id}/jobs/{job_id}")
+async def get_ingestion_job(
+    chatbot_id: str,
+    job_id: str,
+    _user=Depends(require_chatbot_owner),
+    manager: IngestionJobManager = Depends(get_ingestion_job_manager),
+):
+    """Get status, per-document progress and (when finished) the result of an ingestion job"""
+    job = await run_blocking(manager.get_job, chatbot_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
     
-    return result
+    return job
 
 
 @app.get("/api/chatbot/{chatbot_id}/documents")
-async def get_chatbot_documents(chatbot_id: str, _user=Depends(require_chatbot_owner)):   
+async def get_chatbot_documents(
+    chatbot_id: str,
+    _user=Depends(require_chatbot_owner),
+    supabase_service: SupabaseService = Depends(get_supabase_service),
+):
     """Get all documents for a chatbot with their status"""
-    from app.services.supabase_service import SupabaseService
-    
-    supabase_service = SupabaseService()
-    docs = supabase_service.get_documents_by_chatbot(chatbot_id)
+    docs = await run_blocking(supabase_service.get_documents_by_chatbot, chatbot_id)
     
     return {
         "chatbot_id": chatbot_id,
@@ -79,17 +133,23 @@ async def get_chatbot_documents(chatbot_id: str, _user=Depends(require_chatbot_o
     }
 
 
+@app.post("/api/chatbot/{chatbot_id}/invalidate-cache")
+async def invalidate_chatbot_cache(chatbot_id: str, _user=Depends(require_chatbot_owner)):
+    """Drop the cached profile of this chatbot (call after updating its name, purpose or settings)"""
+    SupabaseService.invalidate_chatbot(chatbot_id)
+    return {"ok": True, "chatbot_id": chatbot_id}
+
+
 @app.delete("/api/chatbot/{chatbot_id}/documents")
 async def delete_document_vectors(
     chatbot_id: str,
     body: DeleteDocumentBody,
     _user=Depends(require_chatbot_owner),
+    vector_store: VectorStoreRouter = Depends(get_vector_store),
 ):
     """Remove this document's embeddings from the vector DB. Does not delete file or document_metadata."""
-    from app.services.zilliz_service import ZillizService
-    zilliz = ZillizService()
     try:
-        zilliz.delete_document(chatbot_id, body.document_id)
+        await run_blocking(vector_store.delete_document, chatbot_id, body.document_id)
         return {"ok": True, "document_id": body.document_id}
     except Exception as e:
         import traceback
@@ -101,15 +161,15 @@ async def delete_document_vectors(
 async def delete_chatbot_vectors(
     chatbot_id: str,
     _user=Depends(require_chatbot_owner),
+    vector_store: VectorStoreRouter = Depends(get_vector_store),
 ):
-    """Delete the Zilliz collection for this chatbot (call when deleting the chatbot). Does not delete DB record, storage, or document_metadata."""
-    from app.services.zilliz_service import ZillizService
-    zilliz = ZillizService()
+    """Delete the vector collection for this chatbot (call when deleting the chatbot). Does not delete DB record, storage, or document_metadata."""
+    SupabaseService.invalidate_chatbot(chatbot_id)
     try:
-        zilliz.delete_collection(chatbot_id)
+        await run_blocking(vector_store.delete_collection, chatbot_id)
         return {"ok": True, "chatbot_id": chatbot_id}
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Zilliz collection delete failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Vector collection delete failed: {str(e)}")
 
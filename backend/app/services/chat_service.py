@@ -1,7 +1,10 @@
 """Chat service for handling chatbot conversations via RAG."""
 
-from typing import List, Dict, Any, Optional, Generator
-from openai import OpenAI
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, Generator, AsyncGenerator
+import httpx
+from openai import OpenAI, AsyncOpenAI
 
 from app.core.config import (
     OPENAI_API_KEY,
@@ -9,13 +12,23 @@ from app.core.config import (
     CHAT_SYSTEM_PROMPT,
     MAX_CONTEXT_MESSAGES,
     RELEVANCE_THRESHOLD_L2,
+    CHAT_CONTEXT_MAX_TOKENS,
+    HYBRID_CANDIDATE_MULTIPLIER,
+    HYBRID_RRF_K,
     CHAT_TOP_K,
     CHAT_LIST_QUERY_TOP_K,
     CHAT_MAX_TOKENS,
     CHAT_TEMPERATURE,
+    OPENAI_ASYNC_MAX_CONNECTIONS,
+    CHAT_RETURN_TIMINGS,
 )
-from app.services.zilliz_service import zilliz_service
-from app.services.supabase_service import SupabaseService
+from app.services.embedding_service import embedding_service
+from app.services.retrieval_config import retrieval_config
+from app.services.vector_store_router import vector_store
+from app.core.services import registry
+from app.core.executor import get_executor, run_blocking
+from app.utils.rank_fusion import reciprocal_rank_fusion
+from app.utils.tokens import count_tokens
 
 
 class ChatService:
@@ -26,8 +39,20 @@ class ChatService:
             raise ValueError("OPENAI_API_KEY is not set. Please configure it in your environment.")
 
         self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.zilliz_service = zilliz_service
-        self.supabase_service = SupabaseService()
+        # The default pool (100 connections) would cap concurrent streaming conversations
+        self.async_client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_ASYNC_MAX_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(600.0, connect=5.0),
+            ),
+        )
+        self.vector_store = vector_store
+        self.embedding_service = embedding_service
+        self.supabase_service = registry.supabase
 
     @staticmethod
     def _is_list_query(message: str) -> bool:
@@ -84,15 +109,216 @@ class ChatService:
         if not message or not message.strip():
             raise ValueError("Message cannot be empty")
 
-        chatbot = self.supabase_service.get_chatbot(chatbot_id)
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        # Use more chunks for list-type questions so we don't miss any item
+        effective_top_k = CHAT_LIST_QUERY_TOP_K if self._is_list_query(message) else top_k
+        candidate_k = self._candidate_k(effective_top_k)
+
+        # Profile lookup and keyword search run on the executor while this thread embeds and searches
+        profile_future = get_executor().submit(
+            self._timed, timings, "profile_ms", self.supabase_service.get_chatbot, chatbot_id
+        )
+        keyword_future = get_executor().submit(
+            self._timed, timings, "keyword_ms", self.vector_store.keyword_search, chatbot_id, message, candidate_k
+        )
+        dense_results = self._timed(
+            timings,
+            "retrieval_ms",
+            self.vector_store.search,
+            chatbot_id=chatbot_id,
+            query_text=message,
+            top_k=candidate_k,
+        )
+        search_results = self._fuse_results(dense_results, keyword_future.result(), effective_top_k)
+
+        chatbot = profile_future.result()
         if not chatbot:
             raise ValueError("Chatbot not found")
 
-        chatbot_name = chatbot.get("name", "your assistant")
-        chatbot_purpose = chatbot.get("purpose")
+        timings["total_ms"] = self._elapsed_ms(started)
+        payload = self._compose_payload(
+            chatbot_id=chatbot_id,
+            chatbot=chatbot,
+            message=message,
+            history=history,
+            search_results=search_results,
+            effective_top_k=effective_top_k,
+        )
+        payload["timings"] = self._log_timings(chatbot_id, timings)
+        return payload
+
+    async def _abuild_messages(
+        self,
+        *,
+        chatbot_id: str,
+        message: str,
+        history: Optional[List[Dict[str, str]]],
+        top_k: int,
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of _build_messages; blocking Milvus/Supabase calls run on the executor.
+
+        Stages form a small dependency graph: the profile fetch, the keyword
+        search and the query embedding start together, and the vector search
+        starts as soon as the embedding is ready. Per-stage timings are
+        logged and kept under "timings".
+        """
+        if not message or not message.strip():
+            raise ValueError("Message cannot be empty")
+
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
 
-        # Use more chunks for list-type questions so we don't miss any item
         effective_top_k = CHAT_LIST_QUERY_TOP_K if self._is_list_query(message) else top_k
+        candidate_k = self._candidate_k(effective_top_k)
+
+        async def fetch_profile() -> Optional[Dict[str, Any]]:
+            stage_started = time.perf_counter()
+            chatbot = await run_blocking(self.supabase_service.get_chatbot, chatbot_id)
+            timings["profile_ms"] = self._elapsed_ms(stage_started)
+            return chatbot
+
+        async def retrieve() -> List[Dict[str, Any]]:
+            stage_started = time.perf_counter()
+            query_embedding = await self.embedding_service.aembed_query(message)
+            timings["embedding_ms"] = self._elapsed_ms(stage_started)
+
+            stage_started = time.perf_counter()
+            results = await run_blocking(
+                self.vector_store.search_by_vector,
+                chatbot_id,
+                query_embedding,
+                top_k=candidate_k,
+            )
+            timings["search_ms"] = self._elapsed_ms(stage_started)
+            return results
+
+        async def keyword_search() -> List[Dict[str, Any]]:
+            stage_started = time.perf_counter()
+            results = await run_blocking(self.vector_store.keyword_search, chatbot_id, message, candidate_k)
+            timings["keyword_ms"] = self._elapsed_ms(stage_started)
+            return results
+
+        profile_task = asyncio.create_task(fetch_profile())
+        retrieval_task = asyncio.create_task(retrieve())
+        keyword_task = asyncio.create_task(keyword_search())
+        try:
+            chatbot = await profile_task
+            if not chatbot:
+                raise ValueError("Chatbot not found")
+            dense_results, keyword_results = await asyncio.gather(retrieval_task, keyword_task)
+        except BaseException:
+            retrieval_task.cancel()
+            keyword_task.cancel()
+            raise
+        search_results = self._fuse_results(dense_results, keyword_results, effective_top_k)
+
+        timings["total_ms"] = self._elapsed_ms(started)
+        payload = self._compose_payload(
+            chatbot_id=chatbot_id,
+            chatbot=chatbot,
+            message=message,
+            history=history,
+            search_results=search_results,
+            effective_top_k=effective_top_k,
+        )
+        payload["timings"] = self._log_timings(chatbot_id, timings)
+        return payload
+
+    @staticmethod
+    def _log_timings(chatbot_id: str, timings: Dict[str, float]) -> Dict[str, float]:
+        """Log per-stage retrieval timings server-side"""
+        stages = ", ".join(f"{name}={value:.1f}" for name, value in timings.items())
+        print(f"[RETRIEVAL] Chatbot {chatbot_id}: {stages}")
+        return timings
+
+    @staticmethod
+    def _result(payload: Dict[str, Any], chatbot_id: str, reply: str) -> Dict[str, Any]:
+        """Response body of a chat; timings are included only with CHAT_RETURN_TIMINGS"""
+        result = {
+            "response": reply,
+            "sources": payload["sources"],
+            "chunks_used": payload["chunks_used"],
+            "chatbot_id": chatbot_id,
+        }
+        if CHAT_RETURN_TIMINGS:
+            result["timings"] = payload["timings"]
+        return result
+
+    @staticmethod
+    def _top_k(chatbot_id: str, top_k: Optional[int]) -> int:
+        """Requested top_k, else the chatbot's tuned value (scripts/tune_retrieval.py), else CHAT_TOP_K"""
+        if top_k is not None:
+            return top_k
+        return retrieval_config.top_k(chatbot_id, CHAT_TOP_K)
+
+    def _candidate_k(self, top_k: int) -> int:
+        """Results to fetch from each retriever; fusion picks top_k from their union"""
+        if self.vector_store.keyword_index is None:
+            return top_k
+        return top_k * HYBRID_CANDIDATE_MULTIPLIER
+
+    @staticmethod
+    def _fuse_results(
+        dense_results: List[Dict[str, Any]],
+        keyword_results: List[Dict[str, Any]],
+        top_k: int,
+    ) -> List[Dict[str, Any]]:
+        """Merge dense and BM25 rankings with reciprocal rank fusion (dense only if there are no keyword hits)."""
+        if not keyword_results:
+            return dense_results[:top_k]
+        return reciprocal_rank_fusion(
+            {"dense": dense_results, "keyword": keyword_results}, top_k=top_k, k=HYBRID_RRF_K
+        )
+
+    @staticmethod
+    def _fit_context_budget(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep results, best first, while their excerpts fit CHAT_CONTEXT_MAX_TOKENS.
+
+        Uses the token count stored at ingestion; chunks indexed before counts
+        were recorded are counted here. The best result is always kept.
+        """
+        kept: List[Dict[str, Any]] = []
+        used = 0
+        for result in results:
+            tokens = (result.get("metadata") or {}).get("token_count")
+            if not tokens:
+                tokens = count_tokens(result.get("text") or "", CHAT_MODEL)
+            if kept and used + tokens > CHAT_CONTEXT_MAX_TOKENS:
+                break
+            kept.append(result)
+            used += tokens
+        return kept
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> float:
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    @classmethod
+    def _timed(cls, timings: Dict[str, float], name: str, func, *args, **kwargs):
+        """Call func and record its wall time in timings[name]."""
+        stage_started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[name] = cls._elapsed_ms(stage_started)
+
+    def _compose_payload(
+        self,
+        *,
+        chatbot_id: str,
+        chatbot: Dict[str, Any],
+        message: str,
+        history: Optional[List[Dict[str, str]]],
+        search_results: List[Dict[str, Any]],
+        effective_top_k: int,
+    ) -> Dict[str, Any]:
+        """Filter retrieved chunks and assemble the prompt messages and sources."""
+        chatbot_name = chatbot.get("name", "your assistant")
+        chatbot_purpose = chatbot.get("purpose")
 
         context_blocks: List[str] = []
         profile_lines = [f"Chatbot Name: {chatbot_name}"]
@@ -102,27 +328,27 @@ class ChatService:
 
         sources: List[Dict[str, Any]] = []
 
-        search_results = self.zilliz_service.search(
-            chatbot_id=chatbot_id,
-            query_text=message,
-            top_k=effective_top_k,
-        )
-        # L2 distance: lower is better; keep results below threshold
+        # L2 distance: lower is better; keep results below threshold, plus exact-term
+        # (keyword) matches that fusion ranked into the top results
+        threshold = retrieval_config.relevance_threshold(chatbot_id, RELEVANCE_THRESHOLD_L2)
         relevant_results = [
             r for r in search_results
-            if r.get("score") is not None and r["score"] < RELEVANCE_THRESHOLD_L2
+            if (r.get("score") is not None and r["score"] < threshold)
+            or r.get("keyword_rank") is not None
         ]
         # For list queries, if we filtered too much, keep more results so we have full coverage
         if not relevant_results and search_results:
             relevant_results = search_results[: max(3, effective_top_k // 2)]
         elif self._is_list_query(message) and len(relevant_results) < len(search_results):
             # Include slightly weaker matches so we don't miss a service in a chunk
-            threshold_loose = min(RELEVANCE_THRESHOLD_L2 + 0.3, 2.0)
-            extra = [r for r in search_results if r.get("score") is not None and RELEVANCE_THRESHOLD_L2 <= r["score"] < threshold_loose]
+            threshold_loose = min(threshold + 0.3, 2.0)
+            extra = [r for r in search_results if r.get("score") is not None and threshold <= r["score"] < threshold_loose]
             for r in extra:
                 if r not in relevant_results:
                     relevant_results.append(r)
 
+        relevant_results = self._fit_context_budget(relevant_results)
+
         for idx, result in enumerate(relevant_results, start=1):
             text = result.get("text", "")
             if text:
@@ -203,7 +429,7 @@ class ChatService:
         top_k: Optional[int] = None,
     ) -> Dict[str, Any]:
         """Generate a chatbot response using retrieved context and OpenAI chat model."""
-        k = top_k if top_k is not None else CHAT_TOP_K
+        k = self._top_k(chatbot_id, top_k)
 
         payload = self._build_messages(
             chatbot_id=chatbot_id,
@@ -224,12 +450,7 @@ class ChatService:
 
         reply = response.choices[0].message.content.strip()
 
-        return {
-            "response": reply,
-            "sources": payload["sources"],
-            "chunks_used": payload["chunks_used"],
-            "chatbot_id": chatbot_id,
-        }
+        return self._result(payload, chatbot_id, reply)
 
     def chat_stream(
         self,
@@ -239,7 +460,7 @@ class ChatService:
         top_k: Optional[int] = None,
     ) -> Generator[Dict[str, Any], None, None]:
         """Stream a chatbot response token-by-token."""
-        k = top_k if top_k is not None else CHAT_TOP_K
+        k = self._top_k(chatbot_id, top_k)
         payload = self._build_messages(
             chatbot_id=chatbot_id,
             message=message,
@@ -276,16 +497,103 @@ class ChatService:
 
         yield {
             "type": "final",
-            "data": {
-                "response": full_response,
-                "sources": payload["sources"],
-                "chunks_used": payload["chunks_used"],
-                "chatbot_id": chatbot_id,
-            },
+            "data": self._result(payload, chatbot_id, full_response),
         }
 
 
-# Singleton instance for reuse
-chat_service = ChatService()
+    async def achat(
+        self,
+        chatbot_id: str,
+        message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        top_k: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Async version of chat: never blocks the event loop."""
+        k = self._top_k(chatbot_id, top_k)
 
+        payload = await self._abuild_messages(
+            chatbot_id=chatbot_id,
+            message=message,
+            history=history,
+            top_k=k,
+        )
 
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=payload["messages"],
+                temperature=CHAT_TEMPERATURE,
+                max_tokens=CHAT_MAX_TOKENS,
+            )
+        except Exception as exc:
+            raise Exception(f"OpenAI chat completion failed: {exc}")
+
+        reply = response.choices[0].message.content.strip()
+
+        return self._result(payload, chatbot_id, reply)
+
+    async def achat_stream(
+        self,
+        chatbot_id: str,
+        message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        top_k: Optional[int] = None,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Async version of chat_stream.
+
+        Retrieval and the completion request run before this returns, so validation
+        and upstream errors surface to the caller; the returned async generator
+        yields the same delta/final events as chat_stream.
+        """
+        k = self._top_k(chatbot_id, top_k)
+        payload = await self._abuild_messages(
+            chatbot_id=chatbot_id,
+            message=message,
+            history=history,
+            top_k=k,
+        )
+
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=payload["messages"],
+                temperature=CHAT_TEMPERATURE,
+                max_tokens=CHAT_MAX_TOKENS,
+                stream=True,
+            )
+        except Exception as exc:
+            raise Exception(f"OpenAI chat completion failed: {exc}")
+
+        return self._aiter_stream_events(stream, payload, chatbot_id)
+
+    @staticmethod
+    async def _aiter_stream_events(
+        stream: Any,
+        payload: Dict[str, Any],
+        chatbot_id: str,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        accumulated_chunks: List[str] = []
+
+        async for event in stream:
+            if not event.choices:
+                continue
+
+            delta = event.choices[0].delta.content or ""
+            if delta:
+                accumulated_chunks.append(delta)
+                yield {
+                    "type": "delta",
+                    "data": delta,
+                }
+
+        full_response = "".join(accumulated_chunks).strip()
+
+        yield {
+            "type": "final",
+            "data": ChatService._result(payload, chatbot_id, full_response),
+        }
+
+
+# Singleton instance for reuse
+chat_service = ChatService()
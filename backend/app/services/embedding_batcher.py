@@ -0,0 +1,135 @@
+"""
+Token-budget-aware, concurrent embedding batcher
+
+Texts are packed into requests by tiktoken count (not by a fixed number of
+inputs), and several requests run at once inside a bounded in-flight window.
+Results are written back by position, so output order always matches input order.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_MAX_TOKENS_PER_REQUEST,
+    EMBEDDING_MAX_INPUTS_PER_REQUEST,
+    EMBEDDING_MAX_TOKENS_PER_INPUT,
+    EMBEDDING_MAX_CONCURRENCY,
+)
+from app.utils.tokens import encode_batch, get_encoding
+
+
+class EmbeddingBatcher:
+    """Pack texts into token-bounded requests and embed them concurrently"""
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], np.ndarray],
+        model: str,
+        dimension: int,
+        max_tokens_per_request: int = EMBEDDING_MAX_TOKENS_PER_REQUEST,
+        max_inputs_per_request: int = EMBEDDING_MAX_INPUTS_PER_REQUEST,
+        max_tokens_per_input: int = EMBEDDING_MAX_TOKENS_PER_INPUT,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+    ):
+        """
+        Args:
+            embed_batch: Function embedding one request's texts, returning a
+                (len(texts), dimension) float32 matrix in input order
+            model: Embedding model name (selects the tokenizer)
+            dimension: Embedding dimension
+        """
+        self.embed_batch = embed_batch
+        self.model = model
+        self.dimension = dimension
+        self.max_tokens_per_request = max_tokens_per_request
+        self.max_inputs_per_request = max_inputs_per_request
+        self.max_tokens_per_input = max_tokens_per_input
+        self.max_concurrency = max(1, max_concurrency)
+        # Shared by all callers, so the pool size also caps total in-flight requests per process
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="embedding-batch",
+        )
+
+    def pack(self, texts: List[str]) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Plan requests for texts.
+
+        Returns the (possibly truncated) texts and a list of contiguous
+        [start, end) ranges, each fitting the per-request token and input limits.
+        """
+        token_lists = encode_batch(texts, self.model)
+        prepared = list(texts)
+        batches: List[Tuple[int, int]] = []
+
+        start = 0
+        batch_tokens = 0
+        for i, tokens in enumerate(token_lists):
+            n_tokens = len(tokens)
+            if n_tokens > self.max_tokens_per_input:
+                prepared[i] = self._decode_prefix(tokens)
+                n_tokens = self.max_tokens_per_input
+
+            batch_size = i - start
+            if batch_size and (
+                batch_tokens + n_tokens > self.max_tokens_per_request
+                or batch_size >= self.max_inputs_per_request
+            ):
+                batches.append((start, i))
+                start = i
+                batch_tokens = 0
+            batch_tokens += n_tokens
+
+        if start < len(texts):
+            batches.append((start, len(texts)))
+
+        return prepared, batches
+
+    def truncate(self, text: str) -> str:
+        """Cut a single text to the per-input token limit, as pack does for batched texts"""
+        tokens = encode_batch([text], self.model)[0]
+        if len(tokens) > self.max_tokens_per_input:
+            return self._decode_prefix(tokens)
+        return text
+
+    def _decode_prefix(self, tokens: List[int]) -> str:
+        return get_encoding(self.model).decode(tokens[:self.max_tokens_per_input])
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, keeping at most max_concurrency requests in flight"""
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+
+        prepared, batches = self.pack(texts)
+
+        # A single request needs no thread hop
+        if len(batches) == 1:
+            embeddings[:] = self.embed_batch(prepared)
+            return embeddings
+
+        in_flight: Dict[Future, Tuple[int, int]] = {}
+        remaining = iter(batches)
+        try:
+            for start, end in remaining:
+                in_flight[self._executor.submit(self.embed_batch, prepared[start:end])] = (start, end)
+                if len(in_flight) >= self.max_concurrency:
+                    self._collect(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, embeddings)
+
+            while in_flight:
+                self._collect(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, embeddings)
+        except Exception:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+        return embeddings
+
+    @staticmethod
+    def _collect(done, in_flight: Dict[Future, Tuple[int, int]], embeddings: np.ndarray) -> None:
+        """Copy finished batches into their slot of the output matrix"""
+        for future in done:
+            start, end = in_flight.pop(future)
+            embeddings[start:end] = future.result()
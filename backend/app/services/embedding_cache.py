@@ -0,0 +1,290 @@
+"""
+Content-addressed embedding cache
+
+Vectors are keyed by (embedding model, dimension, hash of the normalized text),
+so re-ingesting unchanged chunks or repeating a chat question never calls
+the embedding API twice. Two tiers:
+  - in-memory LRU of float32 arrays (hot chat queries)
+  - on-disk SQLite store with size-based LRU eviction (survives restarts)
+
+The lock only guards the memory tier and counters. Disk reads use a per-thread
+SQLite connection (WAL lets them run alongside writes), and the access times
+that drive eviction are recorded in memory and written back in batches.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MEMORY_ITEMS,
+    EMBEDDING_CACHE_MAX_BYTES,
+)
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Pending access times are written back once this many accumulate without an insert
+_ACCESS_FLUSH_ITEMS = 1024
+
+
+class EmbeddingCache:
+    """Two-tier (memory + SQLite) cache of embedding vectors"""
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+        max_disk_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes writes on self._conn; never taken by lookups
+        self._write_lock = threading.Lock()
+        self._readers = threading.local()
+        # key -> last access time of disk hits not yet written back
+        self._pending_access: Dict[str, float] = {}
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        self._disk_bytes = int(row[0])
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize text so trivially different copies share a cache entry"""
+        return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+    @classmethod
+    def make_key(cls, model: str, dimension: int, text: str) -> str:
+        """Cache key for a text under a given embedding model and dimension"""
+        payload = f"{model}\x00{dimension}\x00{cls.normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, dimension: int, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up vectors for texts.
+
+        Returns a list of float32 vectors aligned with texts; entries are None on a miss.
+        """
+        keys = [self.make_key(model, dimension, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+        disk_keys = list({key for key in keys if key not in found})
+        disk_found = self._read_disk(disk_keys, dimension) if disk_keys else {}
+        found.update(disk_found)
+
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            now = time.time()
+            for key, vector in disk_found.items():
+                self._remember(key, vector)
+                self._pending_access[key] = now
+            for key in keys:
+                vector = found.get(key)
+                if vector is None:
+                    self._counters["misses"] += 1
+                    results.append(None)
+                else:
+                    if key in disk_found:
+                        self._counters["disk_hits"] += 1
+                    else:
+                        self._counters["memory_hits"] += 1
+                    results.append(vector)
+            accessed = None
+            if len(self._pending_access) >= _ACCESS_FLUSH_ITEMS:
+                accessed, self._pending_access = self._pending_access, {}
+
+        if accessed:
+            self._write_access(accessed)
+        return results
+
+    def put_many(
+        self,
+        model: str,
+        dimension: int,
+        texts: Sequence[str],
+        vectors: np.ndarray,
+    ) -> None:
+        """Store vectors for texts in both tiers"""
+        if not texts:
+            return
+
+        now = time.time()
+        rows_by_key = {}
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(model, dimension, text)
+                packed = np.array(vector, dtype=np.float32)
+                self._remember(key, packed)
+                rows_by_key[key] = (key, model, dimension, packed.tobytes(), now)
+            rows = list(rows_by_key.values())
+            accessed, self._pending_access = self._pending_access, {}
+
+        with self._write_lock:
+            try:
+                existing = self._existing_bytes([row[0] for row in rows])
+                self._conn.execute("BEGIN")
+                if accessed:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                        [(when, key) for key, when in accessed.items()],
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dimension, vector, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+                self._disk_bytes += sum(len(row[3]) for row in rows) - existing
+                with self._lock:
+                    self._counters["writes"] += len(rows)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict()
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                print(f"[EMBEDDING CACHE] Warning: could not persist {len(rows)} vectors: {e}")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Insert into the memory tier (caller holds the lock)"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection (opened on first use)"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            self._readers.conn = conn
+        return conn
+
+    def _read_disk(self, keys: List[str], dimension: int) -> Dict[str, np.ndarray]:
+        """Fetch vectors from SQLite on this thread's connection (no lock held)"""
+        found: Dict[str, np.ndarray] = {}
+        try:
+            conn = self._reader()
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    if vector.shape[0] == dimension:
+                        found[key] = vector
+        except sqlite3.Error as e:
+            print(f"[EMBEDDING CACHE] Warning: disk lookup failed: {e}")
+        return found
+
+    def _write_access(self, accessed: Dict[str, float]) -> None:
+        """Write deferred access times back to SQLite"""
+        with self._write_lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(when, key) for key, when in accessed.items()],
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                print(f"[EMBEDDING CACHE] Warning: could not record access times: {e}")
+
+    def _existing_bytes(self, keys: List[str]) -> int:
+        """Size of rows about to be replaced, to keep the byte total accurate"""
+        total = 0
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            row = self._conn.execute(
+                f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})",
+                batch,
+            ).fetchone()
+            total += int(row[0])
+        return total
+
+    def _evict(self) -> None:
+        """Drop least recently used rows until the store is at 90% of its budget"""
+        target = int(self.max_disk_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access ASC LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+
+            victims = []
+            for key, size in rows:
+                victims.append(key)
+                self._disk_bytes -= int(size)
+                if self._disk_bytes <= target:
+                    break
+
+            placeholders = ",".join("?" * len(victims))
+            self._conn.execute(f"DELETE FROM embeddings WHERE key IN ({placeholders})", victims)
+            with self._lock:
+                self._counters["evictions"] += len(victims)
@@ -0,0 +1,157 @@
+"""
+Embedding service - OpenAI embeddings with caching and token-aware batching
+
+Shared by ingestion (document chunks) and chat (queries), independently of
+the vector store the vectors end up in.
+"""
+
+import base64
+from typing import Dict, List
+import numpy as np
+from openai import OpenAI, AsyncOpenAI
+from app.core.config import (
+    OPENAI_API_KEY,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_CACHE_ENABLED,
+)
+from app.core.executor import run_blocking
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class EmbeddingService:
+    def __init__(self):
+        """Initialize the OpenAI clients, batcher and cache"""
+        if not OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY is not set. Please configure it in your environment variables.")
+        
+        # Initialize OpenAI clients for embeddings (async client serves the chat path)
+        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        self.embedding_model = EMBEDDING_MODEL
+        self.dimension = EMBEDDING_DIMENSION
+        self.embedding_batcher = EmbeddingBatcher(
+            self._embed_batch,
+            model=self.embedding_model,
+            dimension=self.dimension,
+        )
+        self.embedding_cache = EmbeddingCache() if EMBEDDING_CACHE_ENABLED else None
+        
+        print(f"Using OpenAI embedding model: {self.embedding_model}")
+    
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for a list of texts.
+        
+        Returns a contiguous float32 matrix of shape (len(texts), dimension) with
+        unit-normalized rows. Cached vectors are reused; only texts missing from
+        the cache (deduplicated) are sent to OpenAI.
+        """
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+        
+        cached = (
+            self.embedding_cache.get_many(self.embedding_model, self.dimension, texts)
+            if self.embedding_cache
+            else [None] * len(texts)
+        )
+        
+        # Embed each distinct missing text once, then fan the vector out to every position
+        pending: Dict[str, List[int]] = {}
+        for i, vector in enumerate(cached):
+            if vector is None:
+                key = EmbeddingCache.make_key(self.embedding_model, self.dimension, texts[i])
+                pending.setdefault(key, []).append(i)
+            else:
+                embeddings[i] = vector
+        
+        if not pending:
+            return embeddings
+        
+        missing_positions = list(pending.values())
+        missing_texts = [texts[positions[0]] for positions in missing_positions]
+        fresh = self.embedding_batcher.embed(missing_texts)
+        
+        if self.embedding_cache:
+            self.embedding_cache.put_many(self.embedding_model, self.dimension, missing_texts, fresh)
+        
+        for positions, vector in zip(missing_positions, fresh):
+            embeddings[positions] = vector
+        
+        return embeddings
+    
+    def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        """Embed one request's worth of texts and return a unit-normalized float32 matrix"""
+        embeddings = np.empty((len(batch), self.dimension), dtype=np.float32)
+        try:
+            # base64 lets us decode straight into float32 without building Python float lists
+            response = self.client.embeddings.create(
+                model=self.embedding_model,
+                input=batch,
+                encoding_format="base64",
+            )
+        except Exception as exc:
+            raise Exception(f"Failed to generate embeddings via OpenAI: {exc}")
+        
+        # Place each vector by its index so order is preserved
+        for item in response.data:
+            embeddings[item.index] = self._decode_embedding(item.embedding)
+        
+        return self._normalize_rows(embeddings)
+    
+    async def aembed_query(self, query_text: str) -> np.ndarray:
+        """
+        Embed a single query without blocking the event loop.
+        
+        Returns a (1, dimension) float32 matrix, ready for search_by_vector.
+        """
+        # The cache takes a lock and hits SQLite, so it runs off the event loop
+        if self.embedding_cache:
+            cached = (await run_blocking(
+                self.embedding_cache.get_many, self.embedding_model, self.dimension, [query_text]
+            ))[0]
+            if cached is not None:
+                return cached.reshape(1, -1).copy()
+        
+        # Oversized queries are truncated like batched texts instead of being rejected by the API
+        model_input = await run_blocking(self.embedding_batcher.truncate, query_text)
+        
+        try:
+            response = await self.async_client.embeddings.create(
+                model=self.embedding_model,
+                input=[model_input],
+                encoding_format="base64",
+            )
+        except Exception as exc:
+            raise Exception(f"Failed to generate embeddings via OpenAI: {exc}")
+        
+        embedding = np.empty((1, self.dimension), dtype=np.float32)
+        embedding[0] = self._decode_embedding(response.data[0].embedding)
+        self._normalize_rows(embedding)
+        
+        if self.embedding_cache:
+            await run_blocking(
+                self.embedding_cache.put_many, self.embedding_model, self.dimension, [query_text], embedding
+            )
+        
+        return embedding
+    
+    @staticmethod
+    def _decode_embedding(embedding) -> np.ndarray:
+        """Decode an OpenAI embedding (base64 string or float list) into float32"""
+        if isinstance(embedding, str):
+            return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+        return np.asarray(embedding, dtype=np.float32)
+    
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        """L2-normalize every row in place; zero rows are left untouched"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+# Singleton instance
+embedding_service = EmbeddingService()
@@ -0,0 +1,200 @@
+"""
+Background ingestion jobs
+
+POST /api/ingest/{chatbot_id} submits a job to a local worker pool and returns
+immediately; progress is persisted to the ingestion_jobs table and polled via
+GET /api/ingest/{chatbot_id}/jobs/{job_id}. At most one job per chatbot is
+active at a time: submitting again returns the job already in flight.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.core.config import (
+    INGESTION_MAX_WORKERS,
+    INGESTION_PROGRESS_INTERVAL_SECONDS,
+    INGESTION_JOB_STALE_SECONDS,
+)
+from app.services.supabase_service import SupabaseService
+
+
+class IngestionProgress:
+    """Collects per-document stage transitions and persists them at a bounded rate"""
+
+    def __init__(
+        self,
+        job_id: str,
+        supabase_service: SupabaseService,
+        min_interval: float = INGESTION_PROGRESS_INTERVAL_SECONDS,
+    ):
+        self.job_id = job_id
+        self.supabase_service = supabase_service
+        self.min_interval = min_interval
+        self._documents: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def __call__(self, document_id: str, stage: str, info: Dict) -> None:
+        """on_progress callback for IngestionService"""
+        with self._lock:
+            entry = self._documents.setdefault(document_id, {})
+            entry.update(info)
+            entry["stage"] = stage
+            due = time.monotonic() - self._last_write >= self.min_interval
+        if due:
+            self.flush()
+
+    def snapshot(self) -> Dict:
+        """Progress document stored in ingestion_jobs.progress"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for entry in self._documents.values():
+                counts[entry["stage"]] = counts.get(entry["stage"], 0) + 1
+            return {
+                "total_documents": len(self._documents),
+                "counts": counts,
+                "documents": {document_id: dict(entry) for document_id, entry in self._documents.items()},
+            }
+
+    def flush(self) -> None:
+        """Write the current progress to the job row"""
+        with self._lock:
+            self._last_write = time.monotonic()
+        self.supabase_service.update_ingestion_job(self.job_id, progress=self.snapshot())
+
+
+class IngestionJobManager:
+    """Runs ingestion jobs on a local thread pool, de-duplicated per chatbot"""
+
+    def __init__(self, max_workers: int = INGESTION_MAX_WORKERS):
+        from app.core.services import registry
+
+        self.supabase_service = registry.supabase
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._lock = threading.Lock()
+        # chatbot_id -> job_id for jobs queued or running in this process
+        self._active: Dict[str, str] = {}
+
+    def submit(self, chatbot_id: str, user_id: str, incremental: bool = True) -> Dict:
+        """
+        Queue an ingestion job for a chatbot.
+
+        If a job for the chatbot is already queued or running, that job is
+        returned instead (with "deduplicated": True).
+        """
+        with self._lock:
+            existing = self._find_active_job(chatbot_id)
+            if existing:
+                return {**existing, "deduplicated": True}
+
+            job = self.supabase_service.create_ingestion_job(
+                chatbot_id=chatbot_id,
+                user_id=user_id,
+                mode="incremental" if incremental else "full",
+            )
+            if not job:
+                # Lost a race with another worker process (unique active-job index)
+                existing = self.supabase_service.get_active_ingestion_job(chatbot_id)
+                if existing:
+                    return {**existing, "deduplicated": True}
+                raise Exception("Could not create ingestion job")
+
+            self._active[chatbot_id] = job["id"]
+
+        print(f"[INGESTION JOB] Queued job {job['id']} for chatbot {chatbot_id}")
+        self._executor.submit(self._run, job, incremental)
+        return {**job, "deduplicated": False}
+
+    def get_job(self, chatbot_id: str, job_id: str) -> Optional[Dict]:
+        """Fetch a job's current state"""
+        return self.supabase_service.get_ingestion_job(job_id, chatbot_id)
+
+    def _find_active_job(self, chatbot_id: str) -> Optional[Dict]:
+        """Active job for the chatbot, failing jobs that stopped making progress"""
+        job = self.supabase_service.get_active_ingestion_job(chatbot_id)
+        if not job:
+            return None
+
+        if job["id"] not in self._active.values() and self._is_stale(job):
+            print(f"[INGESTION JOB] Job {job['id']} has made no progress; marking it failed")
+            self.supabase_service.update_ingestion_job(
+                job["id"],
+                status="failed",
+                error="Job stopped making progress (worker restarted?)",
+                finished_at=self._now(),
+            )
+            return None
+
+        return job
+
+    @staticmethod
+    def _is_stale(job: Dict) -> bool:
+        updated_at = job.get("updated_at") or job.get("created_at")
+        if not updated_at:
+            return False
+        try:
+            updated = datetime.fromisoformat(str(updated_at).replace("Z", "+00:00"))
+        except ValueError:
+            return False
+        if updated.tzinfo is None:
+            updated = updated.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - updated).total_seconds() > INGESTION_JOB_STALE_SECONDS
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.utcnow().isoformat()
+
+    def _run(self, job: Dict, incremental: bool) -> None:
+        """Worker body: run the ingestion and record the outcome"""
+        from app.core.services import registry
+
+        job_id = job["id"]
+        chatbot_id = job["chatbot_id"]
+        progress = IngestionProgress(job_id, self.supabase_service)
+
+        self.supabase_service.update_ingestion_job(job_id, status="running", started_at=self._now())
+        print(f"[INGESTION JOB] Running job {job_id} for chatbot {chatbot_id}")
+
+        try:
+            result = registry.ingestion_service.ingest_chatbot_documents(
+                chatbot_id,
+                incremental=incremental,
+                on_progress=progress,
+            )
+            self.supabase_service.update_ingestion_job(
+                job_id,
+                status="completed",
+                result=result,
+                progress=progress.snapshot(),
+                finished_at=self._now(),
+            )
+            print(f"[INGESTION JOB] Job {job_id} completed")
+        except Exception as e:
+            print(f"[INGESTION JOB] ❌ Job {job_id} failed: {e}")
+            self.supabase_service.update_ingestion_job(
+                job_id,
+                status="failed",
+                error=str(e),
+                progress=progress.snapshot(),
+                finished_at=self._now(),
+            )
+        finally:
+            with self._lock:
+                if self._active.get(chatbot_id) == job_id:
+                    del self._active[chatbot_id]
+
+
+# Singleton instance (created on first use by the ingestion endpoints)
+_ingestion_job_manager: Optional[IngestionJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_ingestion_job_manager() -> IngestionJobManager:
+    global _ingestion_job_manager
+    with _manager_lock:
+        if _ingestion_job_manager is None:
+            _ingestion_job_manager = IngestionJobManager()
+        return _ingestion_job_manager
@@ -2,38 +2,118 @@
 Ingestion service - processes documents and stores in vector database
 """
 
-from typing import Dict, List
-from app.services.zilliz_service import zilliz_service
+import threading
+from dataclasses import dataclass, replace
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
+from app.core.config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP_PERCENT,
+    CHUNKING_MODE,
+    CHUNK_TOKEN_SIZE,
+    CHUNK_TOKEN_OVERLAP,
+    INGESTION_DOWNLOAD_WORKERS,
+    INGESTION_PARSE_WORKERS,
+    INGESTION_EMBED_WORKERS,
+    INGESTION_STAGE_QUEUE_SIZE,
+    INGESTION_PART_MAX_CHUNKS,
+)
+from app.services.embedding_service import embedding_service
+from app.services.vector_store_router import vector_store
 from app.services.supabase_service import SupabaseService
 from app.utils.document_processor import DocumentProcessor
+from app.utils.pipeline import Stage, run_pipeline
+from app.utils.text_chunker import TextChunk
+from app.utils.tokens import count_tokens, count_tokens_batch, get_encoding
+
+
+# on_progress(document_id, stage, info): stage is one of
+# queued, downloaded, extracted, chunked, embedded, indexed, skipped, failed
+ProgressCallback = Callable[[str, str, Dict], None]
 
 
 class IngestionService:
     """Service for ingesting documents into the vector database"""
     
-    def __init__(self):
-        self.supabase_service = SupabaseService()
+    def __init__(self, supabase_service: Optional[SupabaseService] = None):
+        self.supabase_service = supabase_service or SupabaseService()
         self.document_processor = DocumentProcessor()
     
-    def ingest_chatbot_documents(self, chatbot_id: str) -> Dict:
+    @staticmethod
+    def chunk_params(chatbot: Optional[Dict] = None) -> Dict:
+        """
+        Parameters that determine a document's chunks and vectors.
+        A document indexed with different parameters must be re-ingested.
+        
+        The chatbot's chunking_mode / chunk_token_size / chunk_token_overlap
+        columns override the server defaults.
+        """
+        chatbot = chatbot or {}
+        params = {"chunker": "native-v1"}
+        
+        if (chatbot.get("chunking_mode") or CHUNKING_MODE) == "tokens":
+            chunk_tokens = chatbot.get("chunk_token_size") or CHUNK_TOKEN_SIZE
+            overlap_tokens = chatbot.get("chunk_token_overlap")
+            params.update({
+                "chunking_mode": "tokens",
+                "chunk_tokens": chunk_tokens,
+                "chunk_token_overlap": CHUNK_TOKEN_OVERLAP if overlap_tokens is None else overlap_tokens,
+                "tokenizer": get_encoding(embedding_service.embedding_model).name,
+            })
+        else:
+            params.update({
+                "chunk_size": CHUNK_SIZE,
+                "overlap_percent": CHUNK_OVERLAP_PERCENT,
+            })
+        
+        params.update({
+            "embedding_model": embedding_service.embedding_model,
+            "embedding_dimension": embedding_service.dimension,
+        })
+        if vector_store.keyword_index:
+            # Documents indexed before the keyword index existed are re-ingested once to fill it
+            params["keyword_index"] = "bm25-v1"
+        return params
+    
+    def ingest_chatbot_documents(
+        self,
+        chatbot_id: str,
+        incremental: bool = False,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict:
         """
-        Ingest all pending documents for a chatbot
+        Ingest documents for a chatbot
         
-        Workflow:
-        1. Get pending documents
+        Full workflow (incremental=False):
+        1. Reset every document to pending
         2. If collection exists, empty it
         3. For each document:
            - Extract text
            - Chunk (500 chars, 20% overlap)
            - Generate embeddings
-           - Store in Zilliz with text
+           - Store in the vector store with text
+        
+        Incremental workflow (incremental=True):
+        - Documents whose content hash and chunk params match what is indexed are skipped;
+          a document that looks indexed is still downloaded to compare its content hash
+        - New, failed or changed documents are (re)indexed, replacing their old chunks
+        - Vectors of documents no longer in document_metadata are deleted
         
         Args:
             chatbot_id: ID of the chatbot
-            
+            incremental: Only process what changed since the last ingestion
+            on_progress: Optional callback receiving per-document stage transitions
+        
         Returns:
             Dict with ingestion results
         """
+        on_progress = on_progress or (lambda document_id, stage, info: None)
+        # Read fresh: chunking settings may have just been edited
+        params = self.chunk_params(self.supabase_service.get_chunking_settings(chatbot_id))
+        
+        if incremental:
+            return self._ingest_incremental(chatbot_id, params, on_progress)
+        
         print(f"[INGESTION] Starting ingestion for chatbot {chatbot_id}")
         
         # Reset statuses so completed/failed documents are reprocessed
@@ -54,115 +134,464 @@ class IngestionService:
                 "message": "No pending documents to process"
             }
         
-        # Check if collection exists, if so, empty it
-        collection = zilliz_service.get_collection(chatbot_id)
-        if collection:
-            print(f"[INGESTION] Collection exists, emptying it...")
-            try:
-                # Delete all entities in the collection for this chatbot
-                collection.delete(expr=f'chatbot_id == "{chatbot_id}"')
-                collection.flush()
-                print(f"[INGESTION] Collection emptied")
-            except Exception as e:
-                print(f"[INGESTION] Warning: Could not empty collection: {e}, will try to create new one")
-                # Try to create if deletion failed
-                collection = zilliz_service.create_collection_if_not_exists(chatbot_id)
-        else:
-            # Create collection if it doesn't exist
-            print(f"[INGESTION] Creating new collection...")
-            collection = zilliz_service.create_collection_if_not_exists(chatbot_id)
-        
-        # Process each document
-        processed = 0
-        failed = 0
-        errors = []
-        
-        for doc in pending_docs:
-            document_id = doc["id"]
-            filename = doc["filename"]
-            file_path = doc["file_path"]
-            user_id = doc["user_id"]
-            
-            print(f"[INGESTION] Processing document: {filename} (ID: {document_id})")
-            
-            # Update status to processing
-            self.supabase_service.update_document_status(document_id, "processing")
-            
-            try:
-                # Step 1: Download file from storage
-                print(f"[INGESTION] Downloading file from storage...")
-                file_content = self.supabase_service.download_file(file_path)
-                print(f"[INGESTION] Downloaded {len(file_content)} bytes")
-                
-                # Step 2: Extract text (remove formatting, keep only text)
-                print(f"[INGESTION] Extracting text from document...")
-                text = self.document_processor.extract_text(
-                    file_content,
-                    mime_type=doc.get("mime_type"),
-                    filename=filename
-                )
-                
-                if not text or not text.strip():
-                    raise Exception("No text extracted from document")
-                
-                print(f"[INGESTION] Extracted {len(text)} characters of text")
-                
-                # Step 3: Chunk text (500 chars, 20% overlap = 100 chars)
-                print(f"[INGESTION] Chunking text...")
-                chunks = self.document_processor.chunk_text(text, chunk_size=500, overlap_percent=0.2)
-                print(f"[INGESTION] Created {len(chunks)} chunks")
-                
-                if not chunks:
-                    raise Exception("No chunks created from document")
-                
-                # Step 4: Generate embeddings and store in Zilliz (with text)
-                print(f"[INGESTION] Generating embeddings and storing in Zilliz...")
-                num_chunks_added = zilliz_service.add_documents(
-                    chatbot_id=chatbot_id,
-                    document_id=document_id,
-                    chunks=chunks,
-                    filename=filename,
-                    user_id=user_id
-                )
-                print(f"[INGESTION] Successfully added {num_chunks_added} chunks to Zilliz")
-                
-                # Step 5: Update status to completed
-                self.supabase_service.update_document_status(
-                    document_id,
-                    "completed",
-                    chunk_count=num_chunks_added
-                )
-                
-                processed += 1
-                print(f"[INGESTION] ✅ Document {filename} ingested successfully")
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"[INGESTION] ❌ Error processing {filename}: {error_msg}")
-                
-                # Update status to failed with error message
-                self.supabase_service.update_document_status(
-                    document_id,
-                    "failed",
-                    error_message=error_msg
-                )
-                
-                failed += 1
-                errors.append({
-                    "document_id": document_id,
-                    "filename": filename,
-                    "error": error_msg
-                })
+        # Empty the collection (recreating it if its schema is out of date); everything is re-indexed
+        print(f"[INGESTION] Resetting vector collection...")
+        vector_store.reset_collection(chatbot_id)
+        
+        result = self._process_documents(chatbot_id, pending_docs, set(), params, on_progress)
+        result["total_documents"] = len(pending_docs)
+        return result
+    
+    def _ingest_incremental(self, chatbot_id: str, params: Dict, on_progress: ProgressCallback) -> Dict:
+        """Index only new/changed documents and drop vectors of removed ones"""
+        print(f"[INGESTION] Starting incremental ingestion for chatbot {chatbot_id}")
+        
+        documents = self.supabase_service.get_documents_by_chatbot(chatbot_id)
+        
+        vector_store.invalidate_collection(chatbot_id)
+        vector_store.create_collection_if_not_exists(chatbot_id)
+        indexed_ids = vector_store.list_document_ids(chatbot_id)
+        # The keyword index is on local disk; documents missing from it (lost index) are re-indexed
+        keyword_ids = vector_store.keyword_index.document_ids(chatbot_id) if vector_store.keyword_index else None
+        if keyword_ids is not None and indexed_ids - keyword_ids:
+            print(f"[INGESTION] Keyword index is missing {len(indexed_ids - keyword_ids)} documents; re-indexing them")
+        
+        # Vectors whose document_metadata row is gone
+        current_ids = {doc["id"] for doc in documents}
+        removed_ids = sorted(indexed_ids - current_ids)
+        for document_id in removed_ids:
+            vector_store.delete_document(chatbot_id, document_id, flush=False)
+        if removed_ids:
+            print(f"[INGESTION] Deleted vectors of {len(removed_ids)} removed documents")
+        
+        # Content can be replaced under the same document row, so these are only
+        # skipped once their downloaded content hashes to the indexed content_hash
+        verify_ids = {doc["id"] for doc in documents if self._is_indexed(doc, params, indexed_ids, keyword_ids)}
+        print(f"[INGESTION] {len(documents) - len(verify_ids)} documents to index, {len(verify_ids)} to check for changes")
+        
+        result = self._process_documents(chatbot_id, documents, indexed_ids, params, on_progress, verify_ids)
+        result.update({
+            "total_documents": len(documents),
+            "deleted": len(removed_ids),
+        })
+        return result
+    
+    @staticmethod
+    def _is_indexed(doc: Dict, params: Dict, indexed_ids: Set[str], keyword_ids: Optional[Set[str]] = None) -> bool:
+        """
+        True if the document was indexed (vectors, and keyword index when enabled)
+        with the current params. Whether its file changed since is only known
+        once it is downloaded and hashed.
+        """
+        return (
+            doc.get("status") == "completed"
+            and bool(doc.get("content_hash"))
+            and doc.get("chunk_params") == params
+            and doc["id"] in indexed_ids
+            and (keyword_ids is None or doc["id"] in keyword_ids)
+        )
+    
+    def _process_documents(
+        self,
+        chatbot_id: str,
+        docs: List[Dict],
+        indexed_ids: Set[str],
+        params: Dict,
+        on_progress: ProgressCallback,
+        verify_ids: Optional[Set[str]] = None
+    ) -> Dict:
+        """
+        Index documents through an overlapping stage pipeline:
+        download -> extract/chunk -> embed -> store.
+        
+        While one document is being parsed the next is downloading and the previous
+        one is being embedded. Bounded queues between stages keep at most a few
+        documents in memory at once. Documents already in indexed_ids have their
+        old chunks replaced; those in verify_ids are skipped after download when
+        their content hash equals the stored content_hash.
+        
+        Rows from all documents go through one IngestionWriter, which inserts in
+        size-bounded batches and flushes the collection once at the end. Large
+        documents (and streamed spreadsheets) flow through embed/store in parts.
+        """
+        run = _IngestionRun(self, chatbot_id, params, on_progress)
+        
+        for doc in docs:
+            on_progress(doc["id"], "queued", {"filename": doc["filename"]})
+        
+        verify_ids = verify_ids or set()
+        tasks = (
+            _DocumentTask(
+                doc=doc,
+                replace=doc["id"] in indexed_ids,
+                expected_hash=doc.get("content_hash") if doc["id"] in verify_ids else None
+            )
+            for doc in docs
+        )
+        run_pipeline(
+            tasks,
+            [
+                Stage("download", run.download, workers=INGESTION_DOWNLOAD_WORKERS, queue_size=INGESTION_STAGE_QUEUE_SIZE),
+                # Fans out: large documents continue as several parts
+                Stage("parse", run.parse, workers=INGESTION_PARSE_WORKERS, queue_size=INGESTION_STAGE_QUEUE_SIZE, fan_out=True),
+                Stage("embed", run.embed, workers=INGESTION_EMBED_WORKERS, queue_size=INGESTION_STAGE_QUEUE_SIZE),
+                # A single writer keeps vector store inserts ordered and avoids concurrent flushes
+                Stage("index", run.index, workers=1, queue_size=INGESTION_STAGE_QUEUE_SIZE),
+            ],
+            on_error=run.fail,
+        )
+        run.finish()
         
         result = {
-            "success": failed == 0,
+            "success": run.failed == 0,
             "chatbot_id": chatbot_id,
-            "total_documents": len(pending_docs),
-            "processed": processed,
-            "failed": failed,
-            "errors": errors if errors else None
+            "processed": run.processed,
+            "failed": run.failed,
+            "skipped": run.skipped,
+            "errors": run.errors if run.errors else None
         }
         
-        print(f"[INGESTION] Ingestion completed: {processed} processed, {failed} failed")
+        print(f"[INGESTION] Ingestion completed: {run.processed} processed, {run.failed} failed, {run.skipped} unchanged")
+        if embedding_service.embedding_cache:
+            print(f"[INGESTION] Embedding cache: {embedding_service.embedding_cache.stats()}")
         return result
 
+
+@dataclass
+class _DocumentTask:
+    """
+    A document (or one part of it) moving through the ingestion pipeline;
+    each stage fills in its outputs. The parse stage splits documents into
+    parts of at most INGESTION_PART_MAX_CHUNKS chunks, so embeddings of a
+    huge document are never all in memory at once.
+    """
+    doc: Dict
+    replace: bool = False
+    # Set for documents indexed with the current params: skip them if the download hashes to this
+    expected_hash: Optional[str] = None
+    # Content matched expected_hash; later stages pass the task through untouched
+    skipped: bool = False
+    # Spooled download (in memory when small, on disk when large); closed once parsed
+    file_content: Optional[BinaryIO] = None
+    content_hash: Optional[str] = None
+    part: int = 0
+    # chunk_index of this part's first chunk within the document
+    first_chunk_index: int = 0
+    last_part: bool = True
+    chunks: Optional[List[str]] = None
+    # (start, end) character offsets of each chunk in the extracted text
+    offsets: Optional[List[Tuple[int, int]]] = None
+    token_counts: Optional[List[int]] = None
+    embeddings: Optional[np.ndarray] = None
+
+
+@dataclass
+class _PendingDocument:
+    """A document with rows handed to the writer but not all inserted yet"""
+    doc: Dict
+    content_hash: Optional[str]
+    chunk_count: int = 0
+    parts_added: int = 0
+    # Known once the last part arrives (parts can reach the writer out of order)
+    total_parts: Optional[int] = None
+    
+    @property
+    def all_parts_added(self) -> bool:
+        return self.parts_added == self.total_parts
+
+
+class _IngestionRun:
+    """Stage functions and shared counters for one _process_documents call"""
+    
+    def __init__(self, service: IngestionService, chatbot_id: str, params: Dict, on_progress: ProgressCallback):
+        self.supabase_service = service.supabase_service
+        self.document_processor = service.document_processor
+        self.chatbot_id = chatbot_id
+        self.params = params
+        self.on_progress = on_progress
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.errors: List[Dict] = []
+        self.writer = vector_store.ingestion_writer(chatbot_id)
+        # Status transitions are coalesced and written in bulk
+        self.status_writer = self.supabase_service.status_writer()
+        self._awaiting: Dict[str, _PendingDocument] = {}
+        # Documents already reported failed; their remaining parts are dropped
+        self._failed_ids: Set[str] = set()
+        # Failed documents with parts already handed to the writer; their rows are deleted in finish()
+        self._partially_written: Set[str] = set()
+        self._lock = threading.Lock()
+    
+    def download(self, task: _DocumentTask) -> _DocumentTask:
+        """Step 1: Download file from storage"""
+        document_id = task.doc["id"]
+        filename = task.doc["filename"]
+        
+        print(f"[INGESTION] Processing document: {filename} (ID: {document_id})")
+        
+        # Update status to processing (a document that may be unchanged waits until its content is hashed)
+        if task.expected_hash is None:
+            self.status_writer.update(document_id, "processing")
+        
+        task.file_content, task.content_hash, size = self.supabase_service.download_to_spool(task.doc["file_path"])
+        print(f"[INGESTION] Downloaded {size} bytes for {filename}")
+        
+        if task.expected_hash is not None:
+            if task.content_hash == task.expected_hash:
+                self._release_file(task)
+                task.skipped = True
+                with self._lock:
+                    self.skipped += 1
+                print(f"[INGESTION] {filename} is unchanged; skipping")
+                self.on_progress(document_id, "skipped", {"filename": filename})
+                return task
+            self.status_writer.update(document_id, "processing")
+        
+        self.on_progress(document_id, "downloaded", {"filename": filename, "bytes": size})
+        return task
+    
+    def parse(self, task: _DocumentTask) -> Iterator[_DocumentTask]:
+        """Steps 2-3: Extract text (remove formatting, keep only text) and chunk it, yielding parts"""
+        document_id = task.doc["id"]
+        filename = task.doc["filename"]
+        if task.skipped:
+            return
+        
+        total_chunks = 0
+        total_tokens = 0
+        previous: Optional[_DocumentTask] = None
+        
+        try:
+            chunks = self._iter_chunks(task)
+            # One part of lookahead so the final part can be flagged
+            for part_chunks in self._batched(chunks, INGESTION_PART_MAX_CHUNKS):
+                if previous is not None:
+                    yield previous
+                texts = [chunk.text for chunk in part_chunks]
+                previous = replace(
+                    task,
+                    file_content=None,
+                    part=0 if previous is None else previous.part + 1,
+                    first_chunk_index=total_chunks,
+                    last_part=False,
+                    chunks=texts,
+                    offsets=[(chunk.start, chunk.end) for chunk in part_chunks],
+                    # Exact per-chunk counts, stored with the vectors for prompt budgeting at retrieval time
+                    token_counts=count_tokens_batch(texts, self.params["embedding_model"])
+                )
+                total_chunks += len(texts)
+                total_tokens += sum(previous.token_counts)
+                self.on_progress(document_id, "chunked", {"filename": filename, "chunks": total_chunks, "tokens": total_tokens})
+        finally:
+            # The raw file is no longer needed once every chunk is produced (or parsing failed)
+            self._release_file(task)
+        
+        if previous is None:
+            raise Exception("No chunks created from document")
+        
+        print(f"[INGESTION] Created {total_chunks} chunks ({total_tokens} tokens) from {filename}")
+        previous.last_part = True
+        yield previous
+    
+    def _iter_chunks(self, task: _DocumentTask) -> Iterator[TextChunk]:
+        """Chunks of a document: streamed row groups for spreadsheets, chunked extracted text otherwise"""
+        document_id = task.doc["id"]
+        filename = task.doc["filename"]
+        mime_type = task.doc.get("mime_type")
+        tokens_mode = self.params.get("chunking_mode") == "tokens"
+        
+        if self.document_processor.is_spreadsheet(mime_type, filename):
+            if tokens_mode:
+                model = self.params["embedding_model"]
+                return self.document_processor.iter_excel_chunks(
+                    task.file_content,
+                    max_size=self.params["chunk_tokens"],
+                    measure=lambda text: count_tokens(text, model)
+                )
+            return self.document_processor.iter_excel_chunks(task.file_content, max_size=self.params["chunk_size"])
+        
+        text = self.document_processor.extract_text(
+            task.file_content,
+            mime_type=mime_type,
+            filename=filename
+        )
+        # The raw file is no longer needed; release it before the document waits for embedding
+        self._release_file(task)
+        
+        if not text or not text.strip():
+            raise Exception("No text extracted from document")
+        
+        print(f"[INGESTION] Extracted {len(text)} characters of text from {filename}")
+        self.on_progress(document_id, "extracted", {"filename": filename, "characters": len(text)})
+        
+        if tokens_mode:
+            return iter(self.document_processor.chunk_text_by_tokens(
+                text,
+                chunk_tokens=self.params["chunk_tokens"],
+                overlap_tokens=self.params["chunk_token_overlap"],
+                model=self.params["embedding_model"]
+            ))
+        return iter(self.document_processor.chunk_text_with_offsets(
+            text,
+            chunk_size=self.params["chunk_size"],
+            overlap_percent=self.params["overlap_percent"]
+        ))
+    
+    @staticmethod
+    def _release_file(task: _DocumentTask) -> None:
+        """Close a task's downloaded file, deleting its spool file if it went to disk"""
+        if task.file_content is not None:
+            task.file_content.close()
+            task.file_content = None
+    
+    @staticmethod
+    def _batched(items: Iterator[TextChunk], size: int) -> Iterator[List[TextChunk]]:
+        batch: List[TextChunk] = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def embed(self, task: _DocumentTask) -> _DocumentTask:
+        """Step 4: Generate embeddings"""
+        task.embeddings = embedding_service.generate_embeddings(task.chunks)
+        self.on_progress(
+            task.doc["id"],
+            "embedded",
+            {"filename": task.doc["filename"], "chunks": task.first_chunk_index + len(task.chunks)}
+        )
+        return task
+    
+    def index(self, task: _DocumentTask) -> _DocumentTask:
+        """Step 5: Buffer rows for the vector store (with text); documents complete once all their rows are inserted"""
+        document_id = task.doc["id"]
+        
+        with self._lock:
+            if document_id in self._failed_ids:
+                return task
+            pending = self._awaiting.get(document_id)
+            first_seen = pending is None
+            if first_seen:
+                pending = self._awaiting[document_id] = _PendingDocument(task.doc, task.content_hash)
+            pending.chunk_count += len(task.chunks)
+            pending.parts_added += 1
+            if task.last_part:
+                pending.total_parts = task.part + 1
+        
+        # Replacing a changed document: drop its previous chunks before adding any new ones
+        if task.replace and first_seen:
+            self.writer.delete_document(document_id)
+        
+        try:
+            committed = self.writer.add(
+                document_id=document_id,
+                chunks=task.chunks,
+                filename=task.doc["filename"],
+                user_id=task.doc["user_id"],
+                embeddings=task.embeddings,
+                offsets=task.offsets,
+                token_counts=task.token_counts,
+                first_chunk_index=task.first_chunk_index
+            )
+        except Exception as e:
+            # The failed batch also held rows of earlier documents; this one is failed by the pipeline
+            self._fail_awaiting(e, exclude=document_id)
+            raise
+        task.chunks = None
+        task.offsets = None
+        task.token_counts = None
+        task.embeddings = None
+        self._complete(committed)
+        return task
+    
+    def finish(self):
+        """Insert what is still buffered, flush once, settle the remaining documents and write their statuses"""
+        try:
+            self._complete(self.writer.checkpoint())
+        except Exception as e:
+            self._fail_awaiting(e)
+        finally:
+            self._discard_partially_written()
+            self.status_writer.flush()
+    
+    def _discard_partially_written(self):
+        """Delete rows of failed documents whose earlier parts were inserted, so no partial document stays searchable"""
+        # Runs after the checkpoint, once buffered rows of these documents can no longer be inserted later
+        for document_id in sorted(self._partially_written):
+            try:
+                vector_store.delete_document(self.chatbot_id, document_id, flush=False)
+            except Exception as e:
+                print(f"[INGESTION] Could not delete partial rows of failed document {document_id}: {e}")
+        if self._partially_written:
+            print(f"[INGESTION] Deleted partial rows of {len(self._partially_written)} failed documents")
+    
+    def _fail_awaiting(self, error: Exception, exclude: Optional[str] = None):
+        """Fail every document whose buffered rows were not inserted"""
+        with self._lock:
+            stranded = [pending.doc for document_id, pending in self._awaiting.items() if document_id != exclude]
+        for doc in stranded:
+            self._record_failure(doc, "index", error)
+    
+    def _complete(self, document_ids: List[str]):
+        """Mark documents whose rows are all in the vector store as completed"""
+        # The writer reports a document once per inserted part
+        for document_id in dict.fromkeys(document_ids):
+            with self._lock:
+                pending = self._awaiting.get(document_id)
+                if pending is None or not pending.all_parts_added:
+                    continue
+                del self._awaiting[document_id]
+            filename = pending.doc["filename"]
+            num_chunks = pending.chunk_count
+            self.on_progress(document_id, "indexed", {"filename": filename, "chunks": num_chunks})
+            
+            self.status_writer.update(
+                document_id,
+                "completed",
+                chunk_count=num_chunks,
+                content_hash=pending.content_hash,
+                chunk_params=self.params
+            )
+            
+            with self._lock:
+                self.processed += 1
+            print(f"[INGESTION] ✅ Document {filename} ingested successfully ({num_chunks} chunks)")
+    
+    def fail(self, task: _DocumentTask, stage: str, error: Exception) -> None:
+        """Pipeline error handler: record the failure on the document"""
+        self._release_file(task)
+        self._record_failure(task.doc, stage, error)
+    
+    def _record_failure(self, doc: Dict, stage: str, error: Exception) -> None:
+        document_id = doc["id"]
+        filename = doc["filename"]
+        error_msg = str(error)
+        
+        # Several parts of one document can fail; report the document once
+        with self._lock:
+            if document_id in self._failed_ids:
+                return
+            self._failed_ids.add(document_id)
+            if self._awaiting.pop(document_id, None) is not None:
+                self._partially_written.add(document_id)
+        print(f"[INGESTION] ❌ Error processing {filename} ({stage}): {error_msg}")
+        
+        # Update status to failed with error message
+        self.status_writer.update(
+            document_id,
+            "failed",
+            error_message=error_msg
+        )
+        self.on_progress(document_id, "failed", {"filename": filename, "error": error_msg})
+        
+        with self._lock:
+            self.failed += 1
+            self.errors.append({
+                "document_id": document_id,
+                "filename": filename,
+                "error": error_msg
+            })
@@ -0,0 +1,247 @@
+"""
+Per-chatbot keyword (BM25) index
+
+Dense retrieval misses exact-term questions (SKUs, prices, product names);
+this index catches them. Each chatbot gets a SQLite database under
+KEYWORD_INDEX_DIR holding the chunk rows and an FTS5 inverted index over their
+text, ranked with FTS5's built-in bm25(). It is written during ingestion next
+to the vectors and queried alongside them (see VectorStoreRouter.search).
+
+The index lives on local disk only. Incremental ingestion re-indexes documents
+missing from it, so an index lost with a container (or absent on a new replica)
+is rebuilt by the next ingestion; until then retrieval is dense-only.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import KEYWORD_INDEX_DIR
+
+
+# Frequent words that would match almost every chunk
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it me my "
+    "of on or our so that the their them there these they this to was we what when where "
+    "which who why will with you your".split()
+)
+
+# bm25() column weights: text, filename
+_BM25_WEIGHTS = (1.0, 0.5)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS chunks (
+        rowid INTEGER PRIMARY KEY,
+        document_id TEXT NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        filename TEXT,
+        start_offset INTEGER NOT NULL DEFAULT 0,
+        end_offset INTEGER NOT NULL DEFAULT 0,
+        token_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks(document_id)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+        text, filename, content='chunks', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Keep the external-content FTS table in sync with chunks
+    """
+    CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+        INSERT INTO chunks_fts(rowid, text, filename) VALUES (new.rowid, new.text, new.filename);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+        INSERT INTO chunks_fts(chunks_fts, rowid, text, filename) VALUES ('delete', old.rowid, old.text, old.filename);
+    END
+    """,
+)
+
+
+def build_match_query(query_text: str) -> Optional[str]:
+    """FTS5 query matching any non-stopword term of query_text (None if there is none)"""
+    terms = []
+    for token in _TOKEN_RE.findall(query_text.lower()):
+        if token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    if not terms:
+        return None
+    # Quoted, so FTS5 operators and column filters in user input are taken literally
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class KeywordIndex:
+    """BM25 indexes of chunk text, one SQLite database per chatbot"""
+
+    def __init__(self, root: str = KEYWORD_INDEX_DIR):
+        self.root = root
+        self._write_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def get_index_path(self, chatbot_id: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^a-zA-Z0-9_-]", "_", chatbot_id) + ".sqlite3")
+
+    def exists(self, chatbot_id: str) -> bool:
+        return os.path.exists(self.get_index_path(chatbot_id))
+
+    def _connect(self, chatbot_id: str, create: bool = False) -> Optional[sqlite3.Connection]:
+        path = self.get_index_path(chatbot_id)
+        if not create and not os.path.exists(path):
+            return None
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if create:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        return conn
+
+    def add(
+        self,
+        chatbot_id: str,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None,
+        first_chunk_index: int = 0
+    ):
+        """Index a document's chunks (or one part of them)"""
+        if not chunks:
+            return
+        if offsets is None:
+            offsets = [(0, 0)] * len(chunks)
+        if token_counts is None:
+            token_counts = [0] * len(chunks)
+        rows = [
+            (document_id, first_chunk_index + i, chunk, filename, offsets[i][0], offsets[i][1], token_counts[i])
+            for i, chunk in enumerate(chunks)
+        ]
+        with self._write_lock:
+            conn = self._connect(chatbot_id, create=True)
+            try:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO chunks (document_id, chunk_index, text, filename, start_offset, end_offset, token_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+    def document_ids(self, chatbot_id: str) -> Set[str]:
+        """IDs of documents with chunks in the chatbot's index (empty when it has none)"""
+        conn = self._connect(chatbot_id)
+        if conn is None:
+            return set()
+        try:
+            return {row[0] for row in conn.execute("SELECT DISTINCT document_id FROM chunks")}
+        finally:
+            conn.close()
+
+    def delete_document(self, chatbot_id: str, document_id: str):
+        with self._write_lock:
+            conn = self._connect(chatbot_id)
+            if conn is None:
+                return
+            try:
+                conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            finally:
+                conn.close()
+
+    def optimize(self, chatbot_id: str):
+        """Merge the FTS b-trees after a bulk load so queries touch fewer segments"""
+        with self._write_lock:
+            conn = self._connect(chatbot_id)
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('optimize')")
+            finally:
+                conn.close()
+
+    def reset(self, chatbot_id: str):
+        """Drop every indexed chunk of a chatbot and start an empty index"""
+        self.delete(chatbot_id)
+        with self._write_lock:
+            self._connect(chatbot_id, create=True).close()
+
+    def delete(self, chatbot_id: str):
+        path = self.get_index_path(chatbot_id)
+        with self._write_lock:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.unlink(path + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def search(
+        self,
+        chatbot_id: str,
+        query_text: str,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Chunks matching query terms, best BM25 first. Results have the same
+        shape as vector search results, with 'score' None and 'bm25' set
+        (higher is better).
+        """
+        match = build_match_query(query_text)
+        if match is None or top_k <= 0:
+            return []
+        conn = self._connect(chatbot_id)
+        if conn is None:
+            return []
+
+        where = "chunks_fts MATCH ?"
+        params: list = [match]
+        for key, value in (filters or {}).items():
+            if key not in ("document_id", "chunk_index", "filename"):
+                raise ValueError(f"Unsupported filter field: {key}")
+            where += f" AND c.{key} = ?"
+            params.append(value)
+        params.append(top_k)
+
+        try:
+            rows = conn.execute(
+                f"SELECT c.document_id, c.chunk_index, c.text, c.filename, c.start_offset, c.end_offset, "
+                f"c.token_count, bm25(chunks_fts, {_BM25_WEIGHTS[0]}, {_BM25_WEIGHTS[1]}) AS rank "
+                f"FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+                f"WHERE {where} ORDER BY rank LIMIT ?",
+                params
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [
+            {
+                'text': text,
+                'document_id': document_id,
+                'chunk_index': chunk_index,
+                'filename': filename,
+                'score': None,
+                # FTS5 bm25() is negated so that ORDER BY rank puts the best match first
+                'bm25': -rank,
+                'metadata': {
+                    'document_id': document_id,
+                    'chunk_index': chunk_index,
+                    'filename': filename,
+                    'chatbot_id': chatbot_id,
+                    'start_offset': start_offset,
+                    'end_offset': end_offset,
+                    'token_count': token_count,
+                }
+            }
+            for document_id, chunk_index, text, filename, start_offset, end_offset, token_count, rank in rows
+        ]
@@ -0,0 +1,742 @@
+"""
+In-process vector store
+
+Each chatbot's collection lives in its own directory under
+LOCAL_VECTOR_STORE_DIR:
+  - vectors.f32: append-only float32 matrix, one row per slot, read through
+    np.memmap so only the pages a search touches are resident
+  - rows.sqlite3: chunk text and metadata keyed by slot; deletes are
+    tombstones until the collection is compacted, which renumbers the slots
+    and bumps the generation stored next to them
+  - hnsw.bin: HNSW graph over the slots (only above LOCAL_HNSW_MIN_VECTORS
+    and when hnswlib is installed)
+  - manifest.json: vector count and dimension; rewritten last on every write,
+    so readers never see rows whose vectors are not on disk yet
+
+Small collections are searched exactly with one matrix-vector product; this is
+faster than a network round trip to Zilliz for the corpus sizes most chatbots
+have. Scores are squared L2 distances, as with Zilliz.
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_DIMENSION,
+    LOCAL_VECTOR_STORE_DIR,
+    LOCAL_HNSW_MIN_VECTORS,
+    LOCAL_HNSW_M,
+    LOCAL_HNSW_EF_CONSTRUCTION,
+    LOCAL_HNSW_EF_SEARCH,
+    LOCAL_VECTOR_STORE_CACHE_ITEMS,
+    ZILLIZ_INSERT_BATCH_ROWS,
+)
+from app.services.vector_store import VectorStore, VectorStoreWriter
+
+try:
+    import hnswlib
+except ImportError:  # optional: exact search is used for every collection size
+    hnswlib = None
+
+
+# Metadata columns that search filters may refer to
+FILTER_COLUMNS = ("document_id", "chunk_index", "filename", "chatbot_id", "user_id")
+
+# HNSW candidates fetched per requested result, to survive tombstones and filters
+HNSW_OVERFETCH = 4
+
+# Compact on checkpoint once tombstones outnumber live rows
+COMPACT_DELETED_RATIO = 1.0
+
+# Attempts at a search whose snapshot keeps being outdated by compactions
+SEARCH_ATTEMPTS = 3
+
+_ROW_COLUMNS = (
+    "id", "document_id", "chunk_index", "text", "filename", "chatbot_id", "user_id",
+    "start_offset", "end_offset", "token_count",
+)
+
+
+class _StaleSnapshot(Exception):
+    """The collection was compacted after the snapshot was taken, so its slot numbers are outdated"""
+
+
+class _Snapshot:
+    """Immutable view of a collection's vectors used by searches"""
+
+    def __init__(
+        self,
+        count: int,
+        hnsw_count: int,
+        vectors: np.ndarray,
+        live: np.ndarray,
+        index=None,
+        generation: int = 0
+    ):
+        self.count = count
+        self.hnsw_count = hnsw_count
+        self.vectors = vectors
+        self.live = live
+        self.live_count = int(live.sum())
+        # Squared row norms, for ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2
+        self.norms = np.einsum("ij,ij->i", vectors, vectors) if count else np.empty(0, dtype=np.float32)
+        self.index = index
+        # Slot numbering the vectors belong to; rows are only resolved under the same one
+        self.generation = generation
+
+
+class LocalCollection:
+    """One chatbot's vectors and chunk rows on local disk"""
+
+    def __init__(self, directory: str, dimension: int = EMBEDDING_DIMENSION):
+        self.directory = directory
+        self.dimension = dimension
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.rows_path = os.path.join(directory, "rows.sqlite3")
+        self.hnsw_path = os.path.join(directory, "hnsw.bin")
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+        self._lock = threading.RLock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._snapshot_mtime: Optional[int] = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.rows_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                slot INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                filename TEXT,
+                chatbot_id TEXT,
+                user_id TEXT,
+                start_offset INTEGER NOT NULL DEFAULT 0,
+                end_offset INTEGER NOT NULL DEFAULT 0,
+                token_count INTEGER NOT NULL DEFAULT 0,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks(document_id, chunk_index)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+        manifest = self._read_manifest()
+        if manifest is None:
+            self._write_manifest({"dimension": dimension, "count": 0, "hnsw_count": 0, "version": 0})
+        elif manifest["dimension"] != dimension:
+            raise ValueError(
+                f"Local collection {directory} has dimension {manifest['dimension']}, expected {dimension}"
+            )
+
+    def close(self):
+        """Close the connection; only for a handle nothing else holds (LocalVectorStore never closes shared ones)"""
+        with self._lock:
+            self._conn.close()
+            self._snapshot = None
+
+    # ------------------------------------------------------------------ writes
+
+    def append(self, rows: List[tuple], embeddings: np.ndarray):
+        """Append rows (values in _ROW_COLUMNS order) and their (n, dimension) vectors"""
+        if not rows:
+            return
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.shape != (len(rows), self.dimension):
+            raise ValueError(f"Expected embeddings of shape ({len(rows)}, {self.dimension}), got {embeddings.shape}")
+
+        with self._lock:
+            manifest = self._read_manifest()
+            count = manifest["count"]
+
+            # Vectors first: the file may hold rows past manifest["count"] after a
+            # crash, so truncate to the committed size before appending
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(count * self.dimension * 4)
+                f.write(embeddings.tobytes())
+
+            placeholders = ", ".join("?" * (len(_ROW_COLUMNS) + 1))
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM chunks WHERE slot >= ?", (count,))
+                self._conn.executemany(
+                    f"INSERT INTO chunks (slot, {', '.join(_ROW_COLUMNS)}) VALUES ({placeholders})",
+                    [(count + i,) + tuple(row) for i, row in enumerate(rows)]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            manifest["count"] = count + len(rows)
+            self._write_manifest(manifest)
+
+    def delete_document(self, document_id: str) -> int:
+        """Tombstone a document's rows; returns the number of rows deleted"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE chunks SET deleted = 1 WHERE document_id = ? AND deleted = 0", (document_id,)
+            )
+            if cursor.rowcount:
+                self._write_manifest(self._read_manifest())
+            return cursor.rowcount
+
+    def checkpoint(self):
+        """Compact when mostly tombstones and bring the HNSW index up to date"""
+        with self._lock:
+            live, deleted = self._conn.execute(
+                "SELECT COALESCE(SUM(deleted = 0), 0), COALESCE(SUM(deleted), 0) FROM chunks"
+            ).fetchone()
+            if deleted and deleted >= COMPACT_DELETED_RATIO * max(live, 1):
+                self._compact()
+            self._update_hnsw()
+
+    def _compact(self):
+        """Rewrite vectors and rows without tombstones (slots are renumbered)"""
+        manifest = self._read_manifest()
+        vectors = self._open_vectors(manifest["count"])
+        slots = np.array(
+            [slot for (slot,) in self._conn.execute("SELECT slot FROM chunks WHERE deleted = 0 ORDER BY slot")],
+            dtype=np.int64
+        )
+
+        tmp_path = self.vectors_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(slots), 8192):
+                f.write(np.ascontiguousarray(vectors[slots[start:start + 8192]]).tobytes())
+        del vectors
+
+        columns = ", ".join(_ROW_COLUMNS)
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("CREATE TEMP TABLE live AS SELECT * FROM chunks WHERE deleted = 0")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute(
+                f"INSERT INTO chunks (slot, {columns}) "
+                f"SELECT ROW_NUMBER() OVER (ORDER BY slot) - 1, {columns} FROM live"
+            )
+            self._conn.execute("DROP TABLE live")
+            # Searches holding slots of the old numbering must not resolve them against the new one
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+            )
+            os.replace(tmp_path, self.vectors_path)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+        manifest.update({"count": len(slots), "hnsw_count": 0})
+        if os.path.exists(self.hnsw_path):
+            os.unlink(self.hnsw_path)
+        self._write_manifest(manifest)
+        print(f"[VECTOR_STORE] Compacted {self.directory} to {len(slots)} vectors")
+
+    def _update_hnsw(self):
+        """Add vectors appended since the last build to the HNSW index, building it if needed"""
+        manifest = self._read_manifest()
+        count, hnsw_count = manifest["count"], manifest["hnsw_count"]
+        if hnswlib is None or count < LOCAL_HNSW_MIN_VECTORS or hnsw_count >= count:
+            return
+
+        index = hnswlib.Index(space="l2", dim=self.dimension)
+        if hnsw_count and os.path.exists(self.hnsw_path):
+            index.load_index(self.hnsw_path, max_elements=count)
+        else:
+            hnsw_count = 0
+            index.init_index(max_elements=count, ef_construction=LOCAL_HNSW_EF_CONSTRUCTION, M=LOCAL_HNSW_M)
+
+        vectors = self._open_vectors(count)
+        for start in range(hnsw_count, count, 8192):
+            end = min(start + 8192, count)
+            index.add_items(np.asarray(vectors[start:end]), np.arange(start, end))
+        del vectors
+
+        tmp_path = self.hnsw_path + ".tmp"
+        index.save_index(tmp_path)
+        os.replace(tmp_path, self.hnsw_path)
+        manifest["hnsw_count"] = count
+        self._write_manifest(manifest)
+        print(f"[VECTOR_STORE] HNSW index for {self.directory} covers {count} vectors")
+
+    # ----------------------------------------------------------------- queries
+
+    def search(self, query: np.ndarray, top_k: int, filters: Optional[Dict] = None) -> List[Dict]:
+        """Nearest live rows to a (dimension,) or (1, dimension) query, best first"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        for _ in range(SEARCH_ATTEMPTS):
+            try:
+                return self._search_snapshot(self._current_snapshot(), query, top_k, filters)
+            except _StaleSnapshot:
+                # Compacted mid-search: search again over the new layout
+                with self._lock:
+                    self._snapshot = None
+        print(f"[VECTOR_STORE] Search of {self.directory} kept racing compactions; returning no results")
+        return []
+
+    def _search_snapshot(
+        self,
+        snapshot: _Snapshot,
+        query: np.ndarray,
+        top_k: int,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        if not snapshot.live_count or top_k <= 0:
+            return []
+
+        candidates = self._filter_slots(snapshot, filters) if filters else None
+        if candidates is not None and not len(candidates):
+            return []
+
+        if snapshot.index is not None and (candidates is None or len(candidates) > 4 * top_k):
+            slots, distances = self._search_hnsw(snapshot, query, top_k, candidates)
+        else:
+            slots, distances = self._search_exact(snapshot, query, top_k, candidates)
+
+        return self._rows_for(snapshot, slots, distances)
+
+    def _search_exact(
+        self,
+        snapshot: _Snapshot,
+        query: np.ndarray,
+        top_k: int,
+        candidates: Optional[np.ndarray] = None,
+        start: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force squared L2 over candidate slots (or every slot from `start`)"""
+        if candidates is None:
+            slots = np.arange(start, snapshot.count)
+            distances = snapshot.norms[start:] - 2.0 * (snapshot.vectors[start:] @ query)
+            distances[~snapshot.live[start:]] = np.inf
+        else:
+            slots = candidates
+            distances = snapshot.norms[slots] - 2.0 * (snapshot.vectors[slots] @ query)
+        distances += float(query @ query)
+
+        k = min(top_k, len(slots))
+        if not k:
+            return slots[:0], distances[:0]
+        best = np.argpartition(distances, k - 1)[:k] if k < len(slots) else np.arange(len(slots))
+        best = best[np.argsort(distances[best])]
+        best = best[np.isfinite(distances[best])]
+        return slots[best], distances[best]
+
+    def _search_hnsw(
+        self,
+        snapshot: _Snapshot,
+        query: np.ndarray,
+        top_k: int,
+        candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate search over indexed slots, merged with an exact scan of the unindexed tail"""
+        # hnswlib searches with max(ef, k); ef itself is set once when the index is loaded
+        k = min(snapshot.hnsw_count, top_k * HNSW_OVERFETCH)
+        labels, distances = snapshot.index.knn_query(query, k=k)
+        slots, distances = labels[0].astype(np.int64), distances[0]
+
+        keep = snapshot.live[slots]
+        if candidates is not None:
+            keep &= np.isin(slots, candidates)
+        slots, distances = slots[keep], distances[keep]
+
+        if snapshot.hnsw_count < snapshot.count:
+            tail = None if candidates is None else candidates[candidates >= snapshot.hnsw_count]
+            tail_slots, tail_distances = self._search_exact(
+                snapshot, query, top_k, tail, start=snapshot.hnsw_count
+            )
+            slots = np.concatenate([slots, tail_slots])
+            distances = np.concatenate([distances, tail_distances])
+
+        if len(slots) < min(top_k, snapshot.live_count if candidates is None else len(candidates)):
+            # Too many candidates were filtered out; fall back to exact search
+            return self._search_exact(snapshot, query, top_k, candidates)
+
+        order = np.argsort(distances)[:top_k]
+        return slots[order], distances[order]
+
+    def _filter_slots(self, snapshot: _Snapshot, filters: Dict) -> np.ndarray:
+        """Live slots (in the snapshot's numbering) whose metadata equals every filter value"""
+        unknown = set(filters) - set(FILTER_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unsupported filter fields: {sorted(unknown)}")
+        where = " AND ".join(f"{key} = ?" for key in filters)
+        rows = self._read_rows(
+            snapshot,
+            f"SELECT slot FROM chunks WHERE deleted = 0 AND {where} ORDER BY slot",
+            tuple(filters.values())
+        )
+        return np.array([slot for (slot,) in rows], dtype=np.int64)
+
+    def _rows_for(self, snapshot: _Snapshot, slots: np.ndarray, distances: np.ndarray) -> List[Dict]:
+        if not len(slots):
+            return []
+        placeholders = ", ".join("?" * len(slots))
+        rows = self._read_rows(
+            snapshot,
+            f"SELECT slot, {', '.join(_ROW_COLUMNS)} FROM chunks WHERE slot IN ({placeholders})",
+            [int(slot) for slot in slots]
+        )
+        by_slot = {row[0]: dict(zip(_ROW_COLUMNS, row[1:])) for row in rows}
+
+        results = []
+        for slot, distance in zip(slots, distances):
+            row = by_slot.get(int(slot))
+            if row is None:
+                continue
+            results.append({
+                'text': row['text'],
+                'document_id': row['document_id'],
+                'chunk_index': row['chunk_index'],
+                'filename': row['filename'],
+                'score': float(distance),
+                'metadata': {
+                    'document_id': row['document_id'],
+                    'chunk_index': row['chunk_index'],
+                    'filename': row['filename'],
+                    'chatbot_id': row['chatbot_id'],
+                    'start_offset': row['start_offset'],
+                    'end_offset': row['end_offset'],
+                    'token_count': row['token_count'],
+                }
+            })
+        return results
+
+    def _read_rows(self, snapshot: _Snapshot, sql: str, parameters) -> List[tuple]:
+        """Run a slot query in one read transaction; raises _StaleSnapshot if slots were renumbered since the snapshot"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if self._generation() != snapshot.generation:
+                    raise _StaleSnapshot()
+                return self._conn.execute(sql, parameters).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+
+    def document_ids(self) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT document_id FROM chunks WHERE deleted = 0").fetchall()
+        return {document_id for (document_id,) in rows}
+
+    def has_hnsw_index(self) -> bool:
+        return self._current_snapshot().index is not None
+
+    def live_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks WHERE deleted = 0").fetchone()[0]
+
+    def export_documents(self, batch_rows: int = 1000) -> Iterator[Dict]:
+        """
+        Yield live rows grouped by document, in runs of consecutive chunks of at
+        most batch_rows, with their vectors (used to move a collection to Zilliz).
+        """
+        with self._lock:
+            vectors = self._open_vectors(self._read_manifest()["count"])
+            rows = self._conn.execute(
+                f"SELECT slot, {', '.join(_ROW_COLUMNS)} FROM chunks WHERE deleted = 0 "
+                f"ORDER BY document_id, chunk_index"
+            ).fetchall()
+
+        run: List[tuple] = []
+        for row in rows:
+            if run and (
+                row[2] != run[-1][2] or row[3] != run[-1][3] + 1 or len(run) >= batch_rows
+            ):
+                yield self._export_run(run, vectors)
+                run = []
+            run.append(row)
+        if run:
+            yield self._export_run(run, vectors)
+
+    @staticmethod
+    def _export_run(run: List[tuple], vectors: np.ndarray) -> Dict:
+        fields = [dict(zip(_ROW_COLUMNS, row[1:])) for row in run]
+        return {
+            "document_id": fields[0]["document_id"],
+            "filename": fields[0]["filename"],
+            "user_id": fields[0]["user_id"],
+            "first_chunk_index": fields[0]["chunk_index"],
+            "chunks": [field["text"] for field in fields],
+            "offsets": [(field["start_offset"], field["end_offset"]) for field in fields],
+            "token_counts": [field["token_count"] for field in fields],
+            "embeddings": np.ascontiguousarray(vectors[[row[0] for row in run]]),
+        }
+
+    # ------------------------------------------------------------------- state
+
+    def _current_snapshot(self) -> _Snapshot:
+        """Snapshot for searching, reloaded when the manifest changed (here or in another process)"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        snapshot = self._snapshot
+        if snapshot is not None and mtime == self._snapshot_mtime:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and mtime == self._snapshot_mtime:
+                return self._snapshot
+            manifest = self._read_manifest()
+            count, hnsw_count = manifest["count"], manifest["hnsw_count"]
+            vectors = self._open_vectors(count)
+
+            live = np.ones(count, dtype=bool)
+            self._conn.execute("BEGIN")
+            try:
+                generation = self._generation()
+                deleted = [slot for (slot,) in self._conn.execute(
+                    "SELECT slot FROM chunks WHERE deleted = 1 AND slot < ?", (count,)
+                )]
+            finally:
+                self._conn.execute("COMMIT")
+            live[deleted] = False
+
+            index = None
+            if hnswlib is not None and hnsw_count and os.path.exists(self.hnsw_path):
+                index = hnswlib.Index(space="l2", dim=self.dimension)
+                index.load_index(self.hnsw_path, max_elements=hnsw_count)
+                # Set once: searches share the index across threads
+                index.set_ef(LOCAL_HNSW_EF_SEARCH)
+
+            self._snapshot = _Snapshot(
+                count, hnsw_count if index is not None else 0, vectors, live, index, generation
+            )
+            self._snapshot_mtime = mtime
+            return self._snapshot
+
+    def _generation(self) -> int:
+        """Number of compactions so far (caller holds the lock)"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _open_vectors(self, count: int) -> np.ndarray:
+        if not count:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dimension))
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: Dict):
+        manifest["version"] = manifest.get("version", 0) + 1
+        # Our own writes always invalidate the snapshot, whatever the mtime resolution
+        self._snapshot = None
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class LocalVectorStore(VectorStore):
+    """VectorStore backed by LocalCollection directories"""
+
+    name = "local"
+
+    def __init__(
+        self,
+        root: str = LOCAL_VECTOR_STORE_DIR,
+        dimension: int = EMBEDDING_DIMENSION,
+        cache_items: int = LOCAL_VECTOR_STORE_CACHE_ITEMS
+    ):
+        self.root = root
+        self.dimension = dimension
+        self.cache_items = max(1, cache_items)
+        self._collections: "OrderedDict[str, LocalCollection]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_collection_path(self, chatbot_id: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^a-zA-Z0-9_-]", "_", chatbot_id))
+
+    def collection_exists(self, chatbot_id: str) -> bool:
+        return os.path.exists(os.path.join(self.get_collection_path(chatbot_id), "manifest.json"))
+
+    def get_collection(self, chatbot_id: str) -> Optional[LocalCollection]:
+        """Open (or reuse) an existing collection"""
+        if not self.collection_exists(chatbot_id):
+            return None
+        return self.create_collection_if_not_exists(chatbot_id)
+
+    def create_collection_if_not_exists(self, chatbot_id: str) -> LocalCollection:
+        path = self.get_collection_path(chatbot_id)
+        with self._lock:
+            collection = self._collections.get(path)
+            if collection is not None:
+                self._collections.move_to_end(path)
+                return collection
+
+            created = not os.path.exists(os.path.join(path, "manifest.json"))
+            collection = LocalCollection(path, self.dimension)
+            self._collections[path] = collection
+            while len(self._collections) > self.cache_items:
+                # Not closed: a running writer or search may still hold it. Its connection
+                # and memmap are released when the last reference goes away.
+                self._collections.popitem(last=False)
+        if created:
+            print(f"[VECTOR_STORE] Created local collection for chatbot {chatbot_id}")
+        return collection
+
+    def invalidate_collection(self, chatbot_id: str):
+        """Drop the cached handle so the next use reopens the collection (current holders keep theirs)"""
+        with self._lock:
+            self._collections.pop(self.get_collection_path(chatbot_id), None)
+
+    def reset_collection(self, chatbot_id: str) -> LocalCollection:
+        """Remove every row (and any older-dimension data) and start an empty collection"""
+        self.delete_collection(chatbot_id)
+        return self.create_collection_if_not_exists(chatbot_id)
+
+    def add_documents(
+        self,
+        chatbot_id: str,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        metadata: Optional[Dict] = None,
+        embeddings: Optional[np.ndarray] = None,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None
+    ) -> int:
+        if not chunks:
+            return 0
+        if embeddings is None:
+            from app.services.embedding_service import embedding_service
+            embeddings = embedding_service.generate_embeddings(chunks)
+
+        writer = self.ingestion_writer(chatbot_id)
+        writer.add(document_id, chunks, filename, user_id, embeddings, offsets, token_counts)
+        writer.checkpoint()
+        print(f"[VECTOR_STORE] Added {len(chunks)} chunks to local collection for chatbot {chatbot_id}")
+        return len(chunks)
+
+    def ingestion_writer(self, chatbot_id: str) -> "LocalIngestionWriter":
+        return LocalIngestionWriter(self, chatbot_id)
+
+    def search_by_vector(
+        self,
+        chatbot_id: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        collection = self.get_collection(chatbot_id)
+        if collection is None:
+            return []
+        return collection.search(query_embedding, top_k, filters)
+
+    def delete_document(self, chatbot_id: str, document_id: str, flush: bool = True):
+        collection = self.get_collection(chatbot_id)
+        if collection is None:
+            print(f"[VECTOR_STORE] No local collection for chatbot {chatbot_id}; nothing to delete for document {document_id}")
+            return
+        collection.delete_document(document_id)
+        print(f"[VECTOR_STORE] Deleted document {document_id} from chatbot {chatbot_id}")
+
+    def delete_collection(self, chatbot_id: str):
+        self.invalidate_collection(chatbot_id)
+        path = self.get_collection_path(chatbot_id)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+            print(f"[VECTOR_STORE] Deleted local collection for chatbot {chatbot_id}")
+
+    def list_document_ids(self, chatbot_id: str) -> Set[str]:
+        collection = self.get_collection(chatbot_id)
+        return collection.document_ids() if collection is not None else set()
+
+    def get_collection_stats(self, chatbot_id: str) -> Dict:
+        collection = self.get_collection(chatbot_id)
+        if collection is None:
+            return {"num_entities": 0}
+        return {
+            "num_entities": collection.live_count(),
+            "collection_name": os.path.basename(collection.directory),
+            "backend": self.name,
+            "hnsw": collection.has_hnsw_index(),
+        }
+
+
+class LocalIngestionWriter(VectorStoreWriter):
+    """Buffers rows for one ingestion job and appends them to the collection in batches"""
+
+    def __init__(self, store: LocalVectorStore, chatbot_id: str, max_batch_rows: int = ZILLIZ_INSERT_BATCH_ROWS):
+        self.store = store
+        self.chatbot_id = chatbot_id
+        self.max_batch_rows = max_batch_rows
+        self.collection = store.create_collection_if_not_exists(chatbot_id)
+
+        self._rows: List[tuple] = []
+        self._embeddings: List[np.ndarray] = []
+        self._pending_documents: List[str] = []
+        self.inserted_rows = 0
+
+    def add(
+        self,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        embeddings: np.ndarray,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None,
+        first_chunk_index: int = 0
+    ) -> List[str]:
+        if not chunks:
+            return []
+        if offsets is None:
+            offsets = [(0, 0)] * len(chunks)
+        if token_counts is None:
+            token_counts = [0] * len(chunks)
+
+        for i, chunk in enumerate(chunks):
+            chunk_index = first_chunk_index + i
+            start, end = offsets[i]
+            self._rows.append((
+                f"{document_id}_{chunk_index}", document_id, chunk_index, chunk, filename,
+                self.chatbot_id, user_id, start, end, token_counts[i],
+            ))
+        self._embeddings.append(embeddings)
+        self._pending_documents.append(document_id)
+
+        if len(self._rows) >= self.max_batch_rows:
+            return self._append_buffered()
+        return []
+
+    def delete_document(self, document_id: str):
+        self.collection.delete_document(document_id)
+
+    def checkpoint(self) -> List[str]:
+        committed = self._append_buffered()
+        self.collection.checkpoint()
+        print(f"[VECTOR_STORE] Checkpoint for chatbot {self.chatbot_id}: {self.inserted_rows} rows written locally")
+        return committed
+
+    def _append_buffered(self) -> List[str]:
+        """Append buffered rows; the buffer is emptied even if the append fails"""
+        if not self._rows:
+            return []
+        rows, committed = self._rows, self._pending_documents
+        embeddings = np.concatenate(self._embeddings) if len(self._embeddings) > 1 else self._embeddings[0]
+        self._rows = []
+        self._embeddings = []
+        self._pending_documents = []
+
+        self.collection.append(rows, embeddings)
+        self.inserted_rows += len(rows)
+        return committed
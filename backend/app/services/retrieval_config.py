@@ -0,0 +1,95 @@
+"""
+Per-chatbot retrieval settings
+
+scripts/tune_retrieval.py measures recall@k and search latency of a chatbot's
+collection against exact nearest neighbors and writes the recommended
+settings to RETRIEVAL_CONFIG_DIR/<chatbot_id>.json:
+
+    {
+        "top_k": 8,                       # replaces CHAT_TOP_K
+        "relevance_threshold_l2": 1.32,   # replaces RELEVANCE_THRESHOLD_L2
+        "index_type": "IVF_FLAT",         # index the search params were tuned on
+        "search_params": {"nprobe": 16},  # used only while the collection has that index
+        ...                               # measurements (recall, p50_ms, p99_ms, generated_at)
+    }
+
+Any missing key falls back to the global setting.
+"""
+
+import json
+import os
+import re
+from typing import Dict, Optional
+
+from app.core.config import RETRIEVAL_CONFIG_CACHE_TTL_SECONDS, RETRIEVAL_CONFIG_DIR
+from app.utils.ttl_cache import TTLCache
+
+
+class RetrievalConfigStore:
+    """Tuned retrieval settings, one JSON file per chatbot, cached in memory"""
+
+    def __init__(self, root: str = RETRIEVAL_CONFIG_DIR, ttl_seconds: float = RETRIEVAL_CONFIG_CACHE_TTL_SECONDS):
+        self.root = root
+        # Missing files are cached too, so untuned chatbots cost no stat() per query
+        self._cache = TTLCache(ttl_seconds=ttl_seconds, max_items=4096, negative_ttl_seconds=ttl_seconds)
+
+    def get_config_path(self, chatbot_id: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^a-zA-Z0-9_-]", "_", chatbot_id) + ".json")
+
+    def get(self, chatbot_id: Optional[str]) -> Dict:
+        """The chatbot's tuned settings ({} if it has none)"""
+        if not chatbot_id:
+            return {}
+        found, config = self._cache.lookup(chatbot_id)
+        if not found:
+            config = self._load(chatbot_id)
+            self._cache.set(chatbot_id, config)
+        return config or {}
+
+    def _load(self, chatbot_id: str) -> Optional[Dict]:
+        path = self.get_config_path(chatbot_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[RETRIEVAL] Ignoring unreadable retrieval config {path}: {e}")
+            return None
+        return config if isinstance(config, dict) else None
+
+    def save(self, chatbot_id: str, config: Dict) -> str:
+        """Write a chatbot's settings (atomically) and return the file path"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.get_config_path(chatbot_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        self._cache.invalidate(chatbot_id)
+        return path
+
+    def delete(self, chatbot_id: str):
+        try:
+            os.unlink(self.get_config_path(chatbot_id))
+        except FileNotFoundError:
+            pass
+        self._cache.invalidate(chatbot_id)
+
+    def top_k(self, chatbot_id: Optional[str], default: int) -> int:
+        value = self.get(chatbot_id).get("top_k")
+        return int(value) if value else default
+
+    def relevance_threshold(self, chatbot_id: Optional[str], default: float) -> float:
+        value = self.get(chatbot_id).get("relevance_threshold_l2")
+        return float(value) if value is not None else default
+
+    def search_params(self, chatbot_id: Optional[str], index_type: str) -> Optional[Dict]:
+        """Tuned search params, if they were tuned on the collection's current index type"""
+        config = self.get(chatbot_id)
+        if config.get("index_type") != index_type or not config.get("search_params"):
+            return None
+        return config["search_params"]
+
+
+retrieval_config = RetrievalConfigStore()
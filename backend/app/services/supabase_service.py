@@ -2,9 +2,61 @@
 Supabase service for database operations
 """
 
+import hashlib
+import tempfile
+import threading
+import time
+
+import httpx
+from postgrest.exceptions import APIError
+from postgrest.utils import SyncClient
 from supabase import create_client, Client
-from app.core.config import SUPABASE_URL, SUPABASE_SERVICE_KEY
-from typing import Optional, Dict, List
+from app.core.config import (
+    SUPABASE_URL,
+    SUPABASE_SERVICE_KEY,
+    SUPABASE_MAX_CONNECTIONS,
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    CHATBOT_CACHE_TTL_SECONDS,
+    CHATBOT_CACHE_NEGATIVE_TTL_SECONDS,
+    CHATBOT_CACHE_MAX_ITEMS,
+    CHATBOT_OWNER_CACHE_TTL_SECONDS,
+    CHATBOT_OWNER_DENIED_TTL_SECONDS,
+    DOCUMENT_STATUS_FLUSH_INTERVAL_SECONDS,
+    DOCUMENT_STATUS_BATCH_SIZE,
+    INGESTION_SPOOL_MAX_MEMORY_BYTES,
+    INGESTION_SPOOL_DIR,
+    INGESTION_DOWNLOAD_CHUNK_BYTES,
+)
+from app.utils.ttl_cache import TTLCache
+from typing import BinaryIO, Optional, Dict, List, Tuple
+
+
+# Storage bucket holding uploaded chatbot documents
+STORAGE_BUCKET = "chat-documents"
+
+# Columns of a chatbot the chat path reads (its prompt)
+CHATBOT_PROFILE_COLUMNS = "id, name, purpose"
+
+# Per-chatbot chunking overrides, added by migrations/003; read by ingestion only
+CHATBOT_CHUNKING_COLUMNS = "chunking_mode, chunk_token_size, chunk_token_overlap"
+
+# Postgres error code for a column that does not exist (migration not applied)
+UNDEFINED_COLUMN = "42703"
+
+# Process-wide cache of chatbot profiles (chatbot ID -> profile, None for unknown IDs),
+# shared by every SupabaseService instance
+_chatbot_profiles = TTLCache(
+    ttl_seconds=CHATBOT_CACHE_TTL_SECONDS,
+    max_items=CHATBOT_CACHE_MAX_ITEMS,
+    negative_ttl_seconds=CHATBOT_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+# Process-wide cache of ownership decisions ((user_id, chatbot_id) -> True / False)
+_chatbot_owners = TTLCache(
+    ttl_seconds=CHATBOT_OWNER_CACHE_TTL_SECONDS,
+    max_items=CHATBOT_CACHE_MAX_ITEMS,
+)
 
 
 class SupabaseService:
@@ -16,6 +68,27 @@ class SupabaseService:
             raise ValueError("Supabase URL and Service Key must be set in environment variables")
         
         self.client: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        self._configure_pool()
+    
+    def _configure_pool(self):
+        """Replace the PostgREST session with one using our pool size and keep-alive settings"""
+        postgrest = self.client.postgrest
+        session = postgrest.session
+        postgrest.session = SyncClient(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=session.timeout,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        session.close()
+    
+    def close(self):
+        """Close pooled connections"""
+        self.client.postgrest.aclose()
     
     def get_document_metadata(self, document_id: str) -> Optional[Dict]:
         """Get document metadata by ID"""
@@ -66,45 +139,169 @@ class SupabaseService:
         except Exception as e:
             print(f"Error resetting document statuses: {e}")
             return False
-
+    
+    @staticmethod
+    def document_status_fields(
+        status: str,
+        chunk_count: Optional[int] = None,
+        error_message: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        chunk_params: Optional[Dict] = None
+    ) -> Dict:
+        """Columns written for a status transition (None arguments leave their column unchanged)"""
+        update_data = {"status": status}
+        
+        if chunk_count is not None:
+            update_data["chunk_count"] = chunk_count
+        
+        if error_message is not None:
+            update_data["error_message"] = error_message
+        
+        if content_hash is not None:
+            update_data["content_hash"] = content_hash
+        
+        if chunk_params is not None:
+            update_data["chunk_params"] = chunk_params
+        
+        if status == "completed":
+            from datetime import datetime
+            update_data["processed_at"] = datetime.utcnow().isoformat()
+        
+        return update_data
+    
     def update_document_status(
         self,
         document_id: str,
         status: str,
         chunk_count: Optional[int] = None,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        chunk_params: Optional[Dict] = None
     ) -> bool:
-        """Update document metadata status"""
+        """
+        Update document metadata status.
+        
+        content_hash and chunk_params record what was indexed so incremental
+        re-ingestion can skip unchanged documents.
+        """
         try:
-            update_data = {"status": status}
-            
-            if chunk_count is not None:
-                update_data["chunk_count"] = chunk_count
-            
-            if error_message is not None:
-                update_data["error_message"] = error_message
-            
-            if status == "completed":
-                from datetime import datetime
-                update_data["processed_at"] = datetime.utcnow().isoformat()
-            
+            update_data = self.document_status_fields(status, chunk_count, error_message, content_hash, chunk_params)
             self.client.table("document_metadata").update(update_data).eq("id", document_id).execute()
             return True
         except Exception as e:
             print(f"Error updating document status: {e}")
             return False
     
-    def get_chatbot(self, chatbot_id: str) -> Optional[Dict]:
-        """Get chatbot by ID"""
+    def update_document_statuses(self, updates: Dict[str, Dict]) -> bool:
+        """
+        Apply several status transitions (document ID -> document_status_fields)
+        in one call through the update_document_statuses database function
+        (migrations/004). Falls back to one UPDATE per document if the function
+        is not available.
+        """
+        if not updates:
+            return True
+        rows = [{"id": document_id, **fields} for document_id, fields in updates.items()]
         try:
-            response = self.client.table("chatbots").select("*").eq("id", chatbot_id).execute()
-            if response.data:
-                return response.data[0]
-            return None
+            self.client.rpc("update_document_statuses", {"updates": rows}).execute()
+            return True
+        except Exception as e:
+            print(f"Error bulk updating document statuses ({len(rows)} documents), updating one by one: {e}")
+        
+        ok = True
+        for document_id, fields in updates.items():
+            try:
+                self.client.table("document_metadata").update(fields).eq("id", document_id).execute()
+            except Exception as e:
+                print(f"Error updating document status: {e}")
+                ok = False
+        return ok
+    
+    def status_writer(self) -> "DocumentStatusWriter":
+        """Batched writer for the document status transitions of one ingestion run"""
+        return DocumentStatusWriter(self)
+    
+    def get_chatbot(self, chatbot_id: str, use_cache: bool = True) -> Optional[Dict]:
+        """
+        Get a chatbot's profile (CHATBOT_PROFILE_COLUMNS) by ID.
+        
+        Served from a TTL cache unless use_cache is False, which always reads
+        the table (and refreshes the cache). Lookup errors are not cached.
+        """
+        if use_cache:
+            found, chatbot = _chatbot_profiles.lookup(chatbot_id)
+            if found:
+                return dict(chatbot) if chatbot else None
+        
+        try:
+            response = self.client.table("chatbots").select(CHATBOT_PROFILE_COLUMNS).eq("id", chatbot_id).execute()
         except Exception as e:
             print(f"Error getting chatbot: {e}")
             return None
         
+        chatbot = response.data[0] if response.data else None
+        _chatbot_profiles.set(chatbot_id, chatbot)
+        return dict(chatbot) if chatbot else None
+    
+    def get_chunking_settings(self, chatbot_id: str) -> Dict:
+        """
+        A chatbot's chunking overrides (CHATBOT_CHUNKING_COLUMNS), read fresh.
+        
+        Empty when the chatbot has none or the columns do not exist yet, so the
+        server defaults apply. Other errors are raised: silently using the
+        defaults would make every document look changed and re-embed it.
+        """
+        try:
+            response = self.client.table("chatbots").select(CHATBOT_CHUNKING_COLUMNS).eq("id", chatbot_id).execute()
+        except APIError as e:
+            if e.code == UNDEFINED_COLUMN:
+                return {}
+            raise Exception(f"Failed to read chunking settings of chatbot {chatbot_id}: {e}")
+        return response.data[0] if response.data else {}
+    
+    @staticmethod
+    def invalidate_chatbot(chatbot_id: str):
+        """Drop a chatbot's cached profile and ownership decisions (call after it is updated or deleted)"""
+        _chatbot_profiles.invalidate(chatbot_id)
+        _chatbot_owners.invalidate_where(lambda key: key[1] == chatbot_id)
+    
+    @staticmethod
+    def chatbot_cache_stats() -> Dict:
+        """Hit rate, size and staleness of the chatbot profile cache"""
+        return _chatbot_profiles.stats()
+    
+    @staticmethod
+    def owner_cache_stats() -> Dict:
+        """Hit rate, size and staleness of the ownership decision cache"""
+        return _chatbot_owners.stats()
+    
+    def is_chatbot_owner(self, *, chatbot_id: str, user_id: str) -> Optional[bool]:
+        """
+        Whether user_id owns chatbot_id (cached). Returns None if the lookup
+        failed; failures are not cached.
+        """
+        key = (user_id, chatbot_id)
+        allowed = _chatbot_owners.get(key)
+        if allowed is not None:
+            return allowed
+        
+        try:
+            response = (
+                self.client.table("chatbots")
+                .select("id")
+                .eq("id", chatbot_id)
+                .eq("user_id", user_id)
+                .limit(1)
+                .execute()
+            )
+        except Exception as e:
+            print(f"Error checking chatbot owner: {e}")
+            return None
+        
+        allowed = bool(response.data)
+        _chatbot_owners.set(key, allowed, ttl_seconds=None if allowed else CHATBOT_OWNER_DENIED_TTL_SECONDS)
+        return allowed
+    
     def get_chatbot_for_user(self, *, chatbot_id: str, user_id: str) -> Optional[Dict]:
         """Get chatbot by ID, scoped to a specific user (ownership check)."""
         try:
@@ -136,10 +333,81 @@ class SupabaseService:
             print(f"Error getting documents by chatbot: {e}")
             return []
     
+    def create_ingestion_job(self, *, chatbot_id: str, user_id: str, mode: str) -> Optional[Dict]:
+        """
+        Insert a queued ingestion job.
+        Returns None if it could not be created (e.g. another active job exists for the chatbot).
+        """
+        try:
+            response = (
+                self.client.table("ingestion_jobs")
+                .insert({
+                    "chatbot_id": chatbot_id,
+                    "user_id": user_id,
+                    "mode": mode,
+                    "status": "queued",
+                    "progress": {},
+                })
+                .execute()
+            )
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception as e:
+            print(f"Error creating ingestion job: {e}")
+            return None
+    
+    def get_ingestion_job(self, job_id: str, chatbot_id: str) -> Optional[Dict]:
+        """Get an ingestion job by ID, scoped to its chatbot"""
+        try:
+            response = (
+                self.client.table("ingestion_jobs")
+                .select("*")
+                .eq("id", job_id)
+                .eq("chatbot_id", chatbot_id)
+                .execute()
+            )
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception as e:
+            print(f"Error getting ingestion job: {e}")
+            return None
+    
+    def get_active_ingestion_job(self, chatbot_id: str) -> Optional[Dict]:
+        """Get the queued or running ingestion job for a chatbot, if any"""
+        try:
+            response = (
+                self.client.table("ingestion_jobs")
+                .select("*")
+                .eq("chatbot_id", chatbot_id)
+                .in_("status", ["queued", "running"])
+                .order("created_at", desc=True)
+                .limit(1)
+                .execute()
+            )
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception as e:
+            print(f"Error getting active ingestion job: {e}")
+            return None
+    
+    def update_ingestion_job(self, job_id: str, **fields) -> bool:
+        """Update an ingestion job (status, progress, result, error, timestamps)"""
+        try:
+            from datetime import datetime
+            update_data = {**fields, "updated_at": datetime.utcnow().isoformat()}
+            self.client.table("ingestion_jobs").update(update_data).eq("id", job_id).execute()
+            return True
+        except Exception as e:
+            print(f"Error updating ingestion job: {e}")
+            return False
+    
     def download_file(self, file_path: str) -> bytes:
         """Download file from Supabase Storage"""
         try:
-            bucket_name = "chat-documents"
+            bucket_name = STORAGE_BUCKET
             response = self.client.storage.from_(bucket_name).download(file_path)
             
             if isinstance(response, bytes):
@@ -152,4 +420,94 @@ class SupabaseService:
                 return bytes(response) if response else b''
         except Exception as e:
             raise Exception(f"Failed to download file from storage: {e}")
+    
+    def download_to_spool(self, file_path: str) -> Tuple[BinaryIO, str, int]:
+        """
+        Stream a file from Supabase Storage into a spooled temporary file
+        
+        The file stays in memory up to INGESTION_SPOOL_MAX_MEMORY_BYTES and
+        rolls over to disk above that, so a large document is never held
+        whole in memory. The SHA-256 of the content is computed while
+        streaming. Returns (file positioned at the start, hex digest, size);
+        the caller closes the file.
+        """
+        spool = tempfile.SpooledTemporaryFile(
+            max_size=INGESTION_SPOOL_MAX_MEMORY_BYTES,
+            prefix="download-",
+            dir=INGESTION_SPOOL_DIR
+        )
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            # The storage client's session carries the storage base URL and service key headers
+            session = self.client.storage.session
+            with session.stream("GET", f"object/{STORAGE_BUCKET}/{file_path}") as response:
+                if response.is_error:
+                    response.read()
+                    raise Exception(f"HTTP {response.status_code}: {response.text}")
+                for block in response.iter_bytes(INGESTION_DOWNLOAD_CHUNK_BYTES):
+                    spool.write(block)
+                    digest.update(block)
+                    size += len(block)
+            spool.seek(0)
+            return spool, digest.hexdigest(), size
+        except Exception as e:
+            spool.close()
+            raise Exception(f"Failed to download file from storage: {e}")
 
+
+class DocumentStatusWriter:
+    """
+    Collects document status transitions and writes them in bulk.
+    
+    Transitions of the same document are merged (a later status replaces an
+    earlier one that was not written yet), keeping each transition's columns
+    and completion time. Pending transitions are written at most every
+    flush_interval seconds, when max_pending documents are waiting, and on
+    flush(), which callers invoke at the end of a run.
+    """
+    
+    def __init__(
+        self,
+        supabase_service: SupabaseService,
+        flush_interval: float = DOCUMENT_STATUS_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = DOCUMENT_STATUS_BATCH_SIZE,
+    ):
+        self.supabase_service = supabase_service
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # Serializes writes so an older batch never lands after a newer one
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+    
+    def update(
+        self,
+        document_id: str,
+        status: str,
+        chunk_count: Optional[int] = None,
+        error_message: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        chunk_params: Optional[Dict] = None
+    ):
+        """Queue a transition (same arguments as SupabaseService.update_document_status)"""
+        fields = SupabaseService.document_status_fields(status, chunk_count, error_message, content_hash, chunk_params)
+        with self._lock:
+            self._pending.setdefault(document_id, {}).update(fields)
+            due = (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+    
+    def flush(self) -> bool:
+        """Write every pending transition"""
+        with self._flush_lock:
+            with self._lock:
+                updates, self._pending = self._pending, {}
+                self._last_flush = time.monotonic()
+            if not updates:
+                return True
+            return self.supabase_service.update_document_statuses(updates)
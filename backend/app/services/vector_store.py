@@ -0,0 +1,125 @@
+"""
+Vector store interface
+
+A vector store holds one collection of chunk vectors per chatbot. Backends:
+  - ZillizService (zilliz_service.py): Zilliz Cloud / Milvus
+  - LocalVectorStore (local_vector_store.py): in-process NumPy / HNSW search
+    over memory-mapped files
+VectorStoreRouter (vector_store_router.py) picks the backend per chatbot.
+
+Search results are dicts with 'text', 'document_id', 'chunk_index',
+'filename', 'score' (squared L2 distance, lower is better) and 'metadata'.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class VectorStoreWriter(ABC):
+    """Buffered bulk writer for one ingestion into a chatbot's collection"""
+
+    @abstractmethod
+    def add(
+        self,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        embeddings: np.ndarray,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None,
+        first_chunk_index: int = 0
+    ) -> List[str]:
+        """Buffer chunks; returns IDs of documents whose buffered rows have now been written"""
+
+    @abstractmethod
+    def delete_document(self, document_id: str):
+        """Delete a document's existing chunks"""
+
+    @abstractmethod
+    def checkpoint(self) -> List[str]:
+        """Write everything buffered and make it durable; returns newly written document IDs"""
+
+
+class VectorStore(ABC):
+    """Per-chatbot collections of chunk vectors"""
+
+    # Backend name reported in stats ("zilliz", "local")
+    name = ""
+
+    @abstractmethod
+    def create_collection_if_not_exists(self, chatbot_id: str):
+        """Create the chatbot's collection if needed and return the backend's handle"""
+
+    @abstractmethod
+    def collection_exists(self, chatbot_id: str) -> bool:
+        """Whether the chatbot has a collection"""
+
+    @abstractmethod
+    def reset_collection(self, chatbot_id: str):
+        """Empty the chatbot's collection (creating it with the current schema if needed)"""
+
+    @abstractmethod
+    def add_documents(
+        self,
+        chatbot_id: str,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        metadata: Optional[Dict] = None,
+        embeddings: Optional[np.ndarray] = None,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None
+    ) -> int:
+        """Add a document's chunks; returns the number of chunks added"""
+
+    @abstractmethod
+    def ingestion_writer(self, chatbot_id: str) -> VectorStoreWriter:
+        """Buffered writer for bulk ingestion into a chatbot's collection"""
+
+    @abstractmethod
+    def search_by_vector(
+        self,
+        chatbot_id: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Nearest chunks to a (1, dimension) query embedding, best first"""
+
+    @abstractmethod
+    def delete_document(self, chatbot_id: str, document_id: str, flush: bool = True):
+        """Delete all chunks of a document"""
+
+    @abstractmethod
+    def delete_collection(self, chatbot_id: str):
+        """Delete a chatbot's collection (when the chatbot is deleted)"""
+
+    @abstractmethod
+    def list_document_ids(self, chatbot_id: str) -> Set[str]:
+        """IDs of documents that currently have chunks in the collection"""
+
+    @abstractmethod
+    def get_collection_stats(self, chatbot_id: str) -> Dict:
+        """Statistics about a collection; always includes num_entities"""
+
+    def invalidate_collection(self, chatbot_id: str):
+        """Drop any cached state for the collection so the next access reloads it"""
+
+    def search(
+        self,
+        chatbot_id: str,
+        query_text: str,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Embed query_text and search the chatbot's collection"""
+        from app.services.embedding_service import embedding_service
+
+        if not self.collection_exists(chatbot_id):
+            return []
+        query_embedding = embedding_service.generate_embeddings([query_text])
+        return self.search_by_vector(chatbot_id, query_embedding, top_k=top_k, filters=filters)
@@ -0,0 +1,304 @@
+"""
+Per-chatbot vector store routing
+
+VECTOR_STORE_BACKEND selects the backend:
+  - "zilliz" / "local": every chatbot uses that backend
+  - "auto": a chatbot stays on the in-process LocalVectorStore until an
+    ingestion leaves it with more than LOCAL_VECTOR_STORE_MAX_VECTORS vectors,
+    then its collection is copied to Zilliz and routed there from then on
+
+Routes are kept in a small SQLite table next to the local collections.
+Chatbots without a route (indexed before routing existed) are looked up in
+both backends, local first; if Zilliz cannot be checked the call fails
+rather than guessing.
+
+"local" and "auto" keep vectors and routes on local disk, so they need
+LOCAL_VECTOR_STORE_DIR on persistent storage shared by every API replica.
+
+Whatever the backend, the router also keeps each chatbot's BM25 keyword index
+(KeywordIndex) in step with its vectors, for hybrid retrieval.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    VECTOR_STORE_BACKEND,
+    LOCAL_VECTOR_STORE_DIR,
+    LOCAL_VECTOR_STORE_MAX_VECTORS,
+    KEYWORD_INDEX_ENABLED,
+)
+from app.services.keyword_index import KeywordIndex
+from app.services.local_vector_store import LocalVectorStore
+from app.services.retrieval_config import retrieval_config
+from app.services.vector_store import VectorStore, VectorStoreWriter
+
+
+BACKENDS = ("zilliz", "local")
+
+
+class VectorStoreRouter(VectorStore):
+    """VectorStore that forwards each call to the backend a chatbot is routed to"""
+
+    def __init__(
+        self,
+        mode: str = VECTOR_STORE_BACKEND,
+        root: str = LOCAL_VECTOR_STORE_DIR,
+        max_local_vectors: int = LOCAL_VECTOR_STORE_MAX_VECTORS
+    ):
+        if mode not in BACKENDS + ("auto",):
+            raise ValueError(f"VECTOR_STORE_BACKEND must be one of zilliz, local, auto (got {mode!r})")
+        self.mode = mode
+        self.max_local_vectors = max_local_vectors
+        self.local = LocalVectorStore(root)
+        self._zilliz: Optional[VectorStore] = None
+        self.keyword_index: Optional[KeywordIndex] = KeywordIndex() if KEYWORD_INDEX_ENABLED else None
+
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "routes.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS routes (
+                chatbot_id TEXT PRIMARY KEY,
+                backend TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    @property
+    def zilliz(self) -> VectorStore:
+        # Imported on first use so local-only deployments never load pymilvus
+        if self._zilliz is None:
+            from app.services.zilliz_service import zilliz_service
+            self._zilliz = zilliz_service
+        return self._zilliz
+
+    def connect(self):
+        """Open the Zilliz connection up front (at startup) unless every chatbot is local"""
+        if self.mode != "local":
+            self.zilliz.ensure_connected()
+
+    def close(self):
+        if self._zilliz is not None:
+            self._zilliz.close()
+
+    def backend(self, name: str) -> VectorStore:
+        return self.zilliz if name == "zilliz" else self.local
+
+    def backend_name(self, chatbot_id: str) -> str:
+        """Name of the backend serving a chatbot"""
+        if self.mode != "auto":
+            return self.mode
+        with self._lock:
+            row = self._conn.execute("SELECT backend FROM routes WHERE chatbot_id = ?", (chatbot_id,)).fetchone()
+        if row:
+            return row[0]
+        if self.local.collection_exists(chatbot_id):
+            name = "local"
+        else:
+            try:
+                name = "zilliz" if self.zilliz.collection_exists(chatbot_id) else "local"
+            except Exception as e:
+                # Guessing "local" would hide (and later split) a chatbot that lives in Zilliz
+                print(f"[VECTOR_STORE] Could not check Zilliz for chatbot {chatbot_id}: {e}")
+                raise
+        self.set_route(chatbot_id, name)
+        return name
+
+    def set_route(self, chatbot_id: str, name: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routes (chatbot_id, backend, updated_at) VALUES (?, ?, ?)",
+                (chatbot_id, name, time.time())
+            )
+
+    def forget_route(self, chatbot_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM routes WHERE chatbot_id = ?", (chatbot_id,))
+
+    def _store(self, chatbot_id: str) -> VectorStore:
+        return self.backend(self.backend_name(chatbot_id))
+
+    def create_collection_if_not_exists(self, chatbot_id: str):
+        return self._store(chatbot_id).create_collection_if_not_exists(chatbot_id)
+
+    def collection_exists(self, chatbot_id: str) -> bool:
+        return self._store(chatbot_id).collection_exists(chatbot_id)
+
+    def reset_collection(self, chatbot_id: str):
+        if self.keyword_index:
+            self.keyword_index.reset(chatbot_id)
+        return self._store(chatbot_id).reset_collection(chatbot_id)
+
+    def add_documents(
+        self,
+        chatbot_id: str,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        metadata: Optional[Dict] = None,
+        embeddings: Optional[np.ndarray] = None,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None
+    ) -> int:
+        added = self._store(chatbot_id).add_documents(
+            chatbot_id, document_id, chunks, filename, user_id, metadata, embeddings, offsets, token_counts
+        )
+        if self.keyword_index:
+            self.keyword_index.add(chatbot_id, document_id, chunks, filename, offsets, token_counts)
+        return added
+
+    def ingestion_writer(self, chatbot_id: str) -> VectorStoreWriter:
+        name = self.backend_name(chatbot_id)
+        writer = self.backend(name).ingestion_writer(chatbot_id)
+        if self.mode == "auto" and name == "local":
+            writer = _PromotingWriter(self, chatbot_id, writer)
+        if self.keyword_index:
+            writer = _KeywordIndexingWriter(self.keyword_index, chatbot_id, writer)
+        return writer
+
+    def search_by_vector(
+        self,
+        chatbot_id: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        return self._store(chatbot_id).search_by_vector(chatbot_id, query_embedding, top_k=top_k, filters=filters)
+
+    def keyword_search(
+        self,
+        chatbot_id: str,
+        query_text: str,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """BM25 matches for query_text (empty when the keyword index is disabled or not built yet)"""
+        if not self.keyword_index:
+            return []
+        return self.keyword_index.search(chatbot_id, query_text, top_k=top_k, filters=filters)
+
+    def delete_document(self, chatbot_id: str, document_id: str, flush: bool = True):
+        self._store(chatbot_id).delete_document(chatbot_id, document_id, flush=flush)
+        if self.keyword_index:
+            self.keyword_index.delete_document(chatbot_id, document_id)
+
+    def delete_collection(self, chatbot_id: str):
+        self._store(chatbot_id).delete_collection(chatbot_id)
+        if self.keyword_index:
+            self.keyword_index.delete(chatbot_id)
+        retrieval_config.delete(chatbot_id)
+        self.forget_route(chatbot_id)
+
+    def list_document_ids(self, chatbot_id: str) -> Set[str]:
+        return self._store(chatbot_id).list_document_ids(chatbot_id)
+
+    def get_collection_stats(self, chatbot_id: str) -> Dict:
+        stats = self._store(chatbot_id).get_collection_stats(chatbot_id)
+        stats.setdefault("backend", self.backend_name(chatbot_id))
+        return stats
+
+    def invalidate_collection(self, chatbot_id: str):
+        self._store(chatbot_id).invalidate_collection(chatbot_id)
+
+    def promote_to_zilliz(self, chatbot_id: str):
+        """Copy a chatbot's local collection to Zilliz, route it there and drop the local copy"""
+        collection = self.local.get_collection(chatbot_id)
+        if collection is None:
+            return
+        print(f"[VECTOR_STORE] Moving chatbot {chatbot_id} ({collection.live_count()} vectors) to Zilliz")
+
+        self.zilliz.reset_collection(chatbot_id)
+        writer = self.zilliz.ingestion_writer(chatbot_id)
+        for run in collection.export_documents():
+            writer.add(
+                run["document_id"],
+                run["chunks"],
+                run["filename"],
+                run["user_id"],
+                run["embeddings"],
+                offsets=run["offsets"],
+                token_counts=run["token_counts"],
+                first_chunk_index=run["first_chunk_index"]
+            )
+        writer.checkpoint()
+
+        self.set_route(chatbot_id, "zilliz")
+        self.local.delete_collection(chatbot_id)
+
+
+class _PromotingWriter(VectorStoreWriter):
+    """Local ingestion writer that moves the collection to Zilliz once it outgrows the local limit"""
+
+    def __init__(self, router: VectorStoreRouter, chatbot_id: str, writer: VectorStoreWriter):
+        self.router = router
+        self.chatbot_id = chatbot_id
+        self.writer = writer
+
+    def add(self, *args, **kwargs) -> List[str]:
+        return self.writer.add(*args, **kwargs)
+
+    def delete_document(self, document_id: str):
+        self.writer.delete_document(document_id)
+
+    def checkpoint(self) -> List[str]:
+        committed = self.writer.checkpoint()
+        stats = self.router.local.get_collection_stats(self.chatbot_id)
+        if stats["num_entities"] > self.router.max_local_vectors:
+            try:
+                self.router.promote_to_zilliz(self.chatbot_id)
+            except Exception as e:
+                # The local collection is complete and still routed; retried after the next ingestion
+                print(f"[VECTOR_STORE] Could not move chatbot {self.chatbot_id} to Zilliz: {e}")
+        return committed
+
+
+class _KeywordIndexingWriter(VectorStoreWriter):
+    """Ingestion writer that also adds every chunk to the chatbot's keyword index"""
+
+    def __init__(self, keyword_index: KeywordIndex, chatbot_id: str, writer: VectorStoreWriter):
+        self.keyword_index = keyword_index
+        self.chatbot_id = chatbot_id
+        self.writer = writer
+
+    def add(
+        self,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        embeddings: np.ndarray,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None,
+        first_chunk_index: int = 0
+    ) -> List[str]:
+        # Keyword rows go in first: a document is reported written only once both have it
+        self.keyword_index.add(
+            self.chatbot_id, document_id, chunks, filename, offsets, token_counts, first_chunk_index
+        )
+        return self.writer.add(
+            document_id, chunks, filename, user_id, embeddings,
+            offsets=offsets, token_counts=token_counts, first_chunk_index=first_chunk_index
+        )
+
+    def delete_document(self, document_id: str):
+        self.writer.delete_document(document_id)
+        self.keyword_index.delete_document(self.chatbot_id, document_id)
+
+    def checkpoint(self) -> List[str]:
+        committed = self.writer.checkpoint()
+        self.keyword_index.optimize(self.chatbot_id)
+        return committed
+
+
+# Singleton instance
+vector_store = VectorStoreRouter()
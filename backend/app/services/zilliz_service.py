@@ -1,5 +1,14 @@
 import os
-from typing import List, Dict, Optional
+import re
+import fcntl
+import math
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Set, Tuple
+import numpy as np
 from pymilvus import (
     connections,
     Collection,
@@ -9,41 +18,235 @@ from pymilvus import (
     utility
 )
 from pymilvus.exceptions import MilvusException
-from openai import OpenAI
 from app.core.config import (
     ZILLIZ_URI,
     ZILLIZ_TOKEN,
-    OPENAI_API_KEY,
-    EMBEDDING_MODEL,
-    EMBEDDING_DIMENSION
+    ZILLIZ_COLLECTION_CACHE_TTL_SECONDS,
+    ZILLIZ_COLLECTION_CACHE_MAX_ITEMS,
+    ZILLIZ_INSERT_BATCH_ROWS,
+    ZILLIZ_INSERT_BATCH_BYTES,
+    ZILLIZ_COLLECTION_MODE,
+    ZILLIZ_SHARED_COLLECTION,
+    ZILLIZ_SHARED_COLLECTION_COUNT,
+    ZILLIZ_SHARED_NUM_PARTITIONS,
+    ZILLIZ_FLAT_MAX_VECTORS,
+    ZILLIZ_HNSW_MIN_VECTORS,
+    ZILLIZ_IVF_NPROBE_FRACTION,
+    ZILLIZ_IVF_MIN_NPROBE,
+    ZILLIZ_HNSW_M,
+    ZILLIZ_HNSW_EF_CONSTRUCTION,
+    ZILLIZ_HNSW_EF_SEARCH,
+    ZILLIZ_AUTO_REINDEX,
+    EMBEDDING_DIMENSION,
+    DATA_DIR,
 )
-import math
+from app.services.retrieval_config import retrieval_config
+from app.services.vector_store import VectorStore, VectorStoreWriter
+from app.utils.ttl_cache import TTLCache
 
 
-class ZillizService:
-    def __init__(self):
-        """Initialize Zilliz Cloud connection and embedding model"""
-        # Connect to Zilliz Cloud
-        connections.connect(
-            alias="default",
-            uri=ZILLIZ_URI,
-            token=ZILLIZ_TOKEN
-        )
-        
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is not set. Please configure it in your environment variables.")
+# Process-wide registry of loaded Collection handles (collection name -> Collection).
+# Shared by every ZillizService instance so a warm search is a single Zilliz call.
+_loaded_collections = TTLCache(
+    ttl_seconds=ZILLIZ_COLLECTION_CACHE_TTL_SECONDS,
+    max_items=ZILLIZ_COLLECTION_CACHE_MAX_ITEMS,
+)
+
+
+# Index description (index_type, metric_type, params) of each loaded collection's embedding field
+_collection_indexes = TTLCache(
+    ttl_seconds=ZILLIZ_COLLECTION_CACHE_TTL_SECONDS,
+    max_items=ZILLIZ_COLLECTION_CACHE_MAX_ITEMS,
+)
+
+
+# Fields added after the original schema, in schema order. Collections created
+# earlier lack them, so inserts and searches include only those present.
+OPTIONAL_FIELDS = ("start_offset", "end_offset", "token_count")
+
+COLLECTION_MODES = ("per_chatbot", "shared")
+
+# Rows per page when listing a chatbot's document IDs
+DOCUMENT_ID_PAGE_SIZE = 4096
+
+# Lock files coordinating index rebuilds with writes across worker processes on this host
+REINDEX_LOCK_DIR = os.path.join(DATA_DIR, "locks")
+
+# A rebuilt collection is named <name>__ix<n> and served through <name> as an alias
+REBUILT_NAME_RE = re.compile(r"__ix(\d+)$")
+
+# Rows per page when copying a collection into its rebuilt replacement
+REINDEX_COPY_BATCH_ROWS = 1000
+
+
+@contextmanager
+def collection_lock(collection_name: str, exclusive: bool = False) -> Iterator[bool]:
+    """
+    Per-collection file lock, yielding whether it was acquired.
+    
+    Writers hold it shared and wait for it; an index rebuild holds it
+    exclusively while it copies the collection, so no write is lost, and
+    gives up at once if anyone holds it.
+    """
+    os.makedirs(REINDEX_LOCK_DIR, exist_ok=True)
+    with open(os.path.join(REINDEX_LOCK_DIR, f"reindex_{collection_name}.lock"), "w") as f:
+        try:
+            fcntl.flock(f, (fcntl.LOCK_EX | fcntl.LOCK_NB) if exclusive else fcntl.LOCK_SH)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def logical_collection_name(name: str) -> str:
+    """Name a collection is served under (its alias, for a collection created by a rebuild)"""
+    return REBUILT_NAME_RE.sub("", name)
+
+
+def expr_literal(value) -> str:
+    """Milvus expression literal for a filter value"""
+    if isinstance(value, str):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+    return str(value)
+
 
-        # Initialize OpenAI client for embeddings
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.embedding_model = EMBEDDING_MODEL
+def index_plan(num_entities: int) -> Dict:
+    """
+    Embedding index for a collection of this size: exact FLAT while tiny,
+    IVF_FLAT with nlist scaled to ~4 * sqrt(n) for medium sizes, HNSW when large.
+    Vectors are unit-normalized, so inner product ranks like cosine similarity.
+    """
+    if num_entities < ZILLIZ_FLAT_MAX_VECTORS:
+        return {"index_type": "FLAT", "metric_type": "IP", "params": {}}
+    if num_entities < ZILLIZ_HNSW_MIN_VECTORS:
+        nlist = 1 << round(math.log2(4 * math.sqrt(num_entities)))
+        return {"index_type": "IVF_FLAT", "metric_type": "IP", "params": {"nlist": min(max(nlist, 128), 16384)}}
+    return {
+        "index_type": "HNSW",
+        "metric_type": "IP",
+        "params": {"M": ZILLIZ_HNSW_M, "efConstruction": ZILLIZ_HNSW_EF_CONSTRUCTION},
+    }
+
+
+def search_params_for(index: Dict, top_k: int) -> Dict:
+    """Search parameters matching an index description"""
+    params = {}
+    if index["index_type"] == "IVF_FLAT":
+        nlist = int(index["params"].get("nlist", 128))
+        params["nprobe"] = min(nlist, max(ZILLIZ_IVF_MIN_NPROBE, round(nlist * ZILLIZ_IVF_NPROBE_FRACTION)))
+    elif index["index_type"] == "HNSW":
+        params["ef"] = max(ZILLIZ_HNSW_EF_SEARCH, top_k)
+    return {"metric_type": index["metric_type"], "params": params}
+
+
+def needs_reindex(current: Optional[Dict], desired: Dict) -> bool:
+    """Whether an existing index differs enough from the planned one to rebuild it"""
+    if current is None:
+        return True
+    if current["index_type"] != desired["index_type"] or current["metric_type"] != desired["metric_type"]:
+        return True
+    if desired["index_type"] == "IVF_FLAT":
+        # nlist is rounded to powers of two; rebuild once it is off by 4x or more
+        ratio = desired["params"]["nlist"] / max(1, int(current["params"].get("nlist", 1)))
+        return ratio >= 4 or ratio <= 0.25
+    return False
+
+
+def to_l2_score(distance: float, metric_type: str) -> float:
+    """
+    Search scores are squared L2 distances whatever the index metric (lower is
+    better; see RELEVANCE_THRESHOLD_L2). For unit vectors ||a - b||^2 = 2 - 2 a.b.
+    """
+    if metric_type == "IP":
+        return 2.0 - 2.0 * distance
+    return distance
+
+
+class ZillizService(VectorStore):
+    name = "zilliz"
+    
+    def __init__(self, collection_mode: str = ZILLIZ_COLLECTION_MODE):
+        """Zilliz Cloud vector store; connects on first use, not at import"""
+        if collection_mode not in COLLECTION_MODES:
+            raise ValueError(f"ZILLIZ_COLLECTION_MODE must be per_chatbot or shared (got {collection_mode!r})")
+        self.collection_mode = collection_mode
         self.dimension = EMBEDDING_DIMENSION
-        self._embedding_batch_size = 100  # Safe default to avoid token limits
-        
-        print(f"Connected to Zilliz Cloud. Using OpenAI embedding model: {self.embedding_model}")
+        self._connected = False
+        self._connect_lock = threading.Lock()
+        # Collections with a rebuild queued but not yet started in this process, so repeated
+        # inserts queue it once; whether a rebuild is running is only known from collection_lock
+        self._reindex_queued: Set[str] = set()
+        self._reindex_lock = threading.Lock()
+        self._reindex_executor: Optional[ThreadPoolExecutor] = None
+    
+    def ensure_connected(self):
+        """Connect to Zilliz Cloud once, on first use"""
+        if self._connected:
+            return
+        with self._connect_lock:
+            if self._connected:
+                return
+            if not ZILLIZ_URI:
+                raise ValueError("ZILLIZ_URI is not set. Please configure it in your environment variables.")
+            connections.connect(
+                alias="default",
+                uri=ZILLIZ_URI,
+                token=ZILLIZ_TOKEN
+            )
+            self._connected = True
+            print("[ZILLIZ] Connected to Zilliz Cloud")
+    
+    def close(self):
+        """Drop cached collection handles and disconnect (on shutdown)"""
+        with self._connect_lock:
+            if not self._connected:
+                return
+            _loaded_collections.clear()
+            _collection_indexes.clear()
+            connections.disconnect("default")
+            self._connected = False
+            print("[ZILLIZ] Disconnected from Zilliz Cloud")
+    
+    @property
+    def shared(self) -> bool:
+        """Whether chatbots share partition-keyed collections"""
+        return self.collection_mode == "shared"
     
     def get_collection_name(self, chatbot_id: str) -> str:
+        """Name of the collection holding a chatbot's rows"""
+        if self.shared:
+            return self.shared_collection_name(chatbot_id)
+        return self.chatbot_collection_name(chatbot_id)
+    
+    @staticmethod
+    def shared_collection_name(chatbot_id: str) -> str:
+        """Shared collection for a chatbot; chatbots are spread over shards by a stable hash of their ID"""
+        if ZILLIZ_SHARED_COLLECTION_COUNT <= 1:
+            return ZILLIZ_SHARED_COLLECTION
+        shard = int(hashlib.md5(chatbot_id.encode()).hexdigest(), 16) % ZILLIZ_SHARED_COLLECTION_COUNT
+        return f"{ZILLIZ_SHARED_COLLECTION}_{shard}"
+    
+    @staticmethod
+    def shared_collection_names() -> List[str]:
+        """Every shared collection shared_collection_name can return"""
+        if ZILLIZ_SHARED_COLLECTION_COUNT <= 1:
+            return [ZILLIZ_SHARED_COLLECTION]
+        return [f"{ZILLIZ_SHARED_COLLECTION}_{shard}" for shard in range(ZILLIZ_SHARED_COLLECTION_COUNT)]
+    
+    @staticmethod
+    def chatbot_collection_names() -> List[str]:
+        """Existing per-chatbot collections, under the names they are served by (rebuilt ones by their alias)"""
+        names = {logical_collection_name(name) for name in utility.list_collections()}
+        return sorted(name for name in names if name.startswith("chatbot_"))
+    
+    @staticmethod
+    def chatbot_collection_name(chatbot_id: str) -> str:
         """
-        Generate collection name for a chatbot
+        Generate the per-chatbot collection name
         Zilliz collection names can only contain numbers, letters, and underscores
         """
         # Replace hyphens and other invalid characters with underscores
@@ -60,11 +263,18 @@ class ZillizService:
         """
         collection_name = self.get_collection_name(chatbot_id)
         
+        collection = _loaded_collections.get(collection_name)
+        if collection is not None:
+            return collection
+        
+        self.ensure_connected()
+        
         # Check if collection exists (catch exception if it doesn't)
         try:
             if utility.has_collection(collection_name):
                 collection = Collection(collection_name)
                 collection.load()
+                _loaded_collections.set(collection_name, collection)
                 return collection
         except MilvusException:
             # Collection doesn't exist, will create it below
@@ -77,16 +287,43 @@ class ZillizService:
             FieldSchema(name="chunk_index", dtype=DataType.INT64),  # Which chunk in the document
             FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),  # The actual text chunk
             FieldSchema(name="filename", dtype=DataType.VARCHAR, max_length=255),
-            FieldSchema(name="chatbot_id", dtype=DataType.VARCHAR, max_length=255),
+            # Partition key of shared collections: rows of one chatbot land in one partition
+            FieldSchema(name="chatbot_id", dtype=DataType.VARCHAR, max_length=255, is_partition_key=self.shared),
             FieldSchema(name="user_id", dtype=DataType.VARCHAR, max_length=255),
+            # Chunk's [start, end) character offsets in the extracted document text
+            FieldSchema(name="start_offset", dtype=DataType.INT64),
+            FieldSchema(name="end_offset", dtype=DataType.INT64),
+            FieldSchema(name="token_count", dtype=DataType.INT64),  # Embedding-model tokens in the chunk
             FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dimension),
         ]
         
         schema = CollectionSchema(
             fields=fields,
-            description=f"Collection for chatbot {chatbot_id}"
+            description="Chunks of all chatbots, partitioned by chatbot_id" if self.shared else f"Collection for chatbot {chatbot_id}"
+        )
+        create_kwargs = {"num_partitions": ZILLIZ_SHARED_NUM_PARTITIONS} if self.shared else {}
+        collection = self._create_collection(collection_name, schema, create_kwargs)
+        
+        # Create index on embedding field; an empty collection starts with exact search
+        # and is re-indexed as it grows (see schedule_reindex)
+        index_params = index_plan(0)
+        
+        collection.create_index(
+            field_name="embedding",
+            index_params=index_params
         )
         
+        # Load collection
+        collection.load()
+        _loaded_collections.set(collection_name, collection)
+        _collection_indexes.set(collection_name, index_params)
+        
+        print(f"Created collection: {collection_name}")
+        return collection
+    
+    @staticmethod
+    def _create_collection(collection_name: str, schema: CollectionSchema, create_kwargs: Dict) -> Collection:
+        """Create a collection with the given schema (no index, not loaded)"""
         # Create collection
         # pymilvus Collection.__init__ checks has_collection first, which raises if collection doesn't exist
         # We need to create it via the connection handler before instantiating Collection
@@ -110,7 +347,8 @@ class ZillizService:
                 conn_handler.create_collection(
                     collection_name=collection_name,
                     fields=schema_dict,
-                    timeout=None
+                    timeout=None,
+                    **create_kwargs
                 )
                 # Now get the collection
                 collection = Collection(collection_name)
@@ -124,35 +362,23 @@ class ZillizService:
             # Fallback: try Collection with schema
             # This will fail if collection doesn't exist
             try:
-                collection = Collection(name=collection_name, schema=schema)
+                collection = Collection(name=collection_name, schema=schema, **create_kwargs)
             except MilvusException:
                 raise Exception(
                     "Cannot access connection handler to create collection. "
                     "Please check your Zilliz connection."
                 )
-        
-        # Create index on embedding field
-        index_params = {
-            "metric_type": "L2",  # Euclidean distance
-            "index_type": "IVF_FLAT",  # Simple but effective
-            "params": {"nlist": 128}
-        }
-        
-        collection.create_index(
-            field_name="embedding",
-            index_params=index_params
-        )
-        
-        # Load collection
-        collection.load()
-        
-        print(f"Created collection: {collection_name}")
         return collection
     
     def get_collection(self, chatbot_id: str) -> Optional[Collection]:
-        """Get an existing collection"""
+        """Get an existing, loaded collection (cached handle when available)"""
         collection_name = self.get_collection_name(chatbot_id)
         
+        collection = _loaded_collections.get(collection_name)
+        if collection is not None:
+            return collection
+        
+        self.ensure_connected()
         try:
             if not utility.has_collection(collection_name):
                 return None
@@ -161,36 +387,221 @@ class ZillizService:
         
         collection = Collection(collection_name)
         collection.load()
+        _loaded_collections.set(collection_name, collection)
         return collection
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts"""
-        if not texts:
-            return []
-
-        embeddings: List[List[float]] = []
-
-        for start in range(0, len(texts), self._embedding_batch_size):
-            batch = texts[start:start + self._embedding_batch_size]
+    def collection_exists(self, chatbot_id: str) -> bool:
+        """Whether the chatbot has a collection (in shared mode: any rows in its shared collection)"""
+        collection = self.get_collection(chatbot_id)
+        if collection is None or not self.shared:
+            return collection is not None
+        return bool(collection.query(expr=self.scope_expr(chatbot_id), output_fields=["id"], limit=1))
+    
+    def scope_expr(self, chatbot_id: str, *conditions: str) -> str:
+        """
+        AND of conditions, restricted to the chatbot's rows in shared mode.
+        Filtering on the partition key also limits the scan to its partition.
+        """
+        if self.shared:
+            conditions = (f"chatbot_id == {expr_literal(chatbot_id)}",) + conditions
+        return " && ".join(conditions)
+    
+    def invalidate_collection(self, chatbot_id: str):
+        """Forget the cached handle so the next access re-checks Zilliz"""
+        collection_name = self.get_collection_name(chatbot_id)
+        _loaded_collections.invalidate(collection_name)
+        _collection_indexes.invalidate(collection_name)
+    
+    @staticmethod
+    def index_info(collection: Collection) -> Optional[Dict]:
+        """Index description of the collection's embedding field (cached)"""
+        cached = _collection_indexes.get(collection.name)
+        if cached is not None:
+            return cached
+        for index in collection.indexes:
+            if index.field_name == "embedding":
+                params = dict(index.params)
+                info = {
+                    "index_type": params.get("index_type"),
+                    "metric_type": params.get("metric_type", "L2"),
+                    "params": params.get("params") or {},
+                }
+                _collection_indexes.set(collection.name, info)
+                return info
+        return None
+    
+    def schedule_reindex(self, chatbot_id: str):
+        """Rebuild the chatbot's collection index in the background if its size now calls for another one"""
+        # A rebuild copies the whole collection, which in shared mode means every chatbot
+        # in the shard: shared collections are re-indexed only by scripts/reindex_collections.py
+        if not ZILLIZ_AUTO_REINDEX or self.shared:
+            return
+        collection_name = self.get_collection_name(chatbot_id)
+        with self._reindex_lock:
+            if collection_name in self._reindex_queued:
+                return
+            self._reindex_queued.add(collection_name)
+            if self._reindex_executor is None:
+                self._reindex_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zilliz-reindex")
+        self._reindex_executor.submit(self._run_queued_reindex, collection_name)
+    
+    def _run_queued_reindex(self, collection_name: str):
+        with self._reindex_lock:
+            self._reindex_queued.discard(collection_name)
+        self.reindex_collection(collection_name)
+    
+    def reindex_collection(self, collection_name: str):
+        """
+        Replace the embedding index with the one planned for the collection's size.
+        
+        The collection stays searchable throughout (see _rebuild_index). The
+        exclusive collection_lock keeps other worker processes on this host from
+        rebuilding it concurrently and holds their writes back during the copy;
+        a rebuild already finished elsewhere is seen because the index is read fresh.
+        """
+        try:
+            with collection_lock(collection_name, exclusive=True) as acquired:
+                if not acquired:
+                    print(f"[ZILLIZ] {collection_name} is being written or re-indexed by another process; skipping")
+                    return
+                self._rebuild_index(collection_name)
+        except Exception as e:
+            _collection_indexes.invalidate(collection_name)
+            print(f"[ZILLIZ] Re-indexing {collection_name} failed: {e}")
+    
+    def _rebuild_index(self, collection_name: str):
+        """
+        Swap in the index planned for the collection's size (the caller holds the lock).
+        
+        Milvus drops an index only on a released collection, so the rows are
+        copied into a new collection <name>__ix<n> built with the new index and
+        loaded; collection_name then becomes an alias of it. The old collection
+        keeps serving searches until the alias moves. The first rebuild of a
+        collection created under its own name has to drop it before the alias
+        can take the name, leaving a gap of one call.
+        """
+        collection = Collection(collection_name)
+        _collection_indexes.invalidate(collection_name)
+        current = self.index_info(collection)
+        desired = index_plan(collection.num_entities)
+        if not needs_reindex(current, desired):
+            return
+        
+        source_name = self.physical_collection_name(collection_name)
+        match = REBUILT_NAME_RE.search(source_name)
+        target_name = f"{collection_name}__ix{int(match.group(1)) + 1 if match else 1}"
+        print(
+            f"[ZILLIZ] Re-indexing {collection_name} ({collection.num_entities} vectors) into {target_name}: "
+            f"{current and current['index_type']}/{current and current['metric_type']} -> "
+            f"{desired['index_type']}/{desired['metric_type']} {desired['params']}"
+        )
+        started = time.perf_counter()
+        self._copy_with_index(collection, target_name, desired)
+        
+        if source_name == collection_name:
+            utility.drop_collection(source_name)
             try:
-                response = self.client.embeddings.create(
-                    model=self.embedding_model,
-                    input=batch
-                )
-            except Exception as exc:
-                raise Exception(f"Failed to generate embeddings via OpenAI: {exc}")
-
-            # Ensure order is preserved using index
-            batch_embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
-            for vector in batch_embeddings:
-                norm = math.sqrt(sum(value * value for value in vector))
-                if norm > 0:
-                    normalized = [value / norm for value in vector]
-                else:
-                    normalized = vector
-                embeddings.append(normalized)
-
-        return embeddings
+                utility.create_alias(target_name, collection_name)
+            except Exception:
+                print(f"[ZILLIZ] Could not alias {collection_name}; its rows are in {target_name}")
+                raise
+        else:
+            utility.alter_alias(target_name, collection_name)
+            utility.drop_collection(source_name)
+        _loaded_collections.set(collection_name, Collection(collection_name))
+        _collection_indexes.set(collection_name, desired)
+        print(f"[ZILLIZ] Re-indexed {collection_name} in {time.perf_counter() - started:.1f}s")
+    
+    def _copy_with_index(self, source: Collection, target_name: str, index_params: Dict) -> Collection:
+        """Copy every row of source into a new, loaded collection indexed with index_params"""
+        if utility.has_collection(target_name):
+            # Left over from an interrupted rebuild
+            utility.drop_collection(target_name)
+        schema = source.schema
+        partitioned = any(getattr(field, "is_partition_key", False) for field in schema.fields)
+        create_kwargs = {"num_partitions": len(source.partitions)} if partitioned else {}
+        target = self._create_collection(target_name, schema, create_kwargs)
+        try:
+            target.create_index(field_name="embedding", index_params=index_params)
+            
+            source.flush()
+            fields = [field.name for field in schema.fields]
+            iterator = source.query_iterator(
+                batch_size=REINDEX_COPY_BATCH_ROWS,
+                expr='id != ""',
+                output_fields=fields,
+            )
+            try:
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    target.insert([[row[name] for row in rows] for name in fields])
+            finally:
+                iterator.close()
+            target.flush()
+            utility.wait_for_index_building_complete(target_name)
+            target.load()
+            
+            expected, copied = self.count_rows(source), self.count_rows(target)
+            if copied != expected:
+                raise Exception(f"copied {copied} of {expected} rows")
+        except Exception:
+            utility.drop_collection(target_name)
+            raise
+        return target
+    
+    @staticmethod
+    def count_rows(collection: Collection, expr: str = 'id != ""') -> int:
+        """Rows matching expr, counting inserts just made (strong consistency)"""
+        rows = collection.query(expr=expr, output_fields=["count(*)"], consistency_level="Strong")
+        return rows[0]["count(*)"] if rows else 0
+    
+    @staticmethod
+    def physical_collection_name(collection_name: str) -> str:
+        """Collection behind a name (the rebuilt collection when the name is an alias)"""
+        return Collection(collection_name).describe()["collection_name"]
+    
+    def drop_collection(self, collection_name: str):
+        """Drop a collection by the name it is served under, with the rebuilt collection its alias points to"""
+        physical_name = self.physical_collection_name(collection_name)
+        if physical_name != collection_name:
+            utility.drop_alias(collection_name)
+        utility.drop_collection(physical_name)
+    
+    def reset_collection(self, chatbot_id: str) -> Collection:
+        """
+        Empty a chatbot's collection before a full re-index.
+        Collections with an older schema are recreated; the delete is not
+        flushed (the ingestion writer flushes once when its inserts are done).
+        """
+        # Start from a fresh handle, not a cached one
+        self.invalidate_collection(chatbot_id)
+        collection = self.get_collection(chatbot_id)
+        if self.shared:
+            # Other chatbots' rows live here too: only delete this chatbot's
+            if not collection:
+                return self.create_collection_if_not_exists(chatbot_id)
+            with collection_lock(collection.name):
+                collection.delete(expr=self.scope_expr(chatbot_id))
+            print(f"[ZILLIZ] Deleted rows of chatbot {chatbot_id} from shared collection {collection.name}")
+            return collection
+        if collection and not self.schema_is_current(collection):
+            # Everything is re-indexed anyway: recreate older collections with the current schema
+            print(f"[ZILLIZ] Collection has an older schema, recreating it...")
+            self.delete_collection(chatbot_id)
+        elif collection:
+            print(f"[ZILLIZ] Collection exists, emptying it...")
+            try:
+                with collection_lock(collection.name):
+                    collection.delete(expr=f"chatbot_id == {expr_literal(chatbot_id)}")
+                print(f"[ZILLIZ] Collection emptied")
+                return collection
+            except Exception as e:
+                print(f"[ZILLIZ] Warning: Could not empty collection: {e}, will try to create new one")
+        else:
+            print(f"[ZILLIZ] Creating new collection...")
+        return self.create_collection_if_not_exists(chatbot_id)
     
     def add_documents(
         self,
@@ -199,7 +610,10 @@ class ZillizService:
         chunks: List[str],
         filename: str,
         user_id: str,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        embeddings: Optional[np.ndarray] = None,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None
     ) -> int:
         """
         Add document chunks to a chatbot's collection.
@@ -211,7 +625,10 @@ class ZillizService:
             filename: Name of the file
             user_id: User ID
             metadata: Optional additional metadata
-            
+            embeddings: Precomputed (len(chunks), dimension) matrix; generated if omitted
+            offsets: (start, end) character offsets of each chunk in the document text
+            token_counts: Number of embedding-model tokens in each chunk
+        
         Returns:
             Number of chunks added
         """
@@ -220,20 +637,52 @@ class ZillizService:
         
         collection = self.create_collection_if_not_exists(chatbot_id)
         
-        # Generate embeddings for all chunks
-        embeddings = self.generate_embeddings(chunks)
+        # Generate embeddings for all chunks as one float32 matrix; pymilvus accepts it as the vector column
+        if embeddings is None:
+            from app.services.embedding_service import embedding_service
+            embeddings = embedding_service.generate_embeddings(chunks)
+        
+        # Insert data
+        optional = self.optional_columns(
+            self.optional_fields(collection), len(chunks), offsets, token_counts
+        )
+        data = self.build_scalar_columns(chatbot_id, document_id, chunks, filename, user_id, optional)
+        data.append(embeddings)
+        
+        with collection_lock(collection.name):
+            collection.insert(data)
+            collection.flush()  # Make sure data is written
+        self.schedule_reindex(chatbot_id)
+        
+        print(f"Added {len(chunks)} chunks to collection for chatbot {chatbot_id}")
+        return len(chunks)
+    
+    @staticmethod
+    def build_scalar_columns(
+        chatbot_id: str,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        optional: Optional[Dict[str, list]] = None,
+        first_chunk_index: int = 0
+    ) -> List[list]:
+        """
+        Column-ordered insert data for every field except the embedding.
         
-        # Prepare data for insertion
-        ids = [f"{document_id}_{i}" for i in range(len(chunks))]
+        optional holds columns for the OPTIONAL_FIELDS the collection has
+        (see optional_columns). first_chunk_index numbers the chunks of a
+        document inserted in several parts.
+        """
+        chunk_indices = list(range(first_chunk_index, first_chunk_index + len(chunks)))
+        ids = [f"{document_id}_{i}" for i in chunk_indices]
         document_ids = [document_id] * len(chunks)
-        chunk_indices = list(range(len(chunks)))
         texts = chunks
         filenames = [filename] * len(chunks)
         chatbot_ids = [chatbot_id] * len(chunks)
         user_ids = [user_id] * len(chunks)
         
-        # Insert data
-        data = [
+        columns = [
             ids,
             document_ids,
             chunk_indices,
@@ -241,14 +690,40 @@ class ZillizService:
             filenames,
             chatbot_ids,
             user_ids,
-            embeddings
         ]
-        
-        collection.insert(data)
-        collection.flush()  # Make sure data is written
-        
-        print(f"Added {len(chunks)} chunks to collection for chatbot {chatbot_id}")
-        return len(chunks)
+        if optional:
+            columns.extend(optional[name] for name in OPTIONAL_FIELDS if name in optional)
+        return columns
+    
+    @staticmethod
+    def optional_fields(collection: Collection) -> Set[str]:
+        """OPTIONAL_FIELDS present in a collection's schema"""
+        return {field.name for field in collection.schema.fields} & set(OPTIONAL_FIELDS)
+    
+    def schema_is_current(self, collection: Collection) -> bool:
+        """Whether the collection has every field of the current schema"""
+        return self.optional_fields(collection) == set(OPTIONAL_FIELDS)
+    
+    @staticmethod
+    def optional_columns(
+        fields: Set[str],
+        count: int,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None
+    ) -> Dict[str, list]:
+        """Columns for the optional fields in `fields`; values not provided are stored as 0"""
+        if offsets is None:
+            offsets = [(0, 0)] * count
+        values = {
+            "start_offset": [start for start, _ in offsets],
+            "end_offset": [end for _, end in offsets],
+            "token_count": list(token_counts) if token_counts is not None else [0] * count,
+        }
+        return {name: values[name] for name in OPTIONAL_FIELDS if name in fields}
+    
+    def ingestion_writer(self, chatbot_id: str) -> "IngestionWriter":
+        """Buffered writer for bulk ingestion into a chatbot's collection"""
+        return IngestionWriter(self, chatbot_id)
     
     def search(
         self,
@@ -256,16 +731,32 @@ class ZillizService:
         query_text: str,
         top_k: int = 5,
         filters: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Embed query_text and search the chatbot's collection"""
+        from app.services.embedding_service import embedding_service
+        
+        # A cached handle check: collection_exists costs a query per search in shared mode
+        if not self.get_collection(chatbot_id):
+            return []
+        query_embedding = embedding_service.generate_embeddings([query_text])
+        return self.search_by_vector(chatbot_id, query_embedding, top_k=top_k, filters=filters)
+    
+    def search_by_vector(
+        self,
+        chatbot_id: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict] = None
     ) -> List[Dict]:
         """
-        Search for similar documents in a chatbot's collection.
+        Search a chatbot's collection with an already computed query embedding.
         
         Args:
             chatbot_id: ID of the chatbot
-            query_text: Search query
+            query_embedding: (1, dimension) float32 matrix from EmbeddingService
             top_k: Number of results to return
             filters: Optional metadata filters (e.g., {"filename": "doc.pdf"})
-            
+        
         Returns:
             List of dictionaries with 'text', 'metadata', 'score'
         """
@@ -274,32 +765,35 @@ class ZillizService:
         if not collection:
             return []
         
-        # Generate query embedding
-        query_embedding = self.generate_embeddings([query_text])[0]
+        # Search parameters follow the collection's current index
+        index = self.index_info(collection) or {"index_type": "IVF_FLAT", "metric_type": "L2", "params": {"nlist": 128}}
+        search_params = self.tuned_search_params(chatbot_id, index, top_k)
         
-        # Build search parameters
-        search_params = {
-            "metric_type": "L2",
-            "params": {"nprobe": 10}
-        }
-        
-        # Build filter expression if provided
-        expr = None
-        if filters:
-            filter_parts = []
-            for key, value in filters.items():
-                filter_parts.append(f'{key} == "{value}"')
-            expr = " && ".join(filter_parts)
+        # Build filter expression (always scoped to the chatbot in shared mode)
+        filter_parts = [f"{key} == {expr_literal(value)}" for key, value in (filters or {}).items()]
+        expr = self.scope_expr(chatbot_id, *filter_parts) or None
         
         # Search
-        results = collection.search(
-            data=[query_embedding],
+        search_kwargs = dict(
+            data=query_embedding,
             anns_field="embedding",
             param=search_params,
             limit=top_k,
             expr=expr,
-            output_fields=["text", "document_id", "chunk_index", "filename", "chatbot_id"]
+            output_fields=self._search_output_fields(collection)
         )
+        try:
+            results = collection.search(**search_kwargs)
+        except MilvusException:
+            # The cached handle or index may be stale (dropped, or re-indexed by another process); refresh it once
+            self.invalidate_collection(chatbot_id)
+            collection = self.get_collection(chatbot_id)
+            if not collection:
+                return []
+            index = self.index_info(collection) or index
+            search_kwargs["param"] = self.tuned_search_params(chatbot_id, index, top_k)
+            search_kwargs["output_fields"] = self._search_output_fields(collection)
+            results = collection.search(**search_kwargs)
         
         # Format results
         formatted_results = []
@@ -310,31 +804,65 @@ class ZillizService:
                     'document_id': hit.entity.get('document_id'),
                     'chunk_index': hit.entity.get('chunk_index'),
                     'filename': hit.entity.get('filename'),
-                    'score': hit.distance,
+                    'score': to_l2_score(hit.distance, index["metric_type"]),
                     'metadata': {
                         'document_id': hit.entity.get('document_id'),
                         'chunk_index': hit.entity.get('chunk_index'),
                         'filename': hit.entity.get('filename'),
                         'chatbot_id': hit.entity.get('chatbot_id'),
+                        'start_offset': hit.entity.get('start_offset'),
+                        'end_offset': hit.entity.get('end_offset'),
+                        'token_count': hit.entity.get('token_count'),
                     }
                 })
         
         return formatted_results
     
+    @staticmethod
+    def tuned_search_params(chatbot_id: str, index: Dict, top_k: int) -> Dict:
+        """search_params_for(index), with the chatbot's tuned values (scripts/tune_retrieval.py) when they match the index"""
+        search_params = search_params_for(index, top_k)
+        tuned = retrieval_config.search_params(chatbot_id, index["index_type"])
+        if tuned:
+            search_params["params"].update(tuned)
+            if "ef" in search_params["params"]:
+                # HNSW needs ef >= limit
+                search_params["params"]["ef"] = max(int(search_params["params"]["ef"]), top_k)
+        return search_params
+    
+    def _search_output_fields(self, collection: Collection) -> List[str]:
+        fields = ["text", "document_id", "chunk_index", "filename", "chatbot_id"]
+        present = self.optional_fields(collection)
+        return fields + [name for name in OPTIONAL_FIELDS if name in present]
+    
     def delete_collection(self, chatbot_id: str):
-        """Delete a chatbot's collection (when chatbot is deleted)"""
+        """Delete a chatbot's collection (when chatbot is deleted); in shared mode, its rows"""
+        if self.shared:
+            collection = self.get_collection(chatbot_id)
+            if collection:
+                with collection_lock(collection.name):
+                    collection.delete(expr=self.scope_expr(chatbot_id))
+                    collection.flush()
+                print(f"[ZILLIZ] Deleted rows of chatbot {chatbot_id} from shared collection {collection.name}")
+            return
+        
         collection_name = self.get_collection_name(chatbot_id)
+        _loaded_collections.invalidate(collection_name)
         
+        self.ensure_connected()
         try:
             if utility.has_collection(collection_name):
-                utility.drop_collection(collection_name)
+                self.drop_collection(collection_name)
                 print(f"Deleted collection: {collection_name}")
         except MilvusException:
             # Collection doesn't exist, nothing to delete
             pass
     
-    def delete_document(self, chatbot_id: str, document_id: str):
-        """Delete all chunks for a specific document"""
+    def delete_document(self, chatbot_id: str, document_id: str, flush: bool = True):
+        """
+        Delete all chunks for a specific document.
+        Bulk callers pass flush=False and flush once when they are done.
+        """
         collection = self.get_collection(chatbot_id)
         
         if not collection:
@@ -342,11 +870,38 @@ class ZillizService:
             return
         
         # Delete by document_id (VARCHAR filter)
-        expr = f'document_id == "{document_id}"'
-        collection.delete(expr)
-        collection.flush()
+        expr = self.scope_expr(chatbot_id, f"document_id == {expr_literal(document_id)}")
+        with collection_lock(collection.name):
+            collection.delete(expr)
+            if flush:
+                collection.flush()
         print(f"[ZILLIZ] Deleted document {document_id} from chatbot {chatbot_id}")
     
+    def list_document_ids(self, chatbot_id: str) -> Set[str]:
+        """IDs of documents that currently have chunks in the chatbot's collection"""
+        collection = self.get_collection(chatbot_id)
+        
+        if not collection:
+            return set()
+        
+        # Every indexed document has a chunk 0, so this returns one row per document.
+        # Paged, since a single query is capped at 16384 rows.
+        document_ids: Set[str] = set()
+        iterator = collection.query_iterator(
+            batch_size=DOCUMENT_ID_PAGE_SIZE,
+            expr=self.scope_expr(chatbot_id, "chunk_index == 0"),
+            output_fields=["document_id"],
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                document_ids.update(row["document_id"] for row in rows)
+        finally:
+            iterator.close()
+        return document_ids
+    
     def get_collection_stats(self, chatbot_id: str) -> Dict:
         """Get statistics about a collection"""
         collection = self.get_collection(chatbot_id)
@@ -354,12 +909,140 @@ class ZillizService:
         if not collection:
             return {"num_entities": 0}
         
+        if self.shared:
+            # num_entities would count every chatbot in the collection
+            rows = collection.query(expr=self.scope_expr(chatbot_id), output_fields=["count(*)"])
+            num_entities = rows[0]["count(*)"] if rows else 0
+        else:
+            num_entities = collection.num_entities
+        
         return {
-            "num_entities": collection.num_entities,
-            "collection_name": collection.name
+            "num_entities": num_entities,
+            "collection_name": collection.name,
+            "backend": self.name,
+            "collection_mode": self.collection_mode,
+            "index": self.index_info(collection)
         }
 
 
+class IngestionWriter(VectorStoreWriter):
+    """
+    Buffers chunk rows across documents for one ingestion job.
+    
+    Rows are inserted in size-bounded batches (ZILLIZ_INSERT_BATCH_ROWS /
+    ZILLIZ_INSERT_BATCH_BYTES) and the collection is flushed only on
+    checkpoint(). Flushing seals segments, so one flush per job instead of
+    one per document keeps the segment count low.
+    """
+    
+    def __init__(
+        self,
+        service: ZillizService,
+        chatbot_id: str,
+        max_batch_rows: int = ZILLIZ_INSERT_BATCH_ROWS,
+        max_batch_bytes: int = ZILLIZ_INSERT_BATCH_BYTES
+    ):
+        self.service = service
+        self.chatbot_id = chatbot_id
+        self.max_batch_rows = max_batch_rows
+        self.max_batch_bytes = max_batch_bytes
+        self.collection = service.create_collection_if_not_exists(chatbot_id)
+        self.optional_fields = service.optional_fields(self.collection)
+        
+        self._columns: List[list] = []
+        self._embeddings: List[np.ndarray] = []
+        self._rows = 0
+        self._bytes = 0
+        # Documents with rows in the buffer, in insertion order
+        self._pending_documents: List[str] = []
+        self.inserted_rows = 0
+        self.insert_calls = 0
+    
+    def add(
+        self,
+        document_id: str,
+        chunks: List[str],
+        filename: str,
+        user_id: str,
+        embeddings: np.ndarray,
+        offsets: Optional[List[Tuple[int, int]]] = None,
+        token_counts: Optional[List[int]] = None,
+        first_chunk_index: int = 0
+    ) -> List[str]:
+        """
+        Buffer a document's chunks (or one part of them), inserting full batches.
+        
+        Returns IDs of documents whose buffered rows have now been inserted
+        (a document added in parts is reported after each part).
+        """
+        if not chunks:
+            return []
+        
+        # Same optional columns for every document, so buffered columns line up
+        optional = self.service.optional_columns(self.optional_fields, len(chunks), offsets, token_counts)
+        columns = self.service.build_scalar_columns(
+            self.chatbot_id, document_id, chunks, filename, user_id, optional, first_chunk_index
+        )
+        if not self._columns:
+            self._columns = [[] for _ in columns]
+        for buffered, column in zip(self._columns, columns):
+            buffered.extend(column)
+        self._embeddings.append(embeddings)
+        self._rows += len(chunks)
+        self._bytes += embeddings.nbytes + sum(len(chunk) for chunk in chunks)
+        self._pending_documents.append(document_id)
+        
+        if self._rows >= self.max_batch_rows or self._bytes >= self.max_batch_bytes:
+            return self._insert_buffered()
+        return []
+    
+    def delete_document(self, document_id: str):
+        """Delete a document's existing chunks without flushing"""
+        self.service.delete_document(self.chatbot_id, document_id, flush=False)
+    
+    def checkpoint(self) -> List[str]:
+        """Insert everything buffered and flush once. Returns newly committed document IDs."""
+        committed = self._insert_buffered()
+        with collection_lock(self.collection.name):
+            self.collection.flush()
+        print(
+            f"[ZILLIZ] Checkpoint for chatbot {self.chatbot_id}: "
+            f"{self.inserted_rows} rows in {self.insert_calls} inserts, 1 flush"
+        )
+        self.service.schedule_reindex(self.chatbot_id)
+        return committed
+    
+    def _insert_buffered(self) -> List[str]:
+        """
+        Insert buffered rows in batches of at most max_batch_rows.
+        
+        The buffer is emptied even if an insert fails, so the caller should
+        treat every pending document as failed in that case.
+        """
+        if not self._rows:
+            return []
+        
+        columns, rows, committed = self._columns, self._rows, self._pending_documents
+        embeddings = np.concatenate(self._embeddings) if len(self._embeddings) > 1 else self._embeddings[0]
+        self._columns = []
+        self._embeddings = []
+        self._rows = 0
+        self._bytes = 0
+        self._pending_documents = []
+        
+        # Held across the batches: a rebuild copying the collection waits for them, and they for it
+        with collection_lock(self.collection.name):
+            for start in range(0, rows, self.max_batch_rows):
+                end = min(start + self.max_batch_rows, rows)
+                data = [column[start:end] for column in columns]
+                data.append(embeddings[start:end])
+                self.collection.insert(data)
+                self.insert_calls += 1
+        
+        self.inserted_rows += rows
+        return committed
+
+
 # Singleton instance
 zilliz_service = ZillizService()
 
@@ -4,7 +4,7 @@ Document text extraction and chunking utilities
 
 import io
 import mimetypes
-from typing import List, Tuple
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 
 # Document parsers
@@ -12,24 +12,34 @@ from pypdf import PdfReader
 from docx import Document as DocxDocument
 from openpyxl import load_workbook
 
-# LangChain for text chunking
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from app.core.config import CHUNK_SIZE, CHUNK_OVERLAP_PERCENT
+from app.core.config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP_PERCENT,
+    CHUNK_TOKEN_SIZE,
+    CHUNK_TOKEN_OVERLAP,
+    EMBEDDING_MODEL,
+    PARSE_POOL_ENABLED,
+)
+from app.utils.text_chunker import TextChunk, split_text, split_tokens
+from app.utils.tokens import token_offsets
+
+# A whole file as bytes, or a seekable binary file (e.g. a spooled download)
+FileSource = Union[bytes, BinaryIO]
 
 
 class DocumentProcessor:
     """Extract text from documents and chunk it"""
     
     @staticmethod
-    def extract_text(file_content: bytes, mime_type: str = None, filename: str = None) -> str:
+    def extract_text(file_content: FileSource, mime_type: str = None, filename: str = None) -> str:
         """
         Extract plain text from document file
         
         Args:
-            file_content: File content as bytes
+            file_content: File content as bytes or a seekable binary file (read from the start)
             mime_type: MIME type of the file
             filename: Filename (for extension detection)
-            
+        
         Returns:
             Extracted plain text
         """
@@ -52,10 +62,7 @@ class DocumentProcessor:
             return DocumentProcessor._extract_from_docx(file_content)
         elif mime_type == "text/plain" or file_ext == ".txt":
             return DocumentProcessor._extract_from_text(file_content)
-        elif mime_type in [
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            "application/vnd.ms-excel"
-        ] or file_ext in [".xlsx", ".xls"]:
+        elif DocumentProcessor.is_spreadsheet(mime_type, file_ext):
             return DocumentProcessor._extract_from_excel(file_content)
         else:
             # Try to read as text as fallback
@@ -65,20 +72,46 @@ class DocumentProcessor:
                 raise ValueError(f"Unsupported file type: {mime_type or file_ext}")
     
     @staticmethod
-    def _extract_from_pdf(file_content: bytes) -> str:
-        """Extract text from PDF"""
-        pdf_reader = PdfReader(io.BytesIO(file_content))
+    def _extract_from_pdf(file_content: FileSource) -> str:
+        """Extract text from PDF (in the parse pool when enabled)"""
+        if PARSE_POOL_ENABLED:
+            from app.utils.parse_pool import get_parse_pool
+            return get_parse_pool().extract_pdf(file_content)
+        text, _ = DocumentProcessor.pdf_text(DocumentProcessor.open_stream(file_content))
+        return text
+    
+    @staticmethod
+    def open_stream(file_content: FileSource) -> BinaryIO:
+        """A binary stream over the file content, positioned at the start (files are not copied)"""
+        if isinstance(file_content, bytes):
+            return io.BytesIO(file_content)
+        file_content.seek(0)
+        return file_content
+    
+    @staticmethod
+    def pdf_text(stream: BinaryIO, start: int = 0, end: Optional[int] = None) -> Tuple[str, int]:
+        """Extract text of pages [start, end) from a PDF stream. Returns (text, total page count)."""
+        pdf_reader = PdfReader(stream)
+        page_count = len(pdf_reader.pages)
         text_parts = []
-        for page in pdf_reader.pages:
-            text = page.extract_text()
+        for index in range(start, min(end if end is not None else page_count, page_count)):
+            text = pdf_reader.pages[index].extract_text()
             if text.strip():
                 text_parts.append(text)
-        return "\n\n".join(text_parts)
+        return "\n\n".join(text_parts), page_count
     
     @staticmethod
-    def _extract_from_docx(file_content: bytes) -> str:
-        """Extract text from Word document"""
-        doc = DocxDocument(io.BytesIO(file_content))
+    def _extract_from_docx(file_content: FileSource) -> str:
+        """Extract text from Word document (in the parse pool when enabled)"""
+        if PARSE_POOL_ENABLED:
+            from app.utils.parse_pool import get_parse_pool
+            return get_parse_pool().extract_docx(file_content)
+        return DocumentProcessor.docx_text(DocumentProcessor.open_stream(file_content))
+    
+    @staticmethod
+    def docx_text(stream: BinaryIO) -> str:
+        """Extract paragraph text from a Word document stream"""
+        doc = DocxDocument(stream)
         text_parts = []
         for paragraph in doc.paragraphs:
             text = paragraph.text.strip()
@@ -87,8 +120,10 @@ class DocumentProcessor:
         return "\n\n".join(text_parts)
     
     @staticmethod
-    def _extract_from_text(file_content: bytes) -> str:
+    def _extract_from_text(file_content: FileSource) -> str:
         """Extract text from plain text file"""
+        if not isinstance(file_content, bytes):
+            file_content = DocumentProcessor.open_stream(file_content).read()
         try:
             return file_content.decode('utf-8')
         except UnicodeDecodeError:
@@ -98,21 +133,91 @@ class DocumentProcessor:
                 return file_content.decode('utf-8', errors='ignore')
     
     @staticmethod
-    def _extract_from_excel(file_content: bytes) -> str:
+    def is_spreadsheet(mime_type: str = None, filename: str = None) -> bool:
+        """Whether a file is an Excel workbook (by MIME type or extension)"""
+        file_ext = Path(filename).suffix.lower() if filename else None
+        return mime_type in [
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "application/vnd.ms-excel"
+        ] or file_ext in [".xlsx", ".xls"]
+    
+    @staticmethod
+    def _extract_from_excel(file_content: FileSource) -> str:
         """Extract text from Excel file"""
-        workbook = load_workbook(io.BytesIO(file_content), data_only=True)
         text_parts = []
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            sheet_text = []
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " | ".join(str(cell) if cell is not None else "" for cell in row)
-                if row_text.strip():
-                    sheet_text.append(row_text)
-            if sheet_text:
-                text_parts.append(f"Sheet: {sheet_name}\n" + "\n".join(sheet_text))
+        sheet_text = []
+        current_sheet = None
+        for sheet_name, row_text in DocumentProcessor._iter_excel_rows(file_content):
+            if sheet_name != current_sheet:
+                if sheet_text:
+                    text_parts.append(f"Sheet: {current_sheet}\n" + "\n".join(sheet_text))
+                current_sheet, sheet_text = sheet_name, []
+            sheet_text.append(row_text)
+        if sheet_text:
+            text_parts.append(f"Sheet: {current_sheet}\n" + "\n".join(sheet_text))
         return "\n\n".join(text_parts)
+    
+    @staticmethod
+    def iter_excel_chunks(
+        file_content: FileSource,
+        max_size: int = CHUNK_SIZE,
+        measure: Callable[[str], int] = len
+    ) -> Iterator[TextChunk]:
+        """
+        Stream an Excel workbook as chunks of whole rows
+        
+        Each chunk holds the sheet name and the sheet's header row followed by
+        as many rows as fit in max_size (as counted by measure, e.g. characters
+        or tokens); a row too large on its own becomes a chunk by itself. Only
+        the current row group is held in memory. Chunks carry no text offsets
+        (start = end = 0), since there is no single extracted text.
+        """
+        current_sheet = None
+        prefix = ""
+        prefix_size = 0
+        rows: List[str] = []
+        rows_size = 0
+        # A sheet holding only its header row still becomes one chunk
+        sheet_emitted = True
+        
+        for sheet_name, row_text in DocumentProcessor._iter_excel_rows(file_content):
+            if sheet_name != current_sheet:
+                if rows or not sheet_emitted:
+                    yield TextChunk("\n".join([prefix] + rows), 0, 0)
+                sheet_emitted = False
+                # The first non-empty row of a sheet is taken as its header
+                current_sheet = sheet_name
+                prefix = f"Sheet: {sheet_name}\n{row_text}"
+                prefix_size = measure(prefix)
+                rows, rows_size = [], 0
+                continue
+            
+            row_size = measure(row_text) + 1
+            if rows and prefix_size + rows_size + row_size > max_size:
+                yield TextChunk("\n".join([prefix] + rows), 0, 0)
+                sheet_emitted = True
+                rows, rows_size = [], 0
+            rows.append(row_text)
+            rows_size += row_size
         
+        if rows or not sheet_emitted:
+            yield TextChunk("\n".join([prefix] + rows), 0, 0)
+    
+    @staticmethod
+    def _iter_excel_rows(file_content: FileSource) -> Iterator[Tuple[str, str]]:
+        """Yield (sheet name, row text) for every non-empty row, streaming the workbook in read-only mode"""
+        # read_only parses rows lazily instead of building every cell object up front
+        workbook = load_workbook(DocumentProcessor.open_stream(file_content), read_only=True, data_only=True)
+        try:
+            for sheet_name in workbook.sheetnames:
+                for row in workbook[sheet_name].iter_rows(values_only=True):
+                    if all(cell is None or str(cell).strip() == "" for cell in row):
+                        continue
+                    yield sheet_name, " | ".join(str(cell) if cell is not None else "" for cell in row)
+        finally:
+            # Read-only workbooks keep the source open until closed
+            workbook.close()
+    
     
     @staticmethod
     def chunk_text(
@@ -121,35 +226,53 @@ class DocumentProcessor:
         overlap_percent: float = CHUNK_OVERLAP_PERCENT
     ) -> List[str]:
         """
-        Split text into chunks with overlap using LangChain's RecursiveCharacterTextSplitter
+        Split text into chunks with overlap
         
         Args:
             text: Text to chunk
             chunk_size: Size of each chunk in characters (default: 500)
             overlap_percent: Overlap percentage (default: 0.2 = 20%)
-            
+        
         Returns:
             List of text chunks
         """
+        return [chunk.text for chunk in DocumentProcessor.chunk_text_with_offsets(text, chunk_size, overlap_percent)]
+    
+    @staticmethod
+    def chunk_text_with_offsets(
+        text: str,
+        chunk_size: int = CHUNK_SIZE,
+        overlap_percent: float = CHUNK_OVERLAP_PERCENT
+    ) -> List[TextChunk]:
+        """
+        Split text into chunks, keeping each chunk's [start, end) offsets in text
+        
+        Splits at the strongest separator that fits (paragraphs, then lines,
+        sentences, words, characters) to preserve semantic structure.
+        """
         if not text or not text.strip():
             return []
         
         # Calculate overlap in characters
         overlap = int(chunk_size * overlap_percent)  # 20% of 500 = 100 chars
         
-        # Initialize RecursiveCharacterTextSplitter
-        # This uses a hierarchical approach: tries to split by paragraphs, then sentences, 
-        # then words, then characters - preserving semantic structure
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]  # Try these separators in order
-        )
+        return split_text(text, chunk_size, overlap)
+    
+    @staticmethod
+    def chunk_text_by_tokens(
+        text: str,
+        chunk_tokens: int = CHUNK_TOKEN_SIZE,
+        overlap_tokens: int = CHUNK_TOKEN_OVERLAP,
+        model: str = EMBEDDING_MODEL
+    ) -> List[TextChunk]:
+        """
+        Split text into chunks of about chunk_tokens tokens of the embedding model's tokenizer
         
-        # Split the text into chunks
-        chunks = text_splitter.split_text(text)
+        Token density differs between prose, tables and spreadsheet rows, so
+        token-sized chunks fill the embedding input (and the prompt) more
+        predictably than character-sized ones.
+        """
+        if not text or not text.strip():
+            return []
         
-        # Filter out empty chunks
-        return [chunk.strip() for chunk in chunks if chunk.strip()]
-
+        return split_tokens(text, token_offsets(text, model), chunk_tokens, overlap_tokens)
@@ -0,0 +1,189 @@
+"""
+Out-of-process document parsing
+
+pypdf and python-docx are pure-Python and CPU-bound: parsing a large file in a
+thread holds the GIL and starves the API. Here each parse task runs in its own
+child process (forked from a preloaded forkserver, so startup is cheap), which
+can be killed when it exceeds its timeout or memory limit.
+
+The file is copied once, in blocks, to a temporary file and children mmap it,
+so the blob is never pickled or held whole in memory. Large PDFs are split into page ranges parsed in parallel.
+"""
+
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional, Tuple, Union
+
+from app.core.config import (
+    PARSE_POOL_WORKERS,
+    PARSE_TIMEOUT_SECONDS,
+    PARSE_PDF_PAGES_PER_TASK,
+    PARSE_MAX_MEMORY_MB,
+)
+
+
+class DocumentParseError(Exception):
+    """A parse task failed inside its child process"""
+
+
+class DocumentParseTimeout(DocumentParseError):
+    """A parse task exceeded its timeout and was killed"""
+
+
+def _parse_in_child(conn, kind: str, path: str, start: int, end: Optional[int], max_memory_mb: int) -> None:
+    """Child process entry point: parse part of the mmapped file and send back (text, page_count)"""
+    try:
+        if max_memory_mb > 0:
+            import resource
+            limit = max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+        from app.utils.document_processor import DocumentProcessor
+
+        with open(path, "rb") as f:
+            if kind == "pdf":
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    result = DocumentProcessor.pdf_text(data, start, end)
+            else:
+                # zipfile needs a seekable file object, which mmap is not
+                result = (DocumentProcessor.docx_text(f), 0)
+        conn.send(("ok", result))
+    except MemoryError:
+        conn.send(("error", f"Parser exceeded the {max_memory_mb} MB memory limit"))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+class ParsePool:
+    """
+    Runs parse tasks in killable child processes, at most `workers` at a time.
+    Every task, including the first page range of a PDF, goes through the
+    supervisor threads, so concurrent ingestions share that limit.
+    """
+
+    def __init__(
+        self,
+        workers: int = PARSE_POOL_WORKERS,
+        timeout_seconds: float = PARSE_TIMEOUT_SECONDS,
+        pdf_pages_per_task: int = PARSE_PDF_PAGES_PER_TASK,
+        max_memory_mb: int = PARSE_MAX_MEMORY_MB
+    ):
+        self.workers = max(1, workers)
+        self.timeout_seconds = timeout_seconds
+        self.pdf_pages_per_task = max(1, pdf_pages_per_task)
+        self.max_memory_mb = max_memory_mb
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context("forkserver")
+            # Children fork from a server that has already imported the parsers
+            self._context.set_forkserver_preload(["app.utils.document_processor"])
+        else:
+            self._context = multiprocessing.get_context("spawn")
+
+        # Each supervisor thread babysits one child process at a time
+        self._supervisors = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parse-supervisor")
+
+    def extract_pdf(self, file_content: Union[bytes, BinaryIO]) -> str:
+        """Extract PDF text, one task per page range"""
+        with _TempBlob(file_content, ".pdf") as path:
+            # The first task also reports the page count, so small PDFs need a single process
+            first_text, page_count = self._supervised("pdf", path, 0, self.pdf_pages_per_task)
+
+            ranges = [
+                (start, min(start + self.pdf_pages_per_task, page_count))
+                for start in range(self.pdf_pages_per_task, page_count, self.pdf_pages_per_task)
+            ]
+            futures = [self._supervisors.submit(self._run_task, "pdf", path, start, end) for start, end in ranges]
+            try:
+                texts = [first_text] + [future.result()[0] for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        return "\n\n".join(text for text in texts if text)
+
+    def extract_docx(self, file_content: Union[bytes, BinaryIO]) -> str:
+        """Extract Word document text in a child process"""
+        with _TempBlob(file_content, ".docx") as path:
+            text, _ = self._supervised("docx", path, 0, None)
+        return text
+
+    def _supervised(self, kind: str, path: str, start: int, end: Optional[int]) -> Tuple[str, int]:
+        """Run one parse task on a supervisor thread and wait for it"""
+        return self._supervisors.submit(self._run_task, kind, path, start, end).result()
+
+    def _run_task(self, kind: str, path: str, start: int, end: Optional[int]) -> Tuple[str, int]:
+        """Run one parse task in a fresh child process, killing it on timeout"""
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_parse_in_child,
+            args=(sender, kind, path, start, end, self.max_memory_mb),
+            daemon=True
+        )
+        process.start()
+        sender.close()
+
+        try:
+            if not receiver.poll(self.timeout_seconds):
+                raise DocumentParseTimeout(
+                    f"Parsing {kind} (pages {start}-{end}) timed out after {self.timeout_seconds}s"
+                )
+            try:
+                status, payload = receiver.recv()
+            except EOFError:
+                process.join(1)
+                raise DocumentParseError(f"Parser process exited unexpectedly (exit code {process.exitcode})")
+        finally:
+            receiver.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+
+        if status != "ok":
+            raise DocumentParseError(payload)
+        return payload
+
+
+class _TempBlob:
+    """Context manager writing bytes or a binary file to a temporary file that children can mmap"""
+
+    def __init__(self, data: Union[bytes, BinaryIO], suffix: str):
+        self.data = data
+        self.suffix = suffix
+        self.path: Optional[str] = None
+
+    def __enter__(self) -> str:
+        fd, self.path = tempfile.mkstemp(prefix="parse-", suffix=self.suffix)
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(self.data, bytes):
+                f.write(self.data)
+            else:
+                self.data.seek(0)
+                shutil.copyfileobj(self.data, f)
+        return self.path
+
+    def __exit__(self, *exc_info):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+# Singleton instance (created on first use)
+_parse_pool: Optional[ParsePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ParsePool:
+    global _parse_pool
+    with _pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool()
+        return _parse_pool
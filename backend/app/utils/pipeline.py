@@ -0,0 +1,136 @@
+"""
+Bounded, multi-stage thread pipeline
+
+Items flow through a chain of stages connected by bounded queues. Each stage
+has its own worker count, so different items can be in different stages at
+once (item N+1 downloading while item N is parsed), and a full queue blocks
+the stage feeding it (back-pressure), keeping the number of in-flight items,
+and therefore memory, bounded.
+
+A fan-out stage turns one item into several (e.g. a document into parts); its
+output is consumed lazily, so back-pressure reaches the producer as well.
+"""
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline step: func(item) -> item passed to the next stage"""
+
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    # Items allowed to wait in front of this stage
+    queue_size: int = 2
+    # func returns an iterable whose elements are passed on as separate items
+    fan_out: bool = False
+
+    def __post_init__(self):
+        self.workers = max(1, self.workers)
+
+
+def run_pipeline(
+    items: Iterable[Any],
+    stages: List[Stage],
+    on_error: Optional[Callable[[Any, str, Exception], None]] = None,
+) -> List[Any]:
+    """
+    Push items through stages and return the outputs of the last stage.
+
+    An exception in a stage drops that item from the pipeline and is reported
+    through on_error(item, stage_name, exc); other items keep flowing. For a
+    fan-out stage, elements produced before the exception have already been
+    passed on. Output order follows completion order, not input order.
+    """
+    if not stages:
+        return list(items)
+
+    queues = [queue.Queue(maxsize=max(1, stage.queue_size)) for stage in stages]
+    results: List[Any] = []
+    results_lock = threading.Lock()
+    feeder_error: List[BaseException] = []
+
+    def feed() -> None:
+        try:
+            for item in items:
+                queues[0].put(item)
+        except BaseException as exc:  # pylint: disable=broad-except
+            feeder_error.append(exc)
+        finally:
+            for _ in range(stages[0].workers):
+                queues[0].put(_DONE)
+
+    def report(item: Any, stage: Stage, exc: Exception) -> None:
+        if on_error:
+            try:
+                on_error(item, stage.name, exc)
+            except Exception as handler_exc:  # pylint: disable=broad-except
+                print(f"[PIPELINE] Error handler failed in stage {stage.name}: {handler_exc}")
+
+    def make_worker(index: int, remaining: List[int], lock: threading.Lock) -> Callable[[], None]:
+        stage = stages[index]
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+
+        def emit(output: Any) -> None:
+            if outbox is not None:
+                outbox.put(output)
+            else:
+                with results_lock:
+                    results.append(output)
+
+        def work() -> None:
+            try:
+                while True:
+                    item = inbox.get()
+                    if item is _DONE:
+                        return
+                    try:
+                        output = stage.func(item)
+                        if not stage.fan_out:
+                            emit(output)
+                            continue
+                        # Pulled one element at a time: a full outbox pauses the producer
+                        for element in output:
+                            emit(element)
+                    except Exception as exc:  # pylint: disable=broad-except
+                        report(item, stage, exc)
+            finally:
+                # The last worker of a stage to finish tells the next stage to stop
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and outbox is not None:
+                    for _ in range(stages[index + 1].workers):
+                        outbox.put(_DONE)
+
+        return work
+
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    for index, stage in enumerate(stages):
+        remaining = [stage.workers]
+        lock = threading.Lock()
+        for n in range(stage.workers):
+            threads.append(
+                threading.Thread(
+                    target=make_worker(index, remaining, lock),
+                    name=f"pipeline-{stage.name}-{n}",
+                    daemon=True,
+                )
+            )
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if feeder_error:
+        raise feeder_error[0]
+    return results
@@ -0,0 +1,32 @@
+"""
+Reciprocal rank fusion of ranked result lists
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Dict[str, Sequence[Dict]],
+    top_k: int,
+    k: int = 60,
+) -> List[Dict]:
+    """
+    Fuse search results from several retrievers by summing 1 / (k + rank).
+
+    ranked_lists maps a retriever name (e.g. "dense", "keyword") to its
+    results, best first. Results are identified by (document_id, chunk_index);
+    the first retriever's copy of a result is kept, and each fused result gets
+    'rrf_score' plus '<name>_rank' (1-based) for every retriever that found it.
+    RRF needs only ranks, so the retrievers' scores need not be comparable.
+    """
+    fused: Dict[Tuple, Dict] = {}
+    for name, results in ranked_lists.items():
+        for rank, result in enumerate(results, start=1):
+            key = (result.get("document_id"), result.get("chunk_index"))
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(result, rrf_score=0.0)
+            entry["rrf_score"] += 1.0 / (k + rank)
+            entry[f"{name}_rank"] = rank
+
+    return sorted(fused.values(), key=lambda result: result["rrf_score"], reverse=True)[:top_k]
@@ -0,0 +1,154 @@
+"""
+Single-pass text chunker with character offsets
+
+Splits text into windows of at most chunk_size characters, ending each window
+at the strongest separator available inside it (paragraph, line, sentence,
+word, in that order), with overlap between consecutive windows. Separators are
+found with bounded rfind calls over the current window only, so the text is
+scanned a constant number of times overall (linear in its length), unlike
+recursive splitting which re-splits and re-merges pieces at every level.
+
+split_tokens applies the same procedure with windows measured in tokens of
+the embedding model's tokenizer instead of characters.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import List, NamedTuple, Sequence
+
+
+# Strongest first; mirrors the previous RecursiveCharacterTextSplitter setup
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+class TextChunk(NamedTuple):
+    """A chunk and its [start, end) character offsets in the source text"""
+
+    text: str
+    start: int
+    end: int
+
+
+def split_text(
+    text: str,
+    chunk_size: int,
+    overlap: int = 0,
+    separators: Sequence[str] = SEPARATORS,
+) -> List[TextChunk]:
+    """
+    Split text into overlapping chunks of at most chunk_size characters.
+
+    Chunk text is stripped of surrounding whitespace and the offsets point at
+    the stripped text, so text[chunk.start:chunk.end] == chunk.text.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    # Each chunk must advance past the previous one
+    overlap = max(0, min(overlap, chunk_size - 1))
+
+    length = len(text)
+    chunks: List[TextChunk] = []
+    pos = 0
+
+    while pos < length:
+        while pos < length and text[pos].isspace():
+            pos += 1
+        if pos >= length:
+            break
+
+        limit = pos + chunk_size
+        if limit >= length:
+            end = length
+        else:
+            # Break after the overlap so the next chunk starts further along
+            end = _break_point(text, pos + overlap + 1, limit, separators)
+
+        _append_stripped(chunks, text, pos, end)
+
+        if end >= length:
+            break
+
+        next_pos = end
+        if overlap:
+            next_pos = end - overlap
+            # Start the overlap on a word boundary when there is one
+            space = text.find(" ", next_pos, end)
+            if space != -1:
+                next_pos = space + 1
+            next_pos = max(next_pos, pos + 1)
+        pos = next_pos
+
+    return chunks
+
+
+def split_tokens(
+    text: str,
+    token_starts: Sequence[int],
+    chunk_tokens: int,
+    overlap_tokens: int = 0,
+    separators: Sequence[str] = SEPARATORS,
+) -> List[TextChunk]:
+    """
+    Split text into overlapping chunks of about chunk_tokens tokens.
+
+    token_starts holds the character offset of each token (see
+    app.utils.tokens.token_offsets). Breaks still fall on separators, so a
+    chunk may exceed chunk_tokens by one token when a separator splits a token.
+    """
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be positive")
+    overlap_tokens = max(0, min(overlap_tokens, chunk_tokens - 1))
+
+    length = len(text)
+    n_tokens = len(token_starts)
+
+    def char_at(token: int) -> int:
+        return token_starts[token] if token < n_tokens else length
+
+    chunks: List[TextChunk] = []
+    pos = 0
+
+    while pos < length:
+        while pos < length and text[pos].isspace():
+            pos += 1
+        if pos >= length:
+            break
+
+        # Token containing pos
+        token = max(0, bisect_right(token_starts, pos) - 1)
+        limit = char_at(token + chunk_tokens)
+        if limit >= length:
+            end = length
+        else:
+            end = _break_point(text, char_at(token + overlap_tokens + 1), limit, separators)
+
+        _append_stripped(chunks, text, pos, end)
+
+        if end >= length:
+            break
+
+        if overlap_tokens:
+            # First token at or after the break, stepped back by the overlap
+            end_token = bisect_left(token_starts, end, lo=token + 1)
+            pos = char_at(max(end_token - overlap_tokens, token + 1))
+        else:
+            pos = end
+
+    return chunks
+
+
+def _break_point(text: str, lowest: int, limit: int, separators: Sequence[str]) -> int:
+    """End of a chunk in [lowest, limit): after the strongest separator found, else a hard cut at limit"""
+    for separator in separators:
+        index = text.rfind(separator, lowest, limit)
+        if index != -1:
+            # Keep sentence punctuation with the sentence; drop whitespace
+            return index + len(separator.rstrip())
+    return limit
+
+
+def _append_stripped(chunks: List[TextChunk], text: str, start: int, end: int) -> None:
+    """Append text[start:end] without trailing whitespace (start is already past leading whitespace)"""
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if end > start:
+        chunks.append(TextChunk(text[start:end], start, end))
@@ -0,0 +1,63 @@
+"""
+Tokenizer helpers (tiktoken) shared by embedding batching and chunking
+"""
+
+from functools import lru_cache
+from typing import List, Sequence
+
+import numpy as np
+import tiktoken
+
+
+# Fallback for models tiktoken does not know yet (e.g. text-embedding-3-*)
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Return the (cached) tiktoken encoding used by a model"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Number of tokens text occupies for a model"""
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def count_tokens_batch(texts: Sequence[str], model: str) -> List[int]:
+    """Token count of each text"""
+    return [len(tokens) for tokens in encode_batch(texts, model)]
+
+
+def encode_batch(texts: Sequence[str], model: str) -> List[List[int]]:
+    """Tokenize many texts at once (tiktoken parallelizes this natively)"""
+    return get_encoding(model).encode_ordinary_batch(list(texts))
+
+
+def token_offsets(text: str, model: str) -> List[int]:
+    """
+    Character offset at which each token of text starts.
+
+    A token that starts inside a multi-byte character maps to that character.
+    Vectorized equivalent of Encoding.decode_with_offsets, which loops over
+    every byte in Python.
+    """
+    encoding = get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    if not tokens:
+        return []
+
+    token_lengths = np.fromiter(
+        (len(token) for token in encoding.decode_tokens_bytes(tokens)),
+        dtype=np.int64,
+        count=len(tokens),
+    )
+    byte_starts = np.concatenate(([0], np.cumsum(token_lengths)[:-1]))
+
+    # Character index of every UTF-8 byte: count the bytes that start a character
+    utf8 = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    char_index = np.cumsum((utf8 & 0xC0) != 0x80) - 1
+    return char_index[byte_starts].tolist()
@@ -0,0 +1,128 @@
+"""
+Bounded, thread-safe TTL cache with optional negative caching and stats
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    LRU-bounded mapping whose entries expire after a fixed time-to-live.
+
+    A value of None can be cached as a "negative" entry (e.g. unknown ID) with
+    its own, usually shorter, TTL.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_items: int = 1024,
+        negative_ttl_seconds: Optional[float] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        # key -> (value, stored_at, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+        self._served_age_total = 0.0
+        self._served_age_max = 0.0
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value); value may be None for a negative entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+
+            value, stored_at, expires_at = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self._counters["negative_hits" if value is None else "hits"] += 1
+            age = now - stored_at
+            self._served_age_total += age
+            self._served_age_max = max(self._served_age_max, age)
+            return True, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value for key, or default when missing/expired"""
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value. None is only stored when negative caching is enabled
+        (or an explicit ttl_seconds is given).
+        """
+        if ttl_seconds is None:
+            ttl_seconds = self.negative_ttl_seconds if value is None else self.ttl_seconds
+        if ttl_seconds is None or ttl_seconds <= 0:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now, now + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value, calling loader and caching its result on a miss"""
+        found, value = self.lookup(key)
+        if found:
+            return value
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key matches predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+                self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit rate, size and age (staleness) of served entries"""
+        with self._lock:
+            hits = self._counters["hits"] + self._counters["negative_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "avg_served_age_seconds": (self._served_age_total / hits) if hits else 0.0,
+                "max_served_age_seconds": self._served_age_max,
+            }
@@ -0,0 +1,6 @@
+-- Fingerprint of what was indexed for each document, used by incremental re-ingestion
+-- to skip documents whose content and chunking parameters have not changed.
+
+ALTER TABLE document_metadata
+    ADD COLUMN IF NOT EXISTS content_hash TEXT,
+    ADD COLUMN IF NOT EXISTS chunk_params JSONB;
@@ -0,0 +1,29 @@
+-- Background ingestion jobs: one row per POST /api/ingest/{chatbot_id}, polled via
+-- GET /api/ingest/{chatbot_id}/jobs/{job_id}.
+
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    chatbot_id UUID NOT NULL REFERENCES chatbots(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    mode TEXT NOT NULL DEFAULT 'incremental',          -- 'incremental' | 'full'
+    status TEXT NOT NULL DEFAULT 'queued',             -- 'queued' | 'running' | 'completed' | 'failed'
+    progress JSONB NOT NULL DEFAULT '{}'::jsonb,       -- per-document stage + counts
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_chatbot ON ingestion_jobs(chatbot_id, created_at DESC);
+
+-- At most one active job per chatbot, even across API worker processes
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ingestion_jobs_active_chatbot
+    ON ingestion_jobs(chatbot_id)
+    WHERE status IN ('queued', 'running');
+
+-- Jobs are read and written only by the backend with the service role key, which
+-- bypasses RLS. With RLS on and no policies, the anon and authenticated keys see
+-- nothing through PostgREST.
+ALTER TABLE ingestion_jobs ENABLE ROW LEVEL SECURITY;
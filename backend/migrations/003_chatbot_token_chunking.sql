@@ -0,0 +1,10 @@
+-- Per-chatbot chunking settings. NULL falls back to the server defaults
+-- (CHUNKING_MODE, CHUNK_TOKEN_SIZE, CHUNK_TOKEN_OVERLAP).
+
+ALTER TABLE chatbots
+    ADD COLUMN IF NOT EXISTS chunking_mode TEXT
+        CHECK (chunking_mode IN ('characters', 'tokens')),
+    ADD COLUMN IF NOT EXISTS chunk_token_size INTEGER
+        CHECK (chunk_token_size > 0 AND chunk_token_size <= 8191),
+    ADD COLUMN IF NOT EXISTS chunk_token_overlap INTEGER
+        CHECK (chunk_token_overlap >= 0);
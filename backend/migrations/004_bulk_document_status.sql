@@ -0,0 +1,33 @@
+-- Apply many document status transitions in one call (DocumentStatusWriter).
+-- updates is a JSON array of objects with "id" plus any of status, chunk_count,
+-- error_message, content_hash, chunk_params, processed_at; columns whose key is
+-- absent keep their value, as with a single-row UPDATE. Rows that no longer
+-- exist (document deleted mid-ingestion) are skipped rather than re-created.
+
+CREATE OR REPLACE FUNCTION update_document_statuses(updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE document_metadata AS d
+    SET
+        status = CASE WHEN u ? 'status' THEN u->>'status' ELSE d.status END,
+        chunk_count = CASE WHEN u ? 'chunk_count' THEN (u->>'chunk_count')::INTEGER ELSE d.chunk_count END,
+        error_message = CASE WHEN u ? 'error_message' THEN u->>'error_message' ELSE d.error_message END,
+        content_hash = CASE WHEN u ? 'content_hash' THEN u->>'content_hash' ELSE d.content_hash END,
+        chunk_params = CASE WHEN u ? 'chunk_params' THEN u->'chunk_params' ELSE d.chunk_params END,
+        processed_at = CASE WHEN u ? 'processed_at' THEN (u->>'processed_at')::TIMESTAMPTZ ELSE d.processed_at END
+    FROM jsonb_array_elements(updates) AS u
+    WHERE d.id = (u->>'id')::UUID;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$;
+
+-- Only the backend (service role) may call this; PostgREST would otherwise expose
+-- it to the anon and authenticated keys, since functions are executable by PUBLIC.
+REVOKE EXECUTE ON FUNCTION update_document_statuses(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_document_statuses(JSONB) TO service_role;
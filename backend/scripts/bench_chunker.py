@@ -0,0 +1,98 @@
+"""
+Benchmark the native chunker against LangChain's RecursiveCharacterTextSplitter
+
+Usage (from backend/):
+    python scripts/bench_chunker.py [--mb 1 4 16] [--chunk-size 500] [--overlap 0.2]
+
+LangChain is no longer a dependency; install it separately to include it in
+the comparison (pip install langchain==0.1.0).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.text_chunker import SEPARATORS, split_text  # noqa: E402
+
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog bot studio ingestion chunk vector "
+    "embedding retrieval document paragraph sentence customer support pricing"
+).split()
+
+
+def make_text(n_bytes: int, seed: int = 0) -> str:
+    """Synthetic prose: sentences grouped into lines and paragraphs"""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < n_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + ". "
+        parts.append(sentence)
+        size += len(sentence)
+        roll = rng.random()
+        if roll < 0.05:
+            parts.append("\n\n")
+        elif roll < 0.15:
+            parts.append("\n")
+    return "".join(parts)
+
+
+def timed(func, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=float, default=0.2, help="Overlap as a fraction of chunk size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    overlap = int(args.chunk_size * args.overlap)
+
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        RecursiveCharacterTextSplitter = None
+        print("LangChain not installed; timing the native chunker only\n")
+
+    print(f"{'size':>8} {'splitter':>10} {'seconds':>9} {'MB/s':>8} {'chunks':>8} {'avg len':>8}")
+    for mb in args.mb:
+        text = make_text(int(mb * 1024 * 1024))
+
+        seconds, chunks = timed(lambda: split_text(text, args.chunk_size, overlap), args.repeat)
+        # Offsets must address the source text exactly
+        assert all(text[chunk.start:chunk.end] == chunk.text for chunk in chunks)
+        avg = sum(len(chunk.text) for chunk in chunks) / max(1, len(chunks))
+        print(f"{mb:>6g}MB {'native':>10} {seconds:>9.3f} {mb / seconds:>8.1f} {len(chunks):>8} {avg:>8.0f}")
+
+        if RecursiveCharacterTextSplitter is not None:
+            def run_langchain():
+                # Built per call, as DocumentProcessor.chunk_text used to
+                splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=args.chunk_size,
+                    chunk_overlap=overlap,
+                    length_function=len,
+                    separators=list(SEPARATORS) + [""],
+                )
+                return splitter.split_text(text)
+
+            seconds, chunks = timed(run_langchain, args.repeat)
+            avg = sum(len(chunk) for chunk in chunks) / max(1, len(chunks))
+            print(f"{mb:>6g}MB {'langchain':>10} {seconds:>9.3f} {mb / seconds:>8.1f} {len(chunks):>8} {avg:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Copy per-chatbot Zilliz collections (chatbot_<id>) into the shared, chatbot_id
+partition-keyed collection(s) used when ZILLIZ_COLLECTION_MODE=shared
+
+Usage (from backend/):
+    python scripts/migrate_to_shared_collection.py [--chatbot ID ...] [--batch-size 1000] [--drop-source] [--reindex] [--dry-run]
+
+Rows are streamed with query_iterator, so no collection is read into memory
+at once; vectors are copied as stored (nothing is re-embedded). A chatbot's
+rows in the shared collection are deleted before it is copied, so the script
+can be re-run. Source collections are dropped only with --drop-source and
+only after the copied row count matches. Switch ZILLIZ_COLLECTION_MODE to
+"shared" once every chatbot is migrated.
+
+A shared collection that grew into the next index tier is re-indexed once,
+after every chatbot is copied, and only with --reindex; otherwise run
+scripts/reindex_collections.py --shared afterwards.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymilvus import Collection, utility  # noqa: E402
+
+from app.services.zilliz_service import OPTIONAL_FIELDS, ZillizService  # noqa: E402
+
+
+SCALAR_FIELDS = ["id", "document_id", "chunk_index", "text", "filename", "chatbot_id", "user_id"]
+
+
+def count_rows(collection: Collection, expr: str) -> int:
+    # Strong consistency, so rows inserted just before are counted
+    rows = collection.query(expr=expr, output_fields=["count(*)"], consistency_level="Strong")
+    return rows[0]["count(*)"] if rows else 0
+
+
+def source_collections(service: ZillizService, chatbot_ids) -> list:
+    """Per-chatbot collections to migrate"""
+    if chatbot_ids:
+        names = [service.chatbot_collection_name(chatbot_id) for chatbot_id in chatbot_ids]
+        return [name for name in names if utility.has_collection(name)]
+    return service.chatbot_collection_names()
+
+
+def migrate_collection(
+    service: ZillizService,
+    name: str,
+    batch_size: int,
+    drop_source: bool,
+    dry_run: bool,
+    touched: set,
+) -> int:
+    """Copy one per-chatbot collection, adding the shared collection to touched; returns the number of rows copied"""
+    source = Collection(name)
+    source.load()
+    source_fields = {field.name for field in source.schema.fields}
+    optional = [field for field in OPTIONAL_FIELDS if field in source_fields]
+
+    # Every row of a per-chatbot collection carries the same chatbot_id
+    sample = source.query(expr='id != ""', output_fields=["chatbot_id"], limit=1)
+    if not sample:
+        print(f"[MIGRATE] {name}: empty, skipping")
+        return 0
+    chatbot_id = sample[0]["chatbot_id"]
+    expected = count_rows(source, 'id != ""')
+    print(f"[MIGRATE] {name}: {expected} rows of chatbot {chatbot_id} -> {service.get_collection_name(chatbot_id)}")
+    if dry_run:
+        return 0
+
+    target = service.reset_collection(chatbot_id)
+    touched.add(target.name)
+    target_fields = service.optional_fields(target)
+
+    copied = 0
+    started = time.perf_counter()
+    iterator = source.query_iterator(
+        batch_size=batch_size,
+        expr='id != ""',
+        output_fields=SCALAR_FIELDS + optional + ["embedding"],
+    )
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            columns = [[row[field] for row in rows] for field in SCALAR_FIELDS]
+            for field in OPTIONAL_FIELDS:
+                if field in target_fields:
+                    columns.append([row.get(field, 0) for row in rows])
+            columns.append([row["embedding"] for row in rows])
+            target.insert(columns)
+            copied += len(rows)
+    finally:
+        iterator.close()
+    target.flush()
+
+    migrated = count_rows(target, service.scope_expr(chatbot_id))
+    elapsed = time.perf_counter() - started
+    print(f"[MIGRATE] {name}: copied {copied} rows in {elapsed:.1f}s; shared collection has {migrated}")
+
+    if migrated != expected:
+        print(f"[MIGRATE] {name}: row count mismatch ({migrated} != {expected}), keeping the source collection")
+    elif drop_source:
+        service.drop_collection(name)
+        print(f"[MIGRATE] {name}: dropped source collection")
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chatbot", nargs="+", default=None, help="Only migrate these chatbot IDs")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--drop-source", action="store_true", help="Drop each per-chatbot collection after a verified copy")
+    parser.add_argument("--reindex", action="store_true", help="Rebuild outgrown shared collection indexes once at the end")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be migrated")
+    args = parser.parse_args()
+
+    service = ZillizService(collection_mode="shared")
+    service.ensure_connected()
+
+    names = source_collections(service, args.chatbot)
+    print(f"[MIGRATE] {len(names)} per-chatbot collections to migrate")
+
+    total = 0
+    failed = []
+    touched = set()
+    for name in names:
+        try:
+            total += migrate_collection(service, name, args.batch_size, args.drop_source, args.dry_run, touched)
+        except Exception as e:
+            print(f"[MIGRATE] {name}: failed: {e}")
+            failed.append(name)
+
+    # A rebuild covers every chatbot in the collection: once per shared collection, after all copies
+    if touched and args.reindex:
+        for name in sorted(touched):
+            service.reindex_collection(name)
+    elif touched:
+        print("[MIGRATE] Shared collections may have outgrown their index; run: python scripts/reindex_collections.py --shared")
+
+    print(f"[MIGRATE] Done: {total} rows copied, {len(failed)} collections failed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Rebuild Zilliz embedding indexes whose type no longer fits the collection size
+
+Usage (from backend/):
+    python scripts/reindex_collections.py [--chatbot ID ...] [--shared] [--dry-run]
+
+A rebuild copies the collection into a new one with the new index and then
+moves the collection name onto it, holding back this host's writes while it
+copies; writers on other hosts are not held back, so run it while nothing
+ingests. Shared collections hold many chatbots and are never re-indexed
+automatically after ingestion. Without arguments every collection of the
+current ZILLIZ_COLLECTION_MODE is checked.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymilvus import Collection, utility  # noqa: E402
+
+from app.services.zilliz_service import ZillizService, index_plan, needs_reindex  # noqa: E402
+
+
+def collection_names(service: ZillizService, chatbot_ids) -> list:
+    """Collections to check: those of the given chatbots, or every collection of the current mode"""
+    if chatbot_ids:
+        names = {service.get_collection_name(chatbot_id) for chatbot_id in chatbot_ids}
+        return sorted(name for name in names if utility.has_collection(name))
+    if service.shared:
+        return [name for name in service.shared_collection_names() if utility.has_collection(name)]
+    return service.chatbot_collection_names()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chatbot", nargs="+", default=None, help="Only check these chatbots' collections")
+    parser.add_argument("--shared", action="store_true", help="Check shared collections (overrides ZILLIZ_COLLECTION_MODE)")
+    parser.add_argument("--dry-run", action="store_true", help="List the indexes that would be rebuilt")
+    args = parser.parse_args()
+
+    service = ZillizService(collection_mode="shared") if args.shared else ZillizService()
+    service.ensure_connected()
+
+    names = collection_names(service, args.chatbot)
+    print(f"[REINDEX] Checking {len(names)} collections")
+
+    rebuilt = 0
+    for name in names:
+        collection = Collection(name)
+        current = service.index_info(collection)
+        desired = index_plan(collection.num_entities)
+        if not needs_reindex(current, desired):
+            continue
+        print(
+            f"[REINDEX] {name}: {current and current['index_type']} -> {desired['index_type']} "
+            f"({collection.num_entities} vectors)"
+        )
+        if not args.dry_run:
+            service.reindex_collection(name)
+        rebuilt += 1
+
+    print(f"[REINDEX] Done: {rebuilt} indexes {'to rebuild' if args.dry_run else 'rebuilt'}")
+
+
+if __name__ == "__main__":
+    main()
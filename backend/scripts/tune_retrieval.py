@@ -0,0 +1,311 @@
+"""
+Measure a chatbot's retrieval recall and latency and write tuned settings
+
+Usage (from backend/):
+    python scripts/tune_retrieval.py --chatbot ID [--queries questions.txt | --sample 200]
+        [--top-k 4 8 12 16 25] [--target-recall 0.95] [--repeat 3] [--dry-run]
+
+The chatbot's stored vectors are streamed once to compute the exact nearest
+neighbors of every query with NumPy (only the running top-k per query is kept
+in memory). The live collection is then searched with each candidate search
+setting (nprobe for IVF_FLAT, ef for HNSW; FLAT and local collections have a
+single setting) and every top_k, and recall@k is reported against p50/p99
+search latency.
+
+Queries come from --queries (one question per line, embedded with the
+configured model) or, by default, from --sample stored chunks. Real questions
+are preferred: only they are used to derive a relevance threshold.
+
+Recommendations, written to RETRIEVAL_CONFIG_DIR/<chatbot>.json and picked up
+by the chat service within RETRIEVAL_CONFIG_CACHE_TTL_SECONDS:
+  relevance_threshold_l2  distance at which --coverage of the questions still keep
+                          their best chunk (never above RELEVANCE_THRESHOLD_L2)
+  top_k                   smallest swept top_k holding the chunks under the threshold
+                          for --coverage of the queries
+  search_params           cheapest setting reaching --target-recall at that top_k
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app.core.config import CHAT_TOP_K, RELEVANCE_THRESHOLD_L2  # noqa: E402
+from app.services.retrieval_config import retrieval_config  # noqa: E402
+from app.services.vector_store_router import vector_store  # noqa: E402
+
+
+NPROBE_CANDIDATES = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+EF_CANDIDATES = (16, 32, 64, 128, 256, 512)
+# Added to the measured threshold so near-ties of the best chunk are kept
+THRESHOLD_MARGIN = 0.05
+
+
+def iter_vectors(chatbot_id: str, backend: str, batch_size: int):
+    """Yield (keys, vectors) batches of a chatbot's stored chunks; keys are (document_id, chunk_index)"""
+    if backend == "local":
+        collection = vector_store.local.get_collection(chatbot_id)
+        if collection is None:
+            return
+        for run in collection.export_documents(batch_rows=batch_size):
+            keys = [(run["document_id"], run["first_chunk_index"] + i) for i in range(len(run["chunks"]))]
+            yield keys, np.asarray(run["embeddings"], dtype=np.float32)
+        return
+
+    service = vector_store.zilliz
+    collection = service.get_collection(chatbot_id)
+    if collection is None:
+        return
+    iterator = collection.query_iterator(
+        batch_size=batch_size,
+        expr=service.scope_expr(chatbot_id, 'id != ""'),
+        output_fields=["document_id", "chunk_index", "embedding"],
+    )
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            keys = [(row["document_id"], row["chunk_index"]) for row in rows]
+            yield keys, np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+    finally:
+        iterator.close()
+
+
+def sample_queries(chatbot_id: str, backend: str, n: int, batch_size: int, seed: int) -> np.ndarray:
+    """Reservoir sample of n stored vectors"""
+    rng = random.Random(seed)
+    reservoir = []
+    seen = 0
+    for _, vectors in iter_vectors(chatbot_id, backend, batch_size):
+        for vector in vectors:
+            seen += 1
+            if len(reservoir) < n:
+                reservoir.append(vector)
+            else:
+                slot = rng.randrange(seen)
+                if slot < n:
+                    reservoir[slot] = vector
+    return np.asarray(reservoir, dtype=np.float32)
+
+
+def exact_neighbors(chatbot_id: str, backend: str, queries: np.ndarray, k: int, batch_size: int):
+    """
+    Exact top-k squared L2 neighbors of every query, streamed over the stored vectors.
+    Returns (keys of the k nearest per query, their distances, number of stored vectors).
+    """
+    best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+    all_keys = []
+
+    for keys, vectors in iter_vectors(chatbot_id, backend, batch_size):
+        ids = np.arange(len(all_keys), len(all_keys) + len(keys))
+        all_keys.extend(keys)
+        distances = query_norms + np.einsum("ij,ij->i", vectors, vectors)[None, :] - 2.0 * (queries @ vectors.T)
+
+        distances = np.concatenate([best_distances, distances], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(ids, (len(queries), len(ids)))], axis=1)
+        keep = min(k, distances.shape[1])
+        part = np.argpartition(distances, keep - 1, axis=1)[:, :keep]
+        best_distances = np.take_along_axis(distances, part, axis=1)
+        best_ids = np.take_along_axis(ids, part, axis=1)
+
+    order = np.argsort(best_distances, axis=1)
+    best_distances = np.take_along_axis(best_distances, order, axis=1)
+    best_ids = np.take_along_axis(best_ids, order, axis=1)
+    neighbors = [[all_keys[i] for i in row] for row in best_ids]
+    return neighbors, np.maximum(best_distances, 0.0), len(all_keys)
+
+
+def search_settings(chatbot_id: str, backend: str):
+    """(index description, candidate search params) for the chatbot's collection"""
+    if backend == "local":
+        collection = vector_store.local.get_collection(chatbot_id)
+        index_type = "HNSW" if collection is not None and collection.has_hnsw_index() else "FLAT"
+        # The local HNSW ef is global (LOCAL_HNSW_EF_SEARCH), so there is nothing to sweep
+        return {"index_type": f"LOCAL_{index_type}"}, [None]
+
+    service = vector_store.zilliz
+    # Same fallback as ZillizService.search_by_vector for collections without a described index
+    index = service.index_info(service.get_collection(chatbot_id)) or {
+        "index_type": "IVF_FLAT", "metric_type": "L2", "params": {"nlist": 128}
+    }
+    if index["index_type"] == "IVF_FLAT":
+        nlist = int(index["params"].get("nlist", 128))
+        return index, [{"nprobe": nprobe} for nprobe in NPROBE_CANDIDATES if nprobe <= nlist]
+    if index["index_type"] == "HNSW":
+        return index, [{"ef": ef} for ef in EF_CANDIDATES]
+    return index, [None]
+
+
+def timed_search(chatbot_id: str, backend: str, index: dict, query: np.ndarray, top_k: int, params):
+    """Keys of the top_k results and the search time in ms"""
+    query = query.reshape(1, -1)
+    if backend == "local":
+        started = time.perf_counter()
+        results = vector_store.local.search_by_vector(chatbot_id, query, top_k=top_k)
+        elapsed = (time.perf_counter() - started) * 1000
+        return [(r["document_id"], r["chunk_index"]) for r in results], elapsed
+
+    from app.services.zilliz_service import search_params_for
+
+    service = vector_store.zilliz
+    collection = service.get_collection(chatbot_id)
+    search_params = search_params_for(index, top_k)
+    if params:
+        search_params["params"].update(params)
+        if "ef" in params:
+            search_params["params"]["ef"] = max(params["ef"], top_k)
+    started = time.perf_counter()
+    results = collection.search(
+        data=query,
+        anns_field="embedding",
+        param=search_params,
+        limit=top_k,
+        expr=service.scope_expr(chatbot_id) or None,
+        output_fields=["document_id", "chunk_index"],
+    )
+    elapsed = (time.perf_counter() - started) * 1000
+    return [(hit.entity.get("document_id"), hit.entity.get("chunk_index")) for hit in results[0]], elapsed
+
+
+def evaluate(chatbot_id, backend, index, params, queries, neighbors, top_ks, repeat):
+    """{top_k: (mean recall@k, p50 ms, p99 ms)} for one search setting"""
+    measured = {}
+    for top_k in top_ks:
+        recalls = []
+        latencies = []
+        for query, truth in zip(queries, neighbors):
+            expected = set(truth[:top_k])
+            for _ in range(repeat):
+                found, elapsed = timed_search(chatbot_id, backend, index, query, top_k, params)
+                latencies.append(elapsed)
+            recalls.append(len(expected.intersection(found)) / max(1, len(expected)))
+        measured[top_k] = (
+            float(np.mean(recalls)),
+            float(np.percentile(latencies, 50)),
+            float(np.percentile(latencies, 99)),
+        )
+    return measured
+
+
+def recommend_threshold(distances: np.ndarray, coverage: float) -> float:
+    """Smallest threshold under which `coverage` of the questions keep their best chunk"""
+    threshold = float(np.quantile(distances[:, 0], coverage)) + THRESHOLD_MARGIN
+    return round(min(threshold, RELEVANCE_THRESHOLD_L2), 4)
+
+
+def recommend_top_k(distances: np.ndarray, threshold: float, top_ks, coverage: float) -> int:
+    """Smallest swept top_k that holds every chunk under the threshold for `coverage` of the queries"""
+    needed = float(np.quantile((distances < threshold).sum(axis=1), coverage))
+    for top_k in top_ks:
+        if top_k >= needed:
+            return top_k
+    return top_ks[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chatbot", required=True)
+    parser.add_argument("--queries", help="File with one question per line")
+    parser.add_argument("--sample", type=int, default=200, help="Stored chunks to use as queries without --queries")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[4, 8, 12, 16, 25])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--coverage", type=float, default=0.9, help="Fraction of queries the threshold and top_k must serve")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed searches per query and setting")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="Print the recommendation without writing it")
+    args = parser.parse_args()
+
+    chatbot_id = args.chatbot
+    backend = vector_store.backend_name(chatbot_id)
+    top_ks = sorted(set(args.top_k))
+
+    if args.queries:
+        from app.services.embedding_service import embedding_service
+
+        with open(args.queries, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        queries = embedding_service.generate_embeddings(questions)
+        query_source = "questions"
+    else:
+        queries = sample_queries(chatbot_id, backend, args.sample, args.batch_size, args.seed)
+        query_source = "sampled_chunks"
+    if not len(queries):
+        print(f"[TUNE] Chatbot {chatbot_id} has no stored vectors or queries; nothing to tune")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    neighbors, distances, num_vectors = exact_neighbors(chatbot_id, backend, queries, top_ks[-1], args.batch_size)
+    top_ks = [top_k for top_k in top_ks if top_k <= num_vectors] or [num_vectors]
+    print(
+        f"[TUNE] {len(queries)} {query_source} queries, {num_vectors} vectors on {backend}; "
+        f"exact neighbors in {time.perf_counter() - started:.1f}s"
+    )
+
+    index, candidates = search_settings(chatbot_id, backend)
+    print(f"\n{'setting':>14} {'top_k':>6} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    results = []
+    for params in candidates:
+        measured = evaluate(chatbot_id, backend, index, params, queries, neighbors, top_ks, args.repeat)
+        label = ",".join(f"{key}={value}" for key, value in (params or {}).items()) or "default"
+        for top_k, (recall, p50, p99) in measured.items():
+            print(f"{label:>14} {top_k:>6} {recall:>7.3f} {p50:>8.1f} {p99:>8.1f}")
+        results.append((params, measured))
+
+    current = retrieval_config.get(chatbot_id)
+    if query_source == "questions":
+        threshold = recommend_threshold(distances, args.coverage)
+    else:
+        # Stored chunks are their own nearest neighbor, so they say nothing about a good threshold
+        threshold = current.get("relevance_threshold_l2", RELEVANCE_THRESHOLD_L2)
+    top_k = recommend_top_k(distances, threshold, top_ks, args.coverage)
+
+    # Candidates are ordered cheapest first; take the first that reaches the target recall
+    chosen, measured = next(
+        ((params, measured) for params, measured in results if measured[top_k][0] >= args.target_recall),
+        max(results, key=lambda result: result[1][top_k][0]),
+    )
+    recall, p50, p99 = measured[top_k]
+
+    config = dict(current)
+    config.update({
+        "top_k": top_k,
+        "relevance_threshold_l2": threshold,
+        "index_type": index["index_type"],
+        "search_params": chosen or {},
+        "recall": round(recall, 4),
+        "p50_ms": round(p50, 2),
+        "p99_ms": round(p99, 2),
+        "target_recall": args.target_recall,
+        "query_source": query_source,
+        "num_queries": len(queries),
+        "num_vectors": num_vectors,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    })
+    if query_source != "questions" and "relevance_threshold_l2" not in current:
+        del config["relevance_threshold_l2"]
+
+    print(
+        f"\n[TUNE] Recommended for {chatbot_id}: top_k={top_k} (default {CHAT_TOP_K}), "
+        f"threshold={threshold}, search_params={chosen or {}} -> recall@{top_k}={recall:.3f}, "
+        f"p50={p50:.1f}ms, p99={p99:.1f}ms"
+    )
+    if recall < args.target_recall:
+        print(f"[TUNE] No setting reached recall {args.target_recall}; using the most accurate one")
+    if args.dry_run:
+        return
+    path = retrieval_config.save(chatbot_id, config)
+    print(f"[TUNE] Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
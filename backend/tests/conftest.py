@@ -0,0 +1,21 @@
+"""
+Test setup: import the backend app without external services
+
+Run from backend/:
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time; keep every local store in a throwaway directory
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bot-studio-tests-"))
+os.environ.setdefault("SUPABASE_URL", "http://localhost.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "local")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "False")
+os.environ.setdefault("KEYWORD_INDEX_ENABLED", "False")
@@ -0,0 +1,144 @@
+"""Incremental ingestion: unchanged documents are skipped, replaced content is re-indexed"""
+
+import hashlib
+import io
+
+import numpy as np
+import pytest
+
+from app.services import ingestion_service as ingestion_module
+from app.services.embedding_service import embedding_service
+from app.services.ingestion_service import IngestionService
+from app.services.supabase_service import DocumentStatusWriter
+
+
+CHATBOT_ID = "chatbot-1"
+DOCUMENT_ID = "doc-1"
+OLD_CONTENT = b"The office opens at nine in the morning."
+NEW_CONTENT = b"The office now opens at eight and closes at four."
+
+
+def sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class FakeWriter:
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, document_id, chunks, filename, user_id, embeddings, offsets=None, token_counts=None, first_chunk_index=0):
+        self.store.rows.setdefault(document_id, []).extend(chunks)
+        return [document_id]
+
+    def delete_document(self, document_id):
+        self.store.deleted.append(document_id)
+        self.store.rows.pop(document_id, None)
+
+    def checkpoint(self):
+        return []
+
+
+class FakeVectorStore:
+    keyword_index = None
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.deleted = []
+
+    def invalidate_collection(self, chatbot_id):
+        pass
+
+    def create_collection_if_not_exists(self, chatbot_id):
+        pass
+
+    def list_document_ids(self, chatbot_id):
+        return set(self.rows)
+
+    def delete_document(self, chatbot_id, document_id, flush=True):
+        self.deleted.append(document_id)
+        self.rows.pop(document_id, None)
+
+    def ingestion_writer(self, chatbot_id):
+        return FakeWriter(self)
+
+
+class FakeSupabase:
+    def __init__(self, documents, files):
+        self.documents = documents
+        self.files = files
+        self.statuses = {}
+
+    def get_chunking_settings(self, chatbot_id):
+        return {}
+
+    def get_documents_by_chatbot(self, chatbot_id):
+        return self.documents
+
+    def status_writer(self):
+        return DocumentStatusWriter(self)
+
+    def update_document_statuses(self, updates):
+        for document_id, fields in updates.items():
+            self.statuses.setdefault(document_id, {}).update(fields)
+        return True
+
+    def download_to_spool(self, file_path):
+        content = self.files[file_path]
+        return io.BytesIO(content), sha256(content), len(content)
+
+
+@pytest.fixture
+def vector_store(monkeypatch):
+    store = FakeVectorStore({DOCUMENT_ID: [OLD_CONTENT.decode()]})
+    monkeypatch.setattr(ingestion_module, "vector_store", store)
+    monkeypatch.setattr(ingestion_module, "count_tokens_batch", lambda texts, model: [len(text.split()) for text in texts])
+    monkeypatch.setattr(
+        embedding_service,
+        "generate_embeddings",
+        lambda texts: np.zeros((len(texts), embedding_service.dimension), dtype=np.float32),
+    )
+    return store
+
+
+def indexed_document(content: bytes) -> dict:
+    """document_metadata row of a document completed from content with the current params"""
+    return {
+        "id": DOCUMENT_ID,
+        "chatbot_id": CHATBOT_ID,
+        "user_id": "user-1",
+        "filename": "hours.txt",
+        "file_path": "user-1/hours.txt",
+        "mime_type": "text/plain",
+        "status": "completed",
+        "content_hash": sha256(content),
+        "chunk_params": IngestionService.chunk_params({}),
+    }
+
+
+def test_unchanged_document_is_skipped(vector_store):
+    supabase = FakeSupabase([indexed_document(OLD_CONTENT)], {"user-1/hours.txt": OLD_CONTENT})
+    stages = []
+
+    result = IngestionService(supabase).ingest_chatbot_documents(
+        CHATBOT_ID, incremental=True, on_progress=lambda document_id, stage, info: stages.append(stage)
+    )
+
+    assert result["skipped"] == 1
+    assert result["processed"] == 0
+    assert stages[-1] == "skipped"
+    assert vector_store.deleted == []
+    assert supabase.statuses == {}
+
+
+def test_replaced_content_is_reindexed(vector_store):
+    # Same document row (and chunk params) as the indexed copy, new file content in storage
+    supabase = FakeSupabase([indexed_document(OLD_CONTENT)], {"user-1/hours.txt": NEW_CONTENT})
+
+    result = IngestionService(supabase).ingest_chatbot_documents(CHATBOT_ID, incremental=True)
+
+    assert result["skipped"] == 0
+    assert result["processed"] == 1
+    assert vector_store.deleted == [DOCUMENT_ID]
+    assert vector_store.rows[DOCUMENT_ID] == [NEW_CONTENT.decode()]
+    assert supabase.statuses[DOCUMENT_ID]["status"] == "completed"
+    assert supabase.statuses[DOCUMENT_ID]["content_hash"] == sha256(NEW_CONTENT)
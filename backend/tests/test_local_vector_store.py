@@ -0,0 +1,66 @@
+"""LocalCollection: tombstones, compaction and searches that straddle a compaction"""
+
+import numpy as np
+import pytest
+
+from app.services.local_vector_store import LocalCollection
+
+
+DIMENSION = 4
+
+
+def rows_for(document_id, texts):
+    return [
+        (f"{document_id}-{i}", document_id, i, text, f"{document_id}.txt", "chatbot-1", "user-1", 0, len(text), 1)
+        for i, text in enumerate(texts)
+    ]
+
+
+def unit(index):
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    vector[index] = 1.0
+    return vector
+
+
+@pytest.fixture
+def collection(tmp_path):
+    collection = LocalCollection(str(tmp_path / "chatbot-1"), dimension=DIMENSION)
+    collection.append(rows_for("a", ["alpha zero", "alpha one"]), np.stack([unit(0), unit(1)]))
+    collection.append(rows_for("b", ["beta zero", "beta one"]), np.stack([unit(2), unit(3)]))
+    yield collection
+    collection.close()
+
+
+def test_search_returns_nearest_rows_with_metadata(collection):
+    results = collection.search(unit(2), top_k=1)
+
+    assert [result["text"] for result in results] == ["beta zero"]
+    assert results[0]["score"] == pytest.approx(0.0)
+    assert results[0]["metadata"]["document_id"] == "b"
+
+
+def test_deleted_documents_are_hidden_and_compacted_away(collection):
+    assert collection.delete_document("a") == 2
+    assert {result["document_id"] for result in collection.search(unit(0), top_k=4)} == {"b"}
+
+    collection.checkpoint()
+
+    assert collection.document_ids() == {"b"}
+    assert collection._read_manifest()["count"] == 2
+    assert collection.search(unit(3), top_k=1)[0]["text"] == "beta one"
+    assert collection.search(unit(0), top_k=4, filters={"document_id": "a"}) == []
+
+
+def test_search_with_a_snapshot_from_before_compaction_is_redone(collection, monkeypatch):
+    # A search that took its snapshot just before another thread compacted the collection
+    stale = collection._current_snapshot()
+    collection.delete_document("a")
+    collection.checkpoint()
+
+    current_snapshot = collection._current_snapshot
+    snapshots = iter([stale])
+    monkeypatch.setattr(collection, "_current_snapshot", lambda: next(snapshots, None) or current_snapshot())
+
+    results = collection.search(unit(3), top_k=1)
+
+    assert [(result["text"], result["score"]) for result in results] == [("beta one", pytest.approx(0.0))]
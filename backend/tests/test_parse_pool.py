@@ -0,0 +1,33 @@
+"""ParsePool: every task, including a PDF's first page range, counts against `workers`"""
+
+import threading
+import time
+
+from app.utils.parse_pool import ParsePool
+
+
+def test_concurrent_extractions_share_the_worker_limit(monkeypatch):
+    pool = ParsePool(workers=2, pdf_pages_per_task=10)
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def run_task(kind, path, start, end):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return f"pages {start}-{end}", 30
+
+    monkeypatch.setattr(pool, "_run_task", run_task)
+    texts = []
+    threads = [threading.Thread(target=lambda: texts.append(pool.extract_pdf(b"%PDF"))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] <= 2
+    assert texts == ["pages 0-10\n\npages 10-20\n\npages 20-30"] * 6
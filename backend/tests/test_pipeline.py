@@ -0,0 +1,74 @@
+"""run_pipeline: error isolation, fan-out and back-pressure"""
+
+import threading
+import time
+
+from app.utils.pipeline import Stage, run_pipeline
+
+
+def test_failing_item_does_not_stop_the_others():
+    errors = []
+
+    def parse(item):
+        if item == 3:
+            raise ValueError("bad document")
+        return item * 10
+
+    results = run_pipeline(
+        range(6),
+        [
+            Stage("download", lambda item: item, workers=2),
+            Stage("parse", parse, workers=2),
+            Stage("index", lambda item: item + 1),
+        ],
+        on_error=lambda item, stage, exc: errors.append((item, stage, str(exc))),
+    )
+
+    assert sorted(results) == [1, 11, 21, 41, 51]
+    assert errors == [(3, "parse", "bad document")]
+
+
+def test_fan_out_passes_elements_produced_before_an_error():
+    errors = []
+
+    def split(item):
+        for part in range(3):
+            if item == "b" and part == 2:
+                raise RuntimeError("truncated")
+            yield f"{item}{part}"
+
+    results = run_pipeline(
+        ["a", "b"],
+        [Stage("parse", split, fan_out=True), Stage("embed", str.upper, workers=2)],
+        on_error=lambda item, stage, exc: errors.append((item, stage)),
+    )
+
+    assert sorted(results) == ["A0", "A1", "A2", "B0", "B1"]
+    assert errors == [("b", "parse")]
+
+
+def test_full_queue_blocks_the_stage_feeding_it():
+    produced = []
+    release = threading.Event()
+
+    def download(item):
+        produced.append(item)
+        return item
+
+    def embed(item):
+        release.wait(timeout=5)
+        return item
+
+    thread = threading.Thread(
+        target=run_pipeline,
+        args=(range(20), [Stage("download", download), Stage("embed", embed, queue_size=1)]),
+    )
+    thread.start()
+    time.sleep(0.2)
+    # One item in embed, one waiting in its queue, one blocked on put
+    in_flight = len(produced)
+    release.set()
+    thread.join(timeout=5)
+
+    assert in_flight <= 3
+    assert len(produced) == 20
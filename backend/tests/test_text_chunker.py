@@ -0,0 +1,76 @@
+"""split_text / split_tokens: exact offsets, size bounds and full coverage on random text"""
+
+import random
+from bisect import bisect_right
+
+import pytest
+
+from app.utils.text_chunker import split_text, split_tokens
+
+
+PIECES = ["word", "a", "longerword", "x" * 40, " ", " ", "  ", "\n", "\n\n", ". ", ".", "\t", "é", "日本"]
+
+
+def random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 400)))
+
+
+def assert_exact_and_covering(text, chunks):
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert chunk.text and chunk.text == chunk.text.strip()
+    starts = [chunk.start for chunk in chunks]
+    assert starts == sorted(set(starts))
+
+    covered = [False] * len(text)
+    for chunk in chunks:
+        covered[chunk.start:chunk.end] = [True] * (chunk.end - chunk.start)
+    missing = [i for i, char in enumerate(text) if not char.isspace() and not covered[i]]
+    assert missing == []
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_split_text_properties(seed):
+    rng = random.Random(seed)
+    text = random_text(rng)
+    chunk_size = rng.randint(1, 120)
+    overlap = rng.randint(0, chunk_size)
+
+    chunks = split_text(text, chunk_size, overlap)
+
+    assert_exact_and_covering(text, chunks)
+    assert all(len(chunk.text) <= chunk_size for chunk in chunks)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_split_tokens_properties(seed):
+    rng = random.Random(seed)
+    text = random_text(rng)
+    # Stand-in tokenizer: tokens of 1-4 characters
+    token_starts = []
+    pos = 0
+    while pos < len(text):
+        token_starts.append(pos)
+        pos += rng.randint(1, 4)
+    chunk_tokens = rng.randint(1, 40)
+    overlap_tokens = rng.randint(0, chunk_tokens)
+
+    chunks = split_tokens(text, token_starts, chunk_tokens, overlap_tokens)
+
+    assert_exact_and_covering(text, chunks)
+    for chunk in chunks:
+        first = bisect_right(token_starts, chunk.start) - 1
+        last = bisect_right(token_starts, chunk.end - 1) - 1
+        # A separator inside a token can add one token
+        assert last - first + 1 <= chunk_tokens + 1
+
+
+def test_split_text_prefers_paragraph_breaks():
+    text = "First paragraph here.\n\nSecond paragraph follows."
+    chunks = split_text(text, chunk_size=30)
+    assert [chunk.text for chunk in chunks] == ["First paragraph here.", "Second paragraph follows."]
+
+
+def test_split_text_rejects_non_positive_size():
+    with pytest.raises(ValueError):
+        split_text("text", chunk_size=0)
@@ -0,0 +1,96 @@
+"""Zilliz index planning, score conversion and collection naming (no Milvus server needed)"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.core.config import ZILLIZ_FLAT_MAX_VECTORS, ZILLIZ_HNSW_MIN_VECTORS
+from app.services import zilliz_service
+from app.services.zilliz_service import (
+    ZillizService,
+    index_plan,
+    logical_collection_name,
+    needs_reindex,
+    search_params_for,
+    to_l2_score,
+)
+
+
+def test_index_type_follows_collection_size():
+    assert index_plan(0)["index_type"] == "FLAT"
+    assert index_plan(ZILLIZ_FLAT_MAX_VECTORS - 1)["index_type"] == "FLAT"
+    assert index_plan(ZILLIZ_FLAT_MAX_VECTORS)["index_type"] == "IVF_FLAT"
+    assert index_plan(ZILLIZ_HNSW_MIN_VECTORS - 1)["index_type"] == "IVF_FLAT"
+    assert index_plan(ZILLIZ_HNSW_MIN_VECTORS)["index_type"] == "HNSW"
+    for n in (0, ZILLIZ_FLAT_MAX_VECTORS, ZILLIZ_HNSW_MIN_VECTORS):
+        assert index_plan(n)["metric_type"] == "IP"
+
+
+@pytest.mark.parametrize("n", [ZILLIZ_FLAT_MAX_VECTORS, 50_000, 200_000, ZILLIZ_HNSW_MIN_VECTORS - 1])
+def test_ivf_nlist_is_a_bounded_power_of_two_near_four_sqrt_n(n):
+    nlist = index_plan(n)["params"]["nlist"]
+    assert nlist & (nlist - 1) == 0
+    assert 128 <= nlist <= 16384
+    target = 4 * math.sqrt(n)
+    assert target / math.sqrt(2) <= nlist <= target * math.sqrt(2) or nlist in (128, 16384)
+
+
+def test_search_params_match_the_index():
+    ivf = index_plan(ZILLIZ_FLAT_MAX_VECTORS)
+    nprobe = search_params_for(ivf, 10)["params"]["nprobe"]
+    assert 1 <= nprobe <= ivf["params"]["nlist"]
+    assert search_params_for(index_plan(ZILLIZ_HNSW_MIN_VECTORS), 500)["params"]["ef"] >= 500
+    assert search_params_for(index_plan(0), 10) == {"metric_type": "IP", "params": {}}
+
+
+def test_needs_reindex():
+    flat = index_plan(0)
+    ivf = index_plan(ZILLIZ_FLAT_MAX_VECTORS)
+    assert needs_reindex(None, flat)
+    assert not needs_reindex(flat, index_plan(1))
+    assert needs_reindex(flat, ivf)
+    assert needs_reindex({**flat, "metric_type": "L2"}, flat)
+    nlist = ivf["params"]["nlist"]
+    assert not needs_reindex({**ivf, "params": {"nlist": nlist * 2}}, ivf)
+    assert needs_reindex({**ivf, "params": {"nlist": nlist * 4}}, ivf)
+    assert needs_reindex({**ivf, "params": {"nlist": max(1, nlist // 4)}}, ivf)
+
+
+def test_inner_product_converts_to_squared_l2():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        a, b = rng.normal(size=(2, 8))
+        a /= np.linalg.norm(a)
+        b /= np.linalg.norm(b)
+        assert to_l2_score(float(a @ b), "IP") == pytest.approx(float(np.sum((a - b) ** 2)))
+    assert to_l2_score(1.0, "IP") == 0.0
+    assert to_l2_score(0.37, "L2") == 0.37
+
+
+def test_logical_collection_name_strips_rebuild_suffix():
+    assert logical_collection_name("chatbot_abc") == "chatbot_abc"
+    assert logical_collection_name("chatbot_abc__ix3") == "chatbot_abc"
+    assert logical_collection_name("shared_chunks_2__ix12") == "shared_chunks_2"
+    assert logical_collection_name("shared_chunks") == "shared_chunks"
+
+
+@pytest.mark.parametrize("count", [1, 4])
+def test_shared_collection_names_cover_every_shard(monkeypatch, count):
+    monkeypatch.setattr(zilliz_service, "ZILLIZ_SHARED_COLLECTION", "shared_chunks")
+    monkeypatch.setattr(zilliz_service, "ZILLIZ_SHARED_COLLECTION_COUNT", count)
+    names = ZillizService.shared_collection_names()
+    assert len(names) == count
+    assert {ZillizService.shared_collection_name(f"bot-{i}") for i in range(200)} == set(names)
+    if count == 1:
+        assert names == ["shared_chunks"]
+
+
+def test_chatbot_collection_names_are_served_names(monkeypatch):
+    class FakeUtility:
+        @staticmethod
+        def list_collections():
+            return ["chatbot_a", "chatbot_b__ix2", "shared_chunks", "shared_chunks_1__ix1", "other"]
+
+    monkeypatch.setattr(zilliz_service, "utility", FakeUtility)
+    assert ZillizService.chatbot_collection_names() == ["chatbot_a", "chatbot_b"]
@@ -159,12 +159,7 @@ export default function ChatbotDetailPage() {
         setError('Your session is not available. Please refresh and try again.')
         return
       }
-      const statusInterval = setInterval(() => {
-        if (chatbotId) {
-          loadDocumentStatuses()
-        }
-      }, 20000) // Poll every 20 seconds
-
+      // Ingestion runs as a background job; the POST returns as soon as it is queued
       const response = await fetch(`${API_URL}/api/ingest/${chatbotId}`, {
         method: 'POST',
         headers: {
@@ -172,15 +167,32 @@ export default function ChatbotDetailPage() {
         },
       })
 
-      // Clear interval once request completes
-      clearInterval(statusInterval)
-
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({ message: 'Failed to start ingestion' }))
-        throw new Error(errorData.message || `HTTP error! status: ${response.status}`)
+        throw new Error(errorData.detail || errorData.message || `HTTP error! status: ${response.status}`)
+      }
+
+      const { job_id: jobId } = await response.json()
+
+      // Poll the job (and document statuses) until it finishes
+      let job: { status: string; error?: string | null } | null = null
+      while (!job || job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 3000))
+        const jobResponse = await fetch(`${API_URL}/api/ingest/${chatbotId}/jobs/${jobId}`, {
+          headers: {
+            Authorization: `Bearer ${accessToken}`,
+          },
+        })
+        if (!jobResponse.ok) {
+          throw new Error(`Failed to check ingestion status (HTTP ${jobResponse.status})`)
+        }
+        job = await jobResponse.json()
+        loadDocumentStatuses()
       }
 
-      const data = await response.json()
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Document ingestion failed')
+      }
       
       // Final status refresh
       await loadDocumentStatuses()
@@ -454,6 +466,20 @@ export default function ChatbotDetailPage() {
         throw new Error(error.message)
       }
 
+      // Let the backend drop its cached copy of the chatbot so chats use the new name/purpose
+      const { data: { session } } = await supabase.auth.getSession()
+      const accessToken = session?.access_token
+      if (accessToken) {
+        try {
+          await fetch(`${API_URL}/api/chatbot/${chatbotId}/invalidate-cache`, {
+            method: 'POST',
+            headers: { Authorization: `Bearer ${accessToken}` },
+          })
+        } catch (e) {
+          console.error('Error invalidating chatbot cache:', e)
+        }
+      }
+
       setSaveSuccess(true)
       setTimeout(() => setSaveSuccess(false), 3000)
     } catch (err) {